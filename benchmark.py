@@ -0,0 +1,544 @@
+"""
+benchmark.py times the hot paths of the engine and the renderer, headless (ui draws to an SDL dummy window).
+Run `python benchmark.py` for everything, or pass benchmark names, like `python benchmark.py collisions rotate`.
+Every run is saved as JSON in benchmark_results/ (or --json PATH), and --compare PATH prints
+how much faster or slower each result got against an older run.
+Everything is reported in calls per second, so bigger is always better.
+"""
+
+import os
+import json
+import time
+import random
+import platform
+import argparse
+import itertools
+import collections
+import copy
+import tempfile
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy") # only matters for the ui benchmark, nothing else opens a window
+os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+import numpy
+import pygame
+
+import engine, gamemodes, settings, vecenv, bot, search, rollout, pcsolver, openings, combo, puzzlegen, presets
+
+PIECE_SETS = {"tetra": gamemodes.TetraminoBase, "penta": gamemodes.PentominoBase}
+BOARD_SIZES = [(4, 14), (10, 24), (20, 44)] # (width, height including the extra rows)
+GEN_TYPES = ["BAG", "RANDOM", "CLASSIC", "4MEMR6"]
+UNDO_AMOUNTS = [1, 500]
+
+MIN_TIME = 0.5 # seconds per measurement, --min-time changes it
+results = [] # every report() ends up in here, and in the json file
+
+def report(benchmark, piece_set, board, detail, calls_per_second):
+    results.append({"benchmark": benchmark, "piece_set": piece_set, "board": board, "detail": detail,
+                     "value": calls_per_second, "unit": "calls/s"})
+    print(f"{benchmark:<11} {piece_set:<6} {board:<8} {detail:<26} {calls_per_second:>14,.0f}/s")
+
+def board_name(width, height):
+    return f"{width}x{height}"
+
+def time_calls(func, min_time=None, batch=100):
+    """Call func over and over for at least min_time seconds, returns calls per second"""
+    if min_time is None:
+        min_time = MIN_TIME
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        for _ in range(batch):
+            func()
+        calls += batch
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time:
+            return calls / elapsed
+
+def time_with_setup(setup, func, min_time=None):
+    """Like time_calls, but runs setup (not timed) before every call, for things that use up their own state"""
+    if min_time is None:
+        min_time = MIN_TIME
+    calls = 0
+    elapsed = 0
+    while elapsed < min_time:
+        setup()
+        start = time.perf_counter()
+        func()
+        elapsed += time.perf_counter() - start
+        calls += 1
+    return calls / elapsed
+
+def make_game(piece_set, width, height, seed=0, **kwargs):
+    game = engine.Engine(board_width=width, board_height=height, seed=seed, **kwargs)
+    game.load_gamemode(piece_set)
+    game.load_game()
+    return game
+
+def playable_sizes(piece_set):
+    """Board sizes the pieces actually fit in (pentominos don't fit on a 4 wide board)"""
+    return [(width, height) for width, height in BOARD_SIZES if width >= piece_set.piece_table.size]
+
+def fill_board(game, rng, fill_rows=None):
+    """Fill the bottom half of the board with garbage (one or two holes per row)"""
+    if fill_rows is None:
+        fill_rows = (game.board_height - game.board_extra_height) // 2
+    board = numpy.zeros_like(game.game_board)
+    for row in range(game.board_height - fill_rows, game.board_height):
+        board[row] = 1
+        for hole in rng.sample(range(game.board_width), min(2, game.board_width - 1)):
+            board[row, hole] = 0
+    game.update_game_board(board)
+
+def set_current_piece(game, piece_id, x, y, rotation=0):
+    game.piece_bags[0][0] = piece_id
+    game.piece_x, game.piece_y, game.piece_rotation = x, y, rotation
+    game.piece_board = game.piece_table.piece_boards[piece_id][rotation]
+
+def play_random(game, rng, placements):
+    """Hard drop placements pieces at random spots (the board should be tall enough not to top out)"""
+    while game.pieces_placed < placements:
+        if game.queue_spawn_piece:
+            game.spawn_piece()
+        game.rotate_piece(rng.randint(0, 3))
+        game.move_piece(rng.randint(-game.board_width, game.board_width), 0)
+        game.hard_drop()
+
+def bench_collisions():
+    for (set_name, piece_set), (width, height) in itertools.product(PIECE_SETS.items(), BOARD_SIZES):
+        for backend in ("ARRAY", "BITBOARD"):
+            rng = random.Random(0)
+            game = make_game(piece_set, width, height, board_backend=backend)
+            fill_board(game, rng)
+            # random spots all over the board, some of which collide and some don't
+            targets = [(rng.randint(-2, width), rng.randint(0, height), rng.choice(list(game.pieces_dict)), rng.randint(0, 3)) for _ in range(1000)]
+            game.piece_x, game.piece_y = 0, 0
+            target_cycle = itertools.cycle(targets)
+            check_collisions = game.check_collisions
+
+            def check():
+                x, y, piece, rotation = next(target_cycle)
+                check_collisions(x, y, piece, rotation)
+
+            report("collisions", set_name, board_name(width, height), backend.lower(), time_calls(check))
+
+def bench_drop():
+    """Ghost piece / hard drop landing search, from the spawn position down to a half filled board"""
+    for (set_name, piece_set), (width, height) in itertools.product(PIECE_SETS.items(), BOARD_SIZES + [(10, 104)]):
+        for backend in ("ARRAY", "BITBOARD"):
+            game = make_game(piece_set, width, height, board_backend=backend)
+            fill_board(game, random.Random(0))
+            game.spawn_piece()
+            report("drop", set_name, board_name(width, height), backend.lower(), time_calls(game.update_ghost_piece))
+
+def bench_move():
+    """move_piece one step at a time, sliding into the walls, and one row of soft drop"""
+    for (set_name, piece_set), (width, height) in itertools.product(PIECE_SETS.items(), BOARD_SIZES):
+        if (width, height) not in playable_sizes(piece_set):
+            continue
+        game = make_game(piece_set, width, height)
+        fill_board(game, random.Random(0))
+        game.spawn_piece()
+        start_x, start_y = game.piece_x, game.piece_y
+        directions = itertools.cycle((1, -1))
+
+        def step():
+            game.move_piece(next(directions), 0)
+
+        def slide():
+            game.move_piece(next(directions) * width, 0)
+
+        def soft_drop():
+            if game.move_piece(0, 1): # landed, start over from the top
+                game.piece_y = start_y
+
+        report("move", set_name, board_name(width, height), "step", time_calls(step))
+        report("move", set_name, board_name(width, height), "slide to wall", time_calls(slide))
+        game.piece_x = start_x
+        report("move", set_name, board_name(width, height), "soft drop 1 row", time_calls(soft_drop))
+
+def bench_step():
+    """Engine.step, one 1ms simulation tick, with nothing held and with right + soft drop held (pieces keep locking and respawning)"""
+    for (set_name, piece_set), (width, height) in itertools.product(PIECE_SETS.items(), BOARD_SIZES):
+        if (width, height) not in playable_sizes(piece_set):
+            continue
+        for detail, held in (("idle", ()), ("held", (settings.MOVE_RIGHT, settings.MOVE_SOFTDROP))):
+            game = make_game(piece_set, width, height)
+            keys = collections.defaultdict(bool, {key: True for key in held})
+            report("step", set_name, board_name(width, height), detail, time_calls(lambda: game.step(keys, 1.0)))
+
+def bench_rotate():
+    """rotate_piece when the first kick works, and when it's boxed in so every kick in the list gets tried and fails"""
+    for (set_name, piece_set), (width, height) in itertools.product(PIECE_SETS.items(), BOARD_SIZES):
+        if (width, height) not in playable_sizes(piece_set):
+            continue
+        game = make_game(piece_set, width, height)
+        piece_table = game.piece_table
+        x = (width - piece_table.size) // 2
+        y = height - piece_table.size - 1
+
+        set_current_piece(game, 1, x, y)
+        game.update_game_board(numpy.zeros_like(game.game_board))
+        report("rotate", set_name, board_name(width, height), "first kick", time_calls(lambda: game.rotate_piece(1)))
+
+        # a board filled everywhere except exactly where the piece is
+        for piece_id in range(1, piece_table.piece_types + 1):
+            board = numpy.ones_like(game.game_board)
+            for row, col in piece_table.minos[piece_id][0]:
+                board[y + row, x + col] = 0
+            game.update_game_board(board)
+            set_current_piece(game, piece_id, x, y)
+            game.rotate_piece(1)
+            if game.piece_rotation == 0: # no kick worked, so every call walks the whole list
+                break
+        report("rotate", set_name, board_name(width, height), "all kicks fail", time_calls(lambda: game.rotate_piece(1)))
+
+def bench_placements():
+    """find_placements (every reachable landing spot) on an empty and a half filled board, with and without input paths"""
+    for (set_name, piece_set), (width, height) in itertools.product(PIECE_SETS.items(), BOARD_SIZES):
+        if (width, height) not in playable_sizes(piece_set):
+            continue
+        for board in ("empty", "filled"):
+            game = make_game(piece_set, width, height)
+            if board == "filled":
+                fill_board(game, random.Random(0))
+            game.spawn_piece()
+            report("placements", set_name, board_name(width, height), board, time_calls(lambda: game.find_placements(with_paths=False)))
+            report("placements", set_name, board_name(width, height), board + " paths", time_calls(game.find_placements))
+
+def bench_bot():
+    """Bot.choose (both placement searches plus the batched scoring) and the scoring on its own, in moves per second"""
+    for (set_name, piece_set), board in itertools.product(PIECE_SETS.items(), ("empty", "filled")):
+        game = make_game(piece_set, 10, 24)
+        if board == "filled":
+            fill_board(game, random.Random(0))
+        game.spawn_piece()
+        player = bot.Bot()
+        candidates = game.find_placements() + bot.hold_placements(game)
+        report("bot", set_name, "10x24", board + " choose", time_calls(lambda: player.choose(game), batch=10))
+        report("bot", set_name, "10x24", f"{board} evaluate {len(candidates)}", time_calls(lambda: player.evaluate(game, candidates), batch=10))
+
+def bench_search():
+    """SearchBot.choose with no time limit, in moves per second, for a few lookahead depths (the transposition table starts empty every time)"""
+    for (set_name, piece_set), board, depth in itertools.product(PIECE_SETS.items(), ("empty", "filled"), (2, 3)):
+        game = make_game(piece_set, 10, 24)
+        if board == "filled":
+            fill_board(game, random.Random(0))
+        game.spawn_piece()
+        player = search.SearchBot(depth=depth, think_ms=float("inf"), processes=0)
+        report("search", set_name, "10x24", f"{board} depth {depth}", time_with_setup(search._placements_cache.clear, lambda: player.choose(game)))
+    # filled up to just under the spawn with one hole per row, every line of play tops out before the lookahead ends
+    game = make_game(gamemodes.TetraminoBase, 4, 14, seed=9)
+    rng = random.Random(9)
+    board = numpy.zeros_like(game.game_board)
+    for row in range(game.board_extra_height + 2, game.board_height):
+        board[row] = 1
+        board[row, rng.randrange(game.board_width)] = 0
+    game.update_game_board(board)
+    game.spawn_piece()
+    player = search.SearchBot(depth=3, think_ms=float("inf"), processes=0)
+    report("search", "tetra", "4x14", "topped out depth 3", time_with_setup(search._placements_cache.clear, lambda: player.choose(game)))
+
+def bench_rollout():
+    """rollout.run_playouts on a half filled board, in placements per second (every playout of every move, one process)"""
+    for (set_name, piece_set), gamemode in itertools.product(PIECE_SETS.items(), (gamemodes.Classic, gamemodes.BetterArcade)):
+        game = make_game(piece_set, 10, 24)
+        game.load_gamemode(gamemode)
+        game.reset_game(0, record=False)
+        fill_board(game, random.Random(0))
+        game.spawn_piece()
+        state = rollout.position(game)
+        job = (state, 32, rollout.HORIZON, 0, dict(bot.WEIGHTS))
+        placements = len(state["moves"]) * 32 * rollout.HORIZON
+        report("rollout", set_name, "10x24", f"{gamemode.__name__} {len(state['moves'])} moves", time_calls(lambda: rollout.run_playouts(job), batch=1) * placements)
+
+def bench_pcsolver():
+    """A whole PerfectClearSearch from an empty board with the Guideline queue, in searches per second (cold placement cache)"""
+    for (width, height), seed in itertools.product(((4, 14), (10, 24)), (0, 4)):
+        game = make_game(gamemodes.TetraminoBase, width, height, seed)
+        game.load_gamemode(gamemodes.Guideline)
+        game.reset_game(seed, record=False)
+        game.spawn_piece()
+        args = pcsolver.search_args(game)
+        pc_search = pcsolver.PerfectClearSearch(*args)
+        pc_search.work()
+        detail = f"seed {seed} {'solved' if pc_search.solution else 'none'} {pc_search.nodes} nodes"
+        report("pcsolver", "tetra", board_name(width, height), detail, time_with_setup(pcsolver._placements_cache.clear, lambda: pcsolver.PerfectClearSearch(*args).work()))
+
+def bench_openings():
+    """OpeningBook.find on books of random keys, in lookups per second (the page cache is warm, the file was just written)"""
+    rng = numpy.random.default_rng(0)
+    with tempfile.TemporaryDirectory() as folder:
+        for records in (10_000, 10_000_000):
+            path = os.path.join(folder, f"{records}.pob")
+            keys = rng.integers(0, 2 ** 64 - 1, records, dtype=numpy.uint64, endpoint=True)
+            openings.write_book(path, 0, 5, keys, numpy.zeros(records, dtype=openings.MOVE_DTYPE))
+            book = openings.OpeningBook(path)
+            present = iter(itertools.cycle(keys[:1000].tolist()))
+            missing = iter(itertools.cycle(rng.integers(0, 2 ** 63, 1000, dtype=numpy.uint64).tolist()))
+            report("openings", "-", "-", f"{records:,} records hit", time_calls(lambda: book.find(next(present))))
+            report("openings", "-", "-", f"{records:,} records miss", time_calls(lambda: book.find(next(missing))))
+            del book # the map has to go before the folder can
+
+def bench_combo():
+    """ComboGraph lookups on a small tetromino graph (built into a temp folder first), in lookups per second"""
+    game = make_game(gamemodes.TetraminoBase, 4, 14)
+    game.load_gamemode(gamemodes.Guideline)
+    game.reset_game(0, record=False)
+    game.spawn_piece()
+    rules = search.Rules(game)
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as folder:
+        path = os.path.join(folder, "tetra_4x14.npz")
+        numpy.savez(path, **combo.build(rules, 2, 3, 4, log=lambda text: None))
+        graph = combo.ComboGraph(path)
+    piece_types = graph.piece_types
+    lookups = iter(itertools.cycle([(rng.randrange(len(graph.index)), rng.randint(1, piece_types), tuple(rng.randint(1, piece_types) for _ in range(4))) for _ in range(1000)]))
+    report("combo", "tetra", "4x14", f"options {len(graph.index)} nodes", time_calls(lambda: graph.options(*next(lookups))))
+
+    def moves_uncached():
+        graph.last = None
+        graph.moves(game)
+    report("combo", "tetra", "4x14", "moves, empty board", time_calls(moves_uncached))
+
+def bench_puzzlegen():
+    """puzzlegen.attempt for every kind on the tetromino 4x14 board, in seeds tried per second (one process, warm caches)"""
+    game = puzzlegen.new_game("tetra", "Guideline", 4, 14)
+    rules = search.Rules(game)
+    for kind in puzzlegen.KINDS:
+        config = puzzlegen.Config("tetra", "Guideline", 4, 14, kind, 5 if kind == "pc" else 3, 2, 50)
+        seeds = itertools.count()
+        kept = sum(puzzlegen.attempt(game, rules, config, seed) is not None for seed in range(200))
+        report("puzzlegen", "tetra", "4x14", f"{kind} {kept / 2:.0f}% kept", time_calls(lambda: puzzlegen.attempt(game, rules, config, next(seeds)), batch=10))
+
+def bench_presets():
+    """PresetFile lookups and Engine.load_position on a file of random presets, in presets per second"""
+    for width, height in BOARD_SIZES[:2]:
+        game = make_game(gamemodes.TetraminoBase, width, height)
+        rng = random.Random(0)
+        found = []
+        for _ in range(100_000): # a few random rows of random cells, 5 pieces of queue and one in hold
+            board = numpy.array([[rng.randint(0, 7) for _ in range(width)] for _ in range(rng.randint(0, height // 2))], dtype=numpy.int8)
+            found.append(presets.Preset(board.reshape(-1, width), tuple(rng.randint(1, 7) for _ in range(5)), (rng.randint(1, 7),)))
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "presets.ptp")
+            presets.write_presets(path, width, height, 0, found)
+            preset_file = presets.PresetFile(path)
+            numbers = itertools.cycle([rng.randrange(len(preset_file)) for _ in range(1000)])
+            report("presets", "tetra", board_name(width, height), "get", time_calls(lambda: preset_file[next(numbers)]))
+
+            def load():
+                preset = preset_file[next(numbers)]
+                game.load_position(preset.board, preset.queue, preset.hold)
+            report("presets", "tetra", board_name(width, height), "get + load_position", time_calls(load))
+            del preset_file # the map has to go before the folder can
+
+def bench_vecenv():
+    """VecEnv.step with random legal placements, reported in placements per second (steps per second times games)"""
+    for (set_name, piece_set), num_envs in itertools.product(PIECE_SETS.items(), [1, 256, 4096]):
+        env = vecenv.VecEnv(num_envs, (piece_set, gamemodes.Guideline), board_width=10, board_height=24, seed=0)
+        numpy_rng = numpy.random.default_rng(0)
+        rotations = numpy_rng.integers(0, 4, (64, num_envs)) # picked ahead of time so the rng isn't part of the timing
+        fractions = numpy_rng.random((64, num_envs))
+        steps = itertools.count()
+
+        def step():
+            index = next(steps) % 64
+            shapes = env.current_shapes(rotations[index])
+            min_x, max_x = env.min_x[shapes], env.max_x[shapes]
+            env.step(min_x + (fractions[index] * (max_x - min_x + 1)).astype(numpy.intp), rotations[index])
+        report("vecenv", set_name, "10x24", f"{num_envs} games", time_calls(step, batch=10) * num_envs)
+
+def bench_lock():
+    """lock_piece (which also runs clear_lines, the ghost and the history) with and without clearing lines"""
+    for (set_name, piece_set), (width, height) in itertools.product(PIECE_SETS.items(), BOARD_SIZES):
+        if (width, height) not in playable_sizes(piece_set):
+            continue
+        game = make_game(piece_set, width, height)
+        piece_table = game.piece_table
+        x = (width - piece_table.size) // 2
+        cells = piece_table.minos[1][0]
+        y = height - 1 - max(row for row, col in cells) # resting on the floor
+        piece_rows = {row for row, col in cells}
+
+        empty_board = numpy.zeros_like(game.game_board)
+        clearing_board = numpy.zeros_like(game.game_board)
+        for row in piece_rows:
+            clearing_board[y + row] = 2 # every row the piece touches is full apart from the piece itself
+        for row, col in cells:
+            clearing_board[y + row, x + col] = 0
+
+        for board, detail in ((empty_board, "no clear"), (clearing_board, f"{len(piece_rows)} line clear")):
+            def setup():
+                game.piece_bags[0].insert(0, 1)
+                set_current_piece(game, 1, x, y)
+                game.update_game_board(board)
+            report("lock", set_name, board_name(width, height), detail, time_with_setup(setup, game.lock_piece))
+
+def bench_history():
+    """update_history on its own, then undo(1) and undo(500) after 600 placements, each undo starts from the same game"""
+    for (set_name, piece_set), (width, height) in itertools.product(PIECE_SETS.items(), BOARD_SIZES):
+        if (width, height) not in playable_sizes(piece_set):
+            continue
+        game = make_game(piece_set, width, height)
+        report("history", set_name, board_name(width, height), "update_history", time_calls(game.update_history))
+
+    for (set_name, piece_set), (width, height) in itertools.product(PIECE_SETS.items(), [(10, 1004), (20, 1004)]):
+        game = make_game(piece_set, width, height)
+        play_random(game, random.Random(0), 600)
+        saved_history, saved_board, saved_pieces = game.game_history, game.game_board.copy(), game.pieces_placed
+
+        def setup():
+            # undo eats the history so every call has to start from the saved game
+            game.game_history = copy.deepcopy(saved_history)
+            game.update_game_board(saved_board)
+            game.pieces_placed = saved_pieces
+
+        for amount in UNDO_AMOUNTS:
+            report("history", set_name, board_name(width, height), f"undo({amount})",
+                   time_with_setup(setup, lambda: game.undo(amount), min_time=MIN_TIME / 5)) # the deepcopy in setup is slow, keep the wait down
+        print(f"{'':<11} {set_name:<6} {board_name(width, height):<8} {saved_history.nbytes_per_entry()} bytes per history entry, plus {width} per cleared row")
+
+def bench_generate_bag():
+    for (set_name, piece_set), gen_type in itertools.product(PIECE_SETS.items(), GEN_TYPES):
+        game = make_game(piece_set, 10, 24)
+        game.piece_gen_type = gen_type
+        report("bags", set_name, "-", gen_type, time_calls(lambda: game.generate_bag(gen_type)))
+
+def bench_previews():
+    """The next/hold/top-out boards that get rebuilt on every spawn"""
+    for (set_name, piece_set), (width, height) in itertools.product(PIECE_SETS.items(), BOARD_SIZES):
+        if (width, height) not in playable_sizes(piece_set):
+            continue
+        game = make_game(piece_set, width, height)
+        fill_board(game, random.Random(0))
+        game.hold_guideline()
+        for func in (game.gen_next_boards, game.gen_hold_boards, game.gen_topout_board):
+            report("previews", set_name, board_name(width, height), func.__name__, time_calls(func))
+
+def resize_ui(ui, width, height):
+    """Point the ui at a different board size, same math as main.toggle_fullscreen"""
+    settings.BOARD_WIDTH = width
+    settings.BOARD_HEIGHT = height
+    settings.BOARD_MAIN_HEIGHT = height - settings.BOARD_EXTRA_HEIGHT
+    if settings.BOARD_WIDTH / settings.WINDOW_WIDTH < settings.BOARD_HEIGHT / settings.WINDOW_HEIGHT:
+        settings.CELL_SIZE = settings.WINDOW_HEIGHT//(settings.BOARD_HEIGHT - settings.BOARD_EXTRA_HEIGHT + settings.BOARD_PADDING)
+    else:
+        settings.CELL_SIZE = settings.WINDOW_WIDTH//(settings.BOARD_WIDTH + 20)
+    ui.BOARD_WIDTH_PX = settings.CELL_SIZE * settings.BOARD_WIDTH
+    ui.BOARD_HEIGHT_PX = settings.CELL_SIZE * (settings.BOARD_HEIGHT - settings.BOARD_EXTRA_HEIGHT)
+    ui.BOARD_PX_OFFSET_X = (settings.WINDOW_WIDTH - ui.BOARD_WIDTH_PX)/2
+    ui.BOARD_PX_OFFSET_Y = (settings.WINDOW_HEIGHT - ui.BOARD_HEIGHT_PX-(settings.WINDOW_HEIGHT * 0.05))/2 - (settings.BOARD_EXTRA_HEIGHT * settings.CELL_SIZE)
+
+def bench_ui():
+    """Every draw_* that main.game_loop calls, on a half filled board"""
+    pygame.init()
+    import ui, pieces # ui opens the (dummy) window when it's imported
+    pieces.init_skins()
+    saved_sizes = settings.BOARD_WIDTH, settings.BOARD_HEIGHT, settings.BOARD_MAIN_HEIGHT, settings.CELL_SIZE
+    saved_game = engine.game
+
+    for (set_name, piece_set), (width, height) in itertools.product(PIECE_SETS.items(), BOARD_SIZES):
+        if (width, height) not in playable_sizes(piece_set):
+            continue
+        game = make_game(piece_set, width, height)
+        fill_board(game, random.Random(0))
+        game.hold_guideline()
+        game.gen_topout_board()
+        if game.topout_board is None: # always draw the top-out warning so it gets timed too
+            game.topout_board = game.piece_table.shapes[1][0]
+        engine.game = game
+        resize_ui(ui, width, height)
+
+        draws = [
+            ("draw_background", ui.draw_background),
+            ("draw_board", ui.draw_board),
+            ("draw_board_background", ui.draw_board_background),
+            ("draw_grid_lines", ui.draw_grid_lines),
+            ("draw_ghost_board", ui.draw_ghost_board),
+            ("draw_piece_board", ui.draw_piece_board),
+            ("draw_topout_board", ui.draw_topout_board),
+            ("draw_stats_panel_bg", ui.draw_stats_panel_bg), # has to run before draw_stats_panel_text
+            ("draw_stats_panel_text", lambda: ui.draw_stats_panel_text(PPS="2.5", TIME_S="1:23", TIME_MS=".456", CLEARED="40")),
+            ("draw_next_panel", ui.draw_next_panel),
+            ("draw_hold_panel", ui.draw_hold_panel),
+            ("draw_score_panel", lambda: ui.draw_score_panel(level="99", score="99,999")),
+            ("draw_fps", lambda: ui.draw_fps("60")),
+        ]
+        for name, draw in draws:
+            report("ui", set_name, board_name(width, height), name, time_calls(draw, min_time=MIN_TIME / 2, batch=10))
+
+    settings.BOARD_WIDTH, settings.BOARD_HEIGHT, settings.BOARD_MAIN_HEIGHT, settings.CELL_SIZE = saved_sizes
+    engine.game = saved_game
+
+BENCHMARKS = {
+    "collisions": bench_collisions,
+    "drop": bench_drop,
+    "move": bench_move,
+    "step": bench_step,
+    "rotate": bench_rotate,
+    "placements": bench_placements,
+    "bot": bench_bot,
+    "search": bench_search,
+    "vecenv": bench_vecenv,
+    "rollout": bench_rollout,
+    "pcsolver": bench_pcsolver,
+    "openings": bench_openings,
+    "combo": bench_combo,
+    "puzzlegen": bench_puzzlegen,
+    "presets": bench_presets,
+    "lock": bench_lock,
+    "history": bench_history,
+    "bags": bench_generate_bag,
+    "previews": bench_previews,
+    "ui": bench_ui,
+}
+
+def result_key(result):
+    return result["benchmark"], result["piece_set"], result["board"], result["detail"]
+
+def save_results(path):
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path, "w") as file:
+        json.dump({
+            "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "numpy": numpy.__version__,
+            "pygame": pygame.version.ver,
+            "board_backend": settings.BOARD_BACKEND,
+            "results": results,
+        }, file, indent=1)
+    print(f"saved {len(results)} results to {path}")
+
+def compare_results(path):
+    with open(path) as file:
+        old_results = {result_key(result): result["value"] for result in json.load(file)["results"]}
+    print(f"\ncompared to {path}:")
+    for result in results:
+        old_value = old_results.get(result_key(result))
+        if old_value:
+            benchmark, piece_set, board, detail = result_key(result)
+            print(f"{benchmark:<11} {piece_set:<6} {board:<8} {detail:<26} {result['value'] / old_value:>8.2f}x")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Time the engine and renderer hot paths.")
+    parser.add_argument("names", nargs="*", help=f"benchmarks to run, all of them by default ({', '.join(BENCHMARKS)})")
+    parser.add_argument("--min-time", type=float, default=MIN_TIME, help="seconds spent on each measurement")
+    parser.add_argument("--json", default=None, help="where to save the results (default benchmark_results/<date>.json)")
+    parser.add_argument("--no-save", action="store_true", help="don't write a json file")
+    parser.add_argument("--compare", default=None, help="an older json file to compare this run against")
+    options = parser.parse_args()
+    for name in options.names:
+        if name not in BENCHMARKS:
+            parser.error(f"unknown benchmark {name!r}, pick from {', '.join(BENCHMARKS)}")
+    MIN_TIME = options.min_time
+
+    for name in options.names or list(BENCHMARKS):
+        BENCHMARKS[name]()
+
+    if not options.no_save:
+        save_results(options.json or os.path.join(engine.script_dir, "benchmark_results", time.strftime("%Y-%m-%d_%H-%M-%S") + ".json"))
+    if options.compare:
+        compare_results(options.compare)
@@ -0,0 +1,88 @@
+"""
+bitboard.py is the fast board backend for collision checks.
+The whole board is stored as one integer (row r starts at bit r * width, bit n of a row = column n),
+and every piece rotation gets its mask precomputed for every x position,
+so checking a piece against the board is a shift and one AND instead of a loop over cells.
+It also keeps each column as an integer (bit n = row n), which is what drop_distance uses
+to find where a piece lands without stepping down one row at a time.
+"""
+
+import numpy
+
+_mask_cache = {} # (id(piece_table), board_width) -> mask table, shared between engines
+
+def build_piece_masks(piece_table, board_width):
+    """
+    Returns (pad, masks) where masks is {piece_id: [rotation][x + pad]} and each entry is a tuple
+    of (top_row, bottom_row, mask), or None if part of the piece would be outside the side walls at that x.
+    mask has every row of the piece packed together the same way as BitBoard.packed, starting from the piece's top row.
+    pad is the biggest shape size in the set, so x can go as far left as -pad.
+    """
+    key = (id(piece_table), board_width)
+    if key in _mask_cache:
+        return _mask_cache[key]
+
+    pad = piece_table.size
+    masks = {}
+    for piece_id in range(1, piece_table.piece_types + 1):
+        rotations = []
+        for cells, (leftmost, rightmost) in zip(piece_table.minos[piece_id], piece_table.column_extents[piece_id]):
+            by_x = []
+            for x in range(-pad, board_width):
+                if x + leftmost < 0 or x + rightmost > board_width - 1: # would poke through a wall
+                    by_x.append(None)
+                    continue
+                top_row = min(row for row, col in cells)
+                mask = 0
+                for row, col in cells:
+                    mask |= 1 << ((row - top_row) * board_width + x + col)
+                by_x.append((top_row, max(row for row, col in cells), mask))
+            rotations.append(by_x)
+        masks[piece_id] = rotations
+
+    _mask_cache[key] = (pad, masks)
+    return pad, masks
+
+class BitBoard:
+    def __init__(self, width, height):
+        self.width = width
+        self.height = height
+        self.columns = [0] * width
+        self.packed = 0
+
+    def load(self, board):
+        """Rebuild the board and column masks from a numpy board (anything non-zero counts as filled)"""
+        filled = board != 0
+        # packbits + from_bytes instead of a matmul so any board size fits, rows go back to back
+        self.packed = int.from_bytes(numpy.packbits(filled, bitorder="little").tobytes(), "little")
+        column_bytes = numpy.packbits(filled, axis=0, bitorder="little").T
+        self.columns = [int.from_bytes(column.tobytes(), "little") for column in column_bytes]
+
+    def collides(self, piece_mask, y):
+        """piece_mask is one entry from build_piece_masks (None means it hit a wall)"""
+        if piece_mask is None:
+            return True
+        top_row, bottom_row, mask = piece_mask
+        if y + bottom_row >= self.height or y + top_row < 0: # floor, or poking out the top of the board
+            return True
+        # one AND for the whole piece, no matter how many rows it covers (pentominos have up to 5)
+        return (self.packed >> ((y + top_row) * self.width)) & mask != 0
+
+    def drop_distance(self, drop_profile, x, y):
+        """
+        How many rows a piece at (x, y) can fall before it lands. The piece has to be in a valid spot already.
+        drop_profile is the piece's (column, bottom_row) pairs from the piece table,
+        so this only looks at one column mask per pair, no matter how tall the board is.
+        """
+        columns = self.columns
+        distance = self.height
+        for col, bottom_row in drop_profile:
+            start = y + bottom_row + 1 # first row under this part of the piece
+            below = columns[x + col] >> start
+            if below:
+                free_rows = (below & -below).bit_length() - 1 # empty cells before the first filled one
+            else:
+                free_rows = self.height - start # nothing under it, falls to the floor
+            if free_rows < distance:
+                distance = free_rows
+        return distance
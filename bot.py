@@ -0,0 +1,167 @@
+"""
+bot.py is the computer player. For every piece it gets each spot the current piece (and the piece hold would
+give it) can lock in from placements.find_placements, builds the board every one of them leaves as one
+(placements, width) array of column bitmasks (like bitboard.py) and scores them all at once with numpy.
+The best one gets played through the normal engine functions (hold_guideline, the path's inputs, hard_drop),
+so the bot plays by the same rules as a person, in any gamemode, and shows up in replays the same way.
+"""
+
+import numpy
+
+import placements, settings
+
+# how much each board feature is worth, the first four are the usual weights from genetic algorithm tetris bots
+WEIGHTS = {
+    "height": -0.510066, # all the column heights added up
+    "lines": 0.760666, # lines cleared by the placement
+    "holes": -0.35663, # empty cells with something above them
+    "bumpiness": -0.184483, # height differences between neighbouring columns
+    "wells": -0.1, # how far columns are sunk below both neighbours (walls count as full height)
+}
+
+MAX_BOARD_HEIGHT = 64 # board_columns keeps a whole column in one uint64
+
+_column_bits_cache = {} # id(piece_table) -> [piece, rotation, column of the box] bits of the cells in that column
+
+def column_bits(piece_table):
+    if id(piece_table) not in _column_bits_cache:
+        bits = numpy.zeros((piece_table.piece_types + 1, 4, piece_table.size), dtype=numpy.uint64)
+        for piece_id in range(1, piece_table.piece_types + 1):
+            for rotation, cells in enumerate(piece_table.minos[piece_id]):
+                for row, col in cells:
+                    bits[piece_id, rotation, col] |= numpy.uint64(1 << row)
+        _column_bits_cache[id(piece_table)] = bits
+    return _column_bits_cache[id(piece_table)]
+
+def check_board_height(height):
+    """Raises a ValueError for a board too tall for board_columns, before anything tries to play on it"""
+    if height > MAX_BOARD_HEIGHT:
+        raise ValueError(f"the bot only plays on boards up to {MAX_BOARD_HEIGHT} rows high (extra rows included), this one has {height}")
+
+def board_columns(board):
+    """A board as one uint64 per column, bit n = row n (like bitboard.py's columns)"""
+    row_bits = numpy.left_shift(numpy.uint64(1), numpy.arange(board.shape[0], dtype=numpy.uint64))
+    return ((board != 0) * row_bits[:, None]).sum(axis=0, dtype=numpy.uint64)
+
+def board_features(columns, height):
+    """(N, width) uint64 column boards -> {feature: (N,) array} for every feature in WEIGHTS except lines"""
+    lowest_bit = columns & (~columns + numpy.uint64(1)) # the top filled cell of each column (row 0 is the top)
+    top_rows = numpy.log2(lowest_bit, where=columns != 0, out=numpy.full(columns.shape, float(height))).astype(numpy.intp)
+    column_heights = height - top_rows
+    board_mask = numpy.uint64((1 << height) - 1)
+    under_top = ~(lowest_bit - numpy.uint64(1)) & board_mask # every row from the top cell down, nothing for an empty column
+    walls = numpy.full((len(columns), 1), height)
+    sides = numpy.hstack((walls, column_heights, walls))
+    return {
+        "height": column_heights.sum(axis=1),
+        "holes": numpy.bitwise_count(under_top & ~columns).sum(axis=1),
+        "bumpiness": numpy.abs(numpy.diff(column_heights, axis=1)).sum(axis=1),
+        "wells": numpy.maximum(numpy.minimum(sides[:, :-2], sides[:, 2:]) - column_heights, 0).sum(axis=1),
+    }
+
+def hold_piece(game):
+    """The piece hold_guideline would swap in right now, or None if it won't let the piece be held"""
+    if game.holds_used >= game.max_hold_pieces and not game.infinite_holds:
+        return None
+    if len(game.hold_pieces) >= game.max_hold_pieces:
+        return game.hold_pieces[0]
+    return (game.piece_bags[0] + game.piece_bags[1])[1]
+
+def hold_placements(game, with_paths=True):
+    """find_placements for the piece hold would swap in, starting from where it would spawn"""
+    piece = hold_piece(game)
+    if piece is None:
+        return []
+    current = game.piece_bags[0][0]
+    saved_position = game.piece_x, game.piece_y, game.piece_rotation
+    game.piece_bags[0][0] = piece
+    try:
+        game.update_starting_coords() # same as hold_guideline does
+        if game.collides_at(piece, game.piece_rotation, game.piece_x, game.piece_y): # holding would top out
+            return []
+        return placements.find_placements(game, with_paths)
+    finally:
+        game.piece_bags[0][0] = current
+        game.update_starting_coords()
+        game.piece_x, game.piece_y, game.piece_rotation = saved_position
+
+def place_pieces(piece_table, columns, piece, x, y, rotation):
+    """
+    Locks one piece on each of columns ((N, width) uint64 boards, see board_columns), piece i at
+    (x[i], y[i], rotation[i]), and clears the full rows. Returns (columns, lines cleared on each).
+    """
+    size, width = piece_table.size, columns.shape[1]
+    padded = numpy.zeros((len(columns), width + 2 * size), dtype=numpy.uint64) # columns of nothing on both sides for the empty edges of the piece box
+    padded[:, size:size + width] = columns
+    box = (x + size)[:, None] + numpy.arange(size)
+    rows = numpy.arange(len(columns))[:, None]
+    bits, shift = column_bits(piece_table)[piece, rotation], numpy.abs(y).astype(numpy.uint64)[:, None]
+    padded[rows, box] |= numpy.where(y[:, None] >= 0, bits << shift, bits >> shift) # y is negative when the top of the box is above the board
+    columns = padded[:, size:size + width]
+
+    full_rows = numpy.bitwise_and.reduce(columns, axis=1)
+    lines = numpy.bitwise_count(full_rows).astype(numpy.intp)
+    while full_rows.any(): # take the cleared rows out one at a time, the rows above each one move down a row
+        row = full_rows & (~full_rows + numpy.uint64(1))
+        above = numpy.where(row != 0, row - numpy.uint64(1), numpy.uint64(0))[:, None]
+        columns = ((columns & above) << numpy.uint64(1)) | (columns & ~(above | row[:, None]))
+        full_rows &= ~row
+    return columns, lines
+
+def result_columns(game, candidates):
+    """(columns, lines) after locking each of candidates (find_placements tuples) on game's board, as board_columns"""
+    pieces_xyr = numpy.array([(piece, x, y, rotation) for piece, x, y, rotation, path in candidates], dtype=numpy.intp)
+    columns = numpy.tile(board_columns(game.game_board), (len(candidates), 1))
+    return place_pieces(game.piece_table, columns, *pieces_xyr.T)
+
+def score_boards(weights, columns, lines, height):
+    """weights (like WEIGHTS) times the features of every board in columns, plus the lines that made them"""
+    features = board_features(columns, height)
+    features["lines"] = lines
+    return sum(weight * features[name] for name, weight in weights.items())
+
+class Bot:
+    def __init__(self, weights=None, pps=None):
+        self.weights = dict(WEIGHTS if weights is None else weights)
+        self.pps = settings.BOT_PPS if pps is None else pps
+
+    def evaluate(self, game, candidates):
+        """Scores for every one of candidates, all scored in one batch"""
+        columns, lines = result_columns(game, candidates)
+        return score_boards(self.weights, columns, lines, game.board_height)
+
+    def choose(self, game):
+        """(hold first or not, placement tuple) for the best move, or None if the piece can't go anywhere"""
+        check_board_height(game.board_height)
+        candidates = placements.find_placements(game)
+        held = len(candidates)
+        candidates += hold_placements(game)
+        if not candidates:
+            return None
+        best = int(numpy.argmax(self.evaluate(game, candidates))) # first best wins, find_placements puts short paths first
+        return best >= held, candidates[best]
+
+    def play_move(self, game):
+        """Plays one piece: holds if that's better, does the inputs to get there and hard drops"""
+        choice = self.choose(game)
+        if choice is None:
+            game.hard_drop()
+            return
+        use_hold, (piece, x, y, rotation, path) = choice
+        if use_hold:
+            game.hold_guideline(game.infinite_holds)
+        placements.apply_path(game, path)
+        game.hard_drop()
+
+    def think(self, game, budget_ms=None):
+        """The plain bot decides everything in play_move, there's nothing to work out ahead of time"""
+        pass
+
+    def update(self, game):
+        """Called every simulation tick, plays a piece every 1 / pps seconds of game time"""
+        if game.queue_spawn_piece: # entry delay, no piece to move yet
+            return
+        if not game.timers.running("bot"): # new game, reset_game stops every timer
+            game.timers.start("bot")
+        if game.timers.periods("bot", 1000 / self.pps):
+            self.play_move(game)
@@ -0,0 +1,218 @@
+"""
+combo.py is for 4-wide combo practice. In a 4 wide well (the default board) a combo means every piece has to
+clear a line, so all that matters is the residue: the few cells left sticking up after each clear. There are
+only so many of those, so combo.py works them all out ahead of time as a graph, a node for every residue and an
+edge for every placement of every piece that clears a line and leaves another residue. Every node also gets a
+table of how many pieces in a row it can take for every queue (a queue prefix, current piece first, up to
+--depth long), filled in backwards from the shorter queues like any other dynamic programming.
+
+    python combo.py                                      tetrominos on the settings.py board, Guideline rules
+    python combo.py --gamemode Classic                   the same for another gamemode's spins and spawn
+    python combo.py --pentominos -j 8                    pentominos, a few minutes on one core
+
+The nodes are every residue up to --seed-rows rows, plus everything combos from those lead to, as long as it
+stays under --max-rows (a combo that gets taller than that is counted as dropped). A residue is kept as
+pcsolver's bitboard int, bottom row first, so while playing finding the node for the board is one dict lookup,
+and the moves for a spawn are just that node's edges for the piece, each looked up once in its next node's table.
+"""
+
+import os
+import sys
+import time
+import hashlib
+import argparse
+import multiprocessing
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy
+
+import engine, gamemodes, pcsolver, search, settings
+
+_graphs_cache = {} # graph file path -> ComboGraph, or None if there isn't one
+
+def rules_id(rules):
+    """64 bit fingerprint of the rules a graph's placements depend on"""
+    return int.from_bytes(hashlib.blake2b(repr(rules.key).encode(), digest_size=8).digest(), "little")
+
+def graph_path(rules):
+    """Where the graph for rules lives, one per piece set, board size and spin rules (the fingerprint tells those apart)"""
+    name = f"{rules.piece_set}_{rules.board_width}x{rules.board_height}_{rules_id(rules):016x}.npz"
+    return os.path.join(engine.script_dir, settings.COMBO_GRAPHS, name)
+
+def seed_shapes(width, rows):
+    """Every residue (bitboard int) up to rows rows high, with no full rows and no empty row under a filled one"""
+    row_cells = range(1, (1 << width) - 1) # anything but an empty or a full row
+    shapes, level = [0], [0]
+    for row in range(rows):
+        level = [shape | cells << row * width for shape in level for cells in row_cells]
+        shapes += level
+    return shapes
+
+def shape_edges(job):
+    """
+    [(queue piece, placed piece, x, y, rotation, next residue)] for every placement from residue that clears a
+    line and leaves a residue no taller than max_rows
+    """
+    rules, residue, max_rows = job
+    width, height = rules.board_width, rules.board_height
+    edges = []
+    for piece in range(1, rules.piece_table.piece_types + 1):
+        for piece_id, x, y, rotation, mask in pcsolver.cached_placements(rules, residue, piece):
+            field, rows_left = pcsolver.clear_lines(residue | mask, height, width)
+            if rows_left < height and field.bit_length() <= max_rows * width:
+                edges.append((piece, piece_id, x, y, rotation, field))
+    return residue, edges
+
+def survival_tables(edge_start, edge_next, node_count, piece_types, depth):
+    """
+    [(nodes, piece_types ** k) uint8 array for k in 0..depth], the pieces in a row node can take with queue
+    (current piece first), the queue as a base piece_types number. A piece with no edges ends it there.
+    """
+    tables = [numpy.zeros((node_count, 1), dtype=numpy.uint8)]
+    counts = numpy.diff(edge_start).reshape(node_count, piece_types)
+    for length in range(1, depth + 1):
+        shorter = tables[-1]
+        table = numpy.zeros((node_count, piece_types, shorter.shape[1]), dtype=numpy.uint8)
+        for piece in range(piece_types):
+            nodes = numpy.flatnonzero(counts[:, piece])
+            if not len(nodes):
+                continue
+            starts = edge_start[nodes * piece_types + piece]
+            edges = numpy.concatenate([numpy.arange(start, start + count) for start, count in zip(starts, counts[nodes, piece])])
+            values = shorter[edge_next[edges]] + 1
+            table[nodes, piece] = numpy.maximum.reduceat(values, numpy.cumsum(counts[nodes, piece]) - counts[nodes, piece], axis=0)
+        tables.append(table.reshape(node_count, -1))
+    return tables
+
+def build(rules, seed_rows, max_rows, depth, processes=1, log=print):
+    """The graph for rules as a dict of arrays, ready for numpy.savez"""
+    piece_types = rules.piece_table.piece_types
+    residues = seed_shapes(rules.board_width, seed_rows)
+    index = {residue: number for number, residue in enumerate(residues)}
+    found_edges = {}
+    pool = multiprocessing.Pool(processes) if processes > 1 else None
+    start = time.perf_counter()
+    try:
+        frontier = residues
+        while frontier: # breadth first, a level of new residues at a time
+            jobs = [(rules, residue, max_rows) for residue in frontier]
+            results = pool.imap_unordered(shape_edges, jobs, 16) if pool is not None else map(shape_edges, jobs)
+            frontier = []
+            for residue, edges in results:
+                found_edges[residue] = edges
+                for edge in edges:
+                    if edge[5] not in index:
+                        index[edge[5]] = len(residues)
+                        residues.append(edge[5])
+                        frontier.append(edge[5])
+            log(f"{len(found_edges)} residues, {len(frontier)} new  {time.perf_counter() - start:.1f}s")
+    finally:
+        if pool is not None:
+            pool.terminate()
+
+    edge_start, edge_rows = [0], [] # the edges of node n and queue piece p are edge_start[n * piece_types + p - 1] up to the next one
+    for residue in residues:
+        for piece in range(1, piece_types + 1):
+            edge_rows += [edge for edge in found_edges[residue] if edge[0] == piece]
+            edge_start.append(len(edge_rows))
+    edge_start = numpy.array(edge_start, dtype=numpy.int64)
+    edges = numpy.array([edge[1:5] + (index[edge[5]],) for edge in edge_rows], dtype=numpy.int64).reshape(-1, 5)
+    graph = {
+        "rules": numpy.array([rules_id(rules)], dtype=numpy.uint64),
+        "residues": numpy.array(residues, dtype=numpy.uint64),
+        "edge_start": edge_start,
+        "edge_moves": edges[:, :4].astype(numpy.int8), # placed piece, x, y, rotation
+        "edge_next": edges[:, 4].astype(numpy.int32),
+    }
+    for length, table in enumerate(survival_tables(edge_start, graph["edge_next"], len(residues), piece_types, depth)):
+        graph[f"survival_{length}"] = table
+    return graph
+
+class ComboGraph:
+    """A graph file loaded for a game. moves(game) is every move for the current piece that keeps the combo going longest"""
+    def __init__(self, path):
+        with numpy.load(path) as graph:
+            self.rules = int(graph["rules"][0])
+            residues = graph["residues"].tolist()
+            self.edge_start = graph["edge_start"].tolist()
+            self.edge_moves = [tuple(move) for move in graph["edge_moves"].tolist()]
+            self.edge_next = graph["edge_next"].tolist()
+            self.tables = []
+            while f"survival_{len(self.tables)}" in graph:
+                self.tables.append(graph[f"survival_{len(self.tables)}"])
+        self.index = {residue: node for node, residue in enumerate(residues)}
+        self.depth = len(self.tables) - 1
+        self.piece_types = (len(self.edge_start) - 1) // len(residues)
+        self.last = None # (state key, moves), moves() gets called every frame
+
+    def survival(self, node, queue):
+        """Pieces in a row node can take with queue, as far as the tables go"""
+        queue = queue[:self.depth]
+        code = 0
+        for piece in queue:
+            code = code * self.piece_types + piece - 1
+        return int(self.tables[len(queue)][node, code])
+
+    def options(self, node, piece, rest):
+        """(pieces survived, move) for every edge of piece from node, rest being the queue after it"""
+        start, end = self.edge_start[node * self.piece_types + piece - 1], self.edge_start[node * self.piece_types + piece]
+        return [(1 + self.survival(self.edge_next[edge], rest), self.edge_moves[edge]) for edge in range(start, end)]
+
+    def moves(self, game):
+        """(held first or not, piece, x, y, rotation) for the best combo moves from the current residue, [] if it isn't one"""
+        key = id(game), game.state_hash(), game.holds_used, game.queue_spawn_piece
+        if self.last is not None and self.last[0] == key:
+            return self.last[1]
+        moves = []
+        node = self.index.get(pcsolver.board_field(game.game_board))
+        if node is not None and not game.queue_spawn_piece:
+            queue = (game.piece_bags[0] + game.piece_bags[1])[:game.next_queue_size + 1]
+            options = [(value, (False,) + move) for value, move in self.options(node, queue[0], queue[1:])]
+            if game.max_hold_pieces == 1 and (game.holds_used < game.max_hold_pieces or game.infinite_holds):
+                if game.hold_pieces:
+                    options += [(value, (True,) + move) for value, move in self.options(node, game.hold_pieces[0], queue[1:])]
+                elif len(queue) > 1:
+                    options += [(value, (True,) + move) for value, move in self.options(node, queue[1], queue[2:])]
+            if options:
+                best = max(value for value, move in options)
+                moves = [move for value, move in options if value == best]
+        self.last = key, moves
+        return moves
+
+def graph_for(game):
+    """The ComboGraph for game's rules, loaded the first time it's asked for, or None if none was built"""
+    rules = search.Rules(game)
+    path = graph_path(rules)
+    if path not in _graphs_cache:
+        graph = ComboGraph(path) if os.path.exists(path) else None
+        _graphs_cache[path] = graph if graph is not None and graph.rules == rules_id(rules) else None
+    return _graphs_cache[path]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build the 4-wide combo graph for a piece set.")
+    parser.add_argument("--pentominos", action="store_true", help="the pentomino piece set instead of tetrominos")
+    parser.add_argument("--gamemode", default="Guideline", help="gamemode on top of the piece set (it decides 180 spins and the spawn)")
+    parser.add_argument("--board", type=lambda text: tuple(int(part) for part in text.lower().split("x")),
+                        default=(settings.BOARD_WIDTH, settings.BOARD_HEIGHT), help="WIDTHxHEIGHT (height includes the extra rows)")
+    parser.add_argument("--seed-rows", type=int, default=2, help="every residue up to this many rows is a node")
+    parser.add_argument("--max-rows", type=int, default=4, help="residues taller than this end the combo")
+    parser.add_argument("--depth", type=int, default=None, help="longest queue the survival tables go to (default 4, 2 for pentominos)")
+    parser.add_argument("-j", "--processes", type=int, default=os.cpu_count(), help="worker processes (1 runs in this process)")
+    options = parser.parse_args(argv)
+
+    game = engine.Engine(board_width=options.board[0], board_height=options.board[1], seed=0)
+    game.load_gamemode(gamemodes.PentominoBase if options.pentominos else gamemodes.TetraminoBase)
+    game.load_gamemode(getattr(gamemodes, options.gamemode))
+    rules = search.Rules(game)
+    depth = options.depth if options.depth is not None else (2 if options.pentominos else 4)
+    start = time.perf_counter()
+    graph = build(rules, options.seed_rows, options.max_rows, depth, options.processes)
+    path = graph_path(rules)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    numpy.savez(path, **graph)
+    print(f"{len(graph['residues'])} residues, {len(graph['edge_next'])} moves in {path} ({os.path.getsize(path):,} bytes)  {time.perf_counter() - start:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
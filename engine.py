@@ -1,891 +1,946 @@
-"""
-engine.py is the core engine of the game. Has functions for handling
-piece movement, rotation, collision, gravity, etc.
-These functions are then run in main.py, although
-some functions call each-other on their own.
-"""
-
-import math
-import random
-import os
-import time
-import copy
-import pygame
-import numpy
-
-import pieces, settings
-
-pygame.init()
-
-STATE = 0
-running = True # so we can turn the game loop on and off
-
-script_dir = os.path.dirname(os.path.abspath(__file__))
-skins_dir = os.path.join(script_dir, "skin")
-
-frametime_clock = pygame.time.Clock()
-arr_clock = pygame.time.Clock()
-das_clock = pygame.time.Clock()
-sdr_clock = pygame.time.Clock()
-das_reset_clock = pygame.time.Clock()
-are_clock = pygame.time.Clock()
-gravity_clock = pygame.time.Clock()
-lockdown_clock = pygame.time.Clock()
-onekf_prac_clock = pygame.time.Clock()
-prevent_harddrop_clock = pygame.time.Clock()
-
-lines_cleared, pieces_placed, pps, bag_count, history_index, last_move_dir = 0, 0, 0, 0, 0, 0
-rng_seed = random.getstate()
-rng_state = rng_seed
-history_index = 0
-das_timer, arr_timer, sdr_timer, das_reset_timer, onekf_prac_timer = 0, 0, 0, 0, 0
-are_timer, gravity_timer, lockdown_timer, prevent_harddrop_timer = 0, 0, 0, 0
-das_started, arr_started, sdr_started, das_reset_started, onekf_prac_started = False, False, False, False, False
-prevent_harddrop_started = False
-softdrop_overrides = True
-game_state_changed = False
-board_state_changed = False
-queue_spawn_piece = True
-
-piece_bags = [[],[]]
-hold_pieces = []
-
-# gamemode specific vars (defaults)
-pieces_dict = pieces.tetra_dict
-piece_inversions = pieces.TETRA_INVERSIONS
-piece_gen_type = "BAG"
-lockdown_type = "GUIDELINE"
-next_queue_size = 4 # next pieces count is the user settings max
-                    # next_queue_size will sometimes be smaller than the max depending on the gamemode
-das_threshold = settings.DAS_THRESHOLD # 266.6666666
-arr_threshold = settings.ARR_THRESHOLD # 100
-sdr_threshold = settings.SDR_THRESHOLD # 33.33333333
-allow_sonic_drop = True
-allow_180 = True
-allow_mirror = False
-are_threshold = 1000
-entry_delay = 0
-max_hold_pieces = 1
-spawn_y_offset = 0
-infinite_holds = False
-starting_gravity = 0 # measured in G (1g = 1 fall/frame, 20g = max speed at 60fps (should jump to like 200g though for more consistency)
-mino_count = 4
-piece_types = 7
-
-piece_size = mino_count
-holds_used = 0
-current_gravity = starting_gravity
-
-hold_boards = numpy.zeros((max_hold_pieces, 5, 5), dtype=numpy.int8)
-next_boards = numpy.zeros((next_queue_size, 5, 5), dtype=numpy.int8)
-topout_board = numpy.zeros((5, 5), dtype=numpy.int8)
-
-onekf_key_array = numpy.zeros((4, 10), dtype=int) # int8 is too small
-
-starting_x = 3
-starting_y = 2
-STARTING_ROTATION = 0
-
-game_board = numpy.zeros((settings.BOARD_HEIGHT, settings.BOARD_WIDTH), numpy.int8)
-game_history = [None] * settings.MAX_HISTORY
-piece_board = numpy.zeros((piece_size, piece_size), numpy.int8)
-ghost_board = numpy.zeros_like(piece_board)
-
-piece_x, ghost_piece_x = starting_x, starting_x
-piece_y, ghost_piece_y = starting_y, starting_y
-piece_rotation = STARTING_ROTATION
-lockdown_start_x = starting_x
-lockdown_start_y = -settings.BOARD_EXTRA_HEIGHT
-lockdown_start_rotation = STARTING_ROTATION
-lockdown_resets = 15
-
-class Timer:
-    def __init__(self):
-        self.start_time = None
-        self.running = False
-
-    def start(self):
-        self.start_time = time.perf_counter()
-        self.running = True
-
-    def stop(self):
-        self.running = False
-
-    def reset(self):
-        self.start_time = time.perf_counter()
-
-    def split_strings(self):
-        """Return ('M:SS', '.XX') with hundredths of a second."""
-        if not self.running or self.start_time is None:
-            return "0:00", ".00"
-
-        elapsed = time.perf_counter() - self.start_time
-        minutes = int(elapsed // 60)
-        seconds = int(elapsed % 60)
-        hundredths = int((elapsed * 100) % 100)  # rounds to .XX
-
-        return f"{minutes}:{seconds:02d}", f".{hundredths:02d}"
-
-    def get_seconds(self):
-        """Return the time in seconds as an integer"""
-        if not self.running or self.start_time is None:
-            return 0
-
-        elapsed = time.perf_counter() - self.start_time
-
-        return elapsed
-
-timer = Timer()
-
-def load_gamemode(gamemode):
-    global das_threshold, arr_threshold, sdr_threshold, are_threshold
-    global pieces_dict, piece_types, piece_inversions, mino_count
-    global max_hold_pieces
-    for attr, value in vars(gamemode).items():
-        globals()[attr] = value
-    # regenerate the bags
-    piece_bags[0] = generate_bag(piece_gen_type)
-    piece_bags[1] = generate_bag(piece_gen_type)
-
-def update_starting_coords():
-    global piece_size, piece_x, piece_y, starting_x, starting_y, piece_rotation
-    piece_shape = pieces_dict[piece_bags[0][0]]["shapes"][STARTING_ROTATION]
-    piece_size = piece_shape.shape[1]
-    height_offset = numpy.where(numpy.any(piece_shape != 0, axis=1))[0][0]
-    starting_x = (settings.BOARD_WIDTH - piece_size) // 2 # dynamically calculate starting position based on board and piece size.
-    starting_y = settings.BOARD_EXTRA_HEIGHT - piece_size//5 - height_offset + spawn_y_offset # need to subtract the blank space in the piece here
-    piece_x = starting_x
-    piece_y = starting_y
-    piece_rotation = STARTING_ROTATION
-    
-    # starting_x = 0
-    # piece_x = starting_x
-    # piece_y = 1
-    # starting_y = piece_y
-
-def spawn_piece():
-    global piece_x, piece_y, piece_rotation, next_boards, topout_board, piece_board, queue_spawn_piece, holds_used, game_state_changed, board_state_changed
-    queue_spawn_piece = False
-    update_starting_coords()
-    holds_used = 0
-    game_state_changed = True
-
-    piece_board = pieces_dict[piece_bags[0][0]]["shapes"][piece_rotation] * piece_bags[0][0]
-    gen_next_boards()
-    gen_topout_board()
-    update_ghost_piece()
-    # top-out check
-    if check_collisions(0, 0, piece_board):
-        top_out()
-
-def generate_bag(type="BAG"):
-    global bag_count
-    bag_count += 1
-    generated_bag = []
-
-    if (type == "BAG"):
-        for piece, data in pieces_dict.items(): # put all the pieces in the bag
-            # Skip if rare piece (x) and we're on an odd bag
-            if data.get("rare", False) and bag_count % 2 == 1:
-                continue
-            generated_bag.append(piece)
-        random.shuffle(generated_bag)
-
-    elif (type == "RANDOM"):
-        for i in range(7):
-            piece = random.randint(1, piece_types)
-            generated_bag.append(piece)
-
-    elif (type == "CLASSIC"):
-        for i in range(7):
-            if not piece_bags[0] and i == 0:
-                prev_piece = -1
-            elif i == 0:
-                prev_piece = (piece_bags[0] + piece_bags[1])[0]
-            else:
-                prev_piece = generated_bag[0]
-            piece = random.randint(0, piece_types)
-            if (piece == 0 or piece == prev_piece):
-                piece = random.randint(1, piece_types)
-            generated_bag.insert(0, piece)
-
-    elif type.startswith("4MEMR"): # ANY 4 memory, reroll 6 times is TGM2 style
-        reroll_count = int(type[-1]) # gets the last character
-        prev_pieces = [1, 1, 1, 1] # placeholder
-        for i in range(7):
-            if not piece_bags[0] and i == 0:
-                if piece_types == 7:
-                    prev_pieces = [1,4,1,4]
-                else: # assume piece_types must equal 18
-                    prev_pieces = [14, 14, 14, 14] # temp placeholder
-            elif i == 0:
-                prev_pieces = (piece_bags[0] + piece_bags[1])[:4]
-            else:
-                prev_pieces.append(generated_bag[0])
-                prev_pieces.pop(0)
-            piece = random.randint(1, piece_types)
-            for _ in range(reroll_count):
-                if piece in prev_pieces:
-                    piece = random.randint(1, piece_types)
-                    print("rerolling")
-            generated_bag.insert(0, piece)
-
-    return generated_bag
-
-def update_history():
-    global history_index, game_history
-
-    history_index += 1
-    if history_index == settings.MAX_HISTORY:
-        history_index = 0
-
-    game_history[history_index] = {
-        "board": game_board.copy(),
-        "pieces": pieces_placed,
-        "lines": lines_cleared,
-        "next": copy.deepcopy(piece_bags),
-        "hold": copy.deepcopy(hold_pieces),
-        "rng": rng_state,
-        #"level": level,
-        #"score": score,
-        "bag_count": bag_count
-    }
-
-def undo(amount):
-    global game_board, pieces_placed, lines_cleared, piece_bags, hold_pieces, rng_state, pps, bag_count
-    global piece_x, piece_y, piece_rotation, holds_used, piece_board, queue_spawn_piece
-    global game_state_changed, board_state_changed, history_index
-    if pieces_placed - amount >= 0:
-        game_state_changed = True
-        history_index -= amount
-        if history_index < 0:
-            history_index = settings.MAX_HISTORY - amount # make sure this doesn't miss one
-
-        # revert history
-        state = game_history[history_index]
-        game_board = copy.deepcopy(state["board"])
-        pieces_placed = state["pieces"]
-        lines_cleared = state["lines"]
-        piece_bags = copy.deepcopy(state["next"])
-        hold_pieces = copy.deepcopy(state["hold"])
-        rng_state = state["rng"]
-        bag_count = state["bag_count"]
-
-        # reset position
-        update_starting_coords()
-        holds_used = 0
-        random.setstate(rng_state)
-
-        piece_board = pieces_dict[piece_bags[0][0]]["shapes"][piece_rotation] * piece_bags[0][0] # update piece board early so it looks nice
-        queue_spawn_piece = True
-        board_state_changed = True
-        # updating all these even thought spawn_piece does it for us because want it to update on frame 0
-        gen_topout_board()
-        gen_hold_boards()
-        gen_next_boards()
-        update_ghost_piece()
-
-def add_mino(x, y): # used for drawing directly on the board and other whatever else might add a single mino
-    game_board[x, y] == -2
-
-def move_piece(move_x, move_y):
-    global piece_x, piece_y, piece_rotation, piece_board, game_state_changed
-    current_shape = pieces_dict[piece_bags[0][0]]["shapes"][piece_rotation]
-    move_dir_x = int((move_x > 0) - (move_x < 0)) # treats bools like integers then converts to int to get direction
-    move_dir_y = int((move_y > 0) - (move_y < 0))
-    steps_to_move = max(abs(move_x), abs(move_y), 1)
-    remaining_steps = 0 # set to zero as default
-
-    for step in range(steps_to_move): # loops over whichever number is farther from 0 (the most moves), min 1
-        if not check_collisions(move_dir_x, move_dir_y, current_shape): # only goes through with the movement if no collisions occur
-            piece_x = move_dir_x + piece_x # int(move_x > 0) returns 0 if move_x is 0, and 1 otherwise
-            piece_y = move_dir_y + piece_y
-            game_state_changed = True # this is set multiple times, but its fiiiine
-        else: # break when first collision happens
-            remaining_steps = steps_to_move - step
-            break
-
-    piece_board = current_shape * piece_bags[0][0]
-    if move_x != 0: update_ghost_piece()
-    return remaining_steps
-
-def check_collisions(target_move_x, target_move_y, target_shape, ghost_piece = False):
-    if ghost_piece:
-        new_x = target_move_x + ghost_piece_x
-        new_y = target_move_y + ghost_piece_y
-    else:
-        new_x = target_move_x + piece_x
-        new_y = target_move_y + piece_y
-    collided = False
-    # make sure positions aren't out of bounds first
-    for coords in numpy.argwhere(target_shape != 0): # returns a 1d numpy array of coordinates that meet the condition != 0
-        if (coords[0] + new_y > settings.BOARD_HEIGHT - 1): # check for collision with the bottom of the board
-            collided = True
-            break
-        if (coords[1] + new_x < 0 or coords[1] + new_x > settings.BOARD_WIDTH - 1): # check for collision with the sides of the board
-            collided = True
-            break
-        if (game_board[coords[0] + new_y, coords[1] + new_x]): # check for collision with minos
-            collided = True
-            break
-    if collided: return True
-    else: return False
-
-def check_touching_ground():
-    piece_shape = pieces_dict[piece_bags[0][0]]["shapes"][piece_rotation]
-
-    for coords in numpy.argwhere(piece_shape != 0):
-        if coords[0] + piece_y + 1 > settings.BOARD_HEIGHT - 1: # check if its touching the bottom of the board
-            return True # return true if it IS touching the ground
-        elif game_board[coords[0] + piece_y + 1, piece_x + coords[1]]: # check if its touching any minos below it
-            return True
-    return False # return false if nothing found
-
-def handle_movement(keys):
-    global running, das_timer, arr_timer, das_started, arr_started, das_reset_timer, das_reset_started, last_move_dir
-
-    # find which horizontal input the user pressed (0 if none)
-    if keys[settings.MOVE_LEFT] and not keys[settings.MOVE_RIGHT]:
-        move_dir = -1
-    elif keys[settings.MOVE_RIGHT] and not keys[settings.MOVE_LEFT]:
-        move_dir = 1
-    else:
-        move_dir = 0
-
-    # handle horizontal movement according to DAS and ARR rules
-    if move_dir != 0:
-        if (last_move_dir != move_dir and settings.DAS_RESET_THRESHOLD <= 0): # if switching movement direction (and DAS_RESET_THRESHOLD is set to 0), reset DAS and ARR
-            das_timer = 0 # last_move_dir is set to 0 by default so it will reset for the first movement, but that doesn't matter because it starts that way anyways
-            das_started = False
-            arr_timer = 0
-            arr_started = False
-
-        last_move_dir = move_dir
-
-        if not das_started:
-            move_piece(move_dir, 0)
-            das_started = True # start the DAS timer
-            das_timer = 0
-            das_clock.tick_busy_loop() # use tick_busy_loop for more precise ticking for das timer. causes performance issues
-
-        else:
-            das_timer += das_clock.tick_busy_loop() # use tick_busy_loop for more precise ticking for das timer. causes performance issues
-
-        if (das_timer >= das_threshold):
-            if not arr_started and arr_threshold != 0:
-                move_piece(move_dir, 0)
-                arr_started = True # start the ARR timer
-                arr_timer = 0
-                arr_clock.tick()
-            else:
-                arr_timer += arr_clock.tick()
-                if arr_timer >= arr_threshold:
-                    if arr_threshold == 0: # avoids divide by 0 error
-                        steps_to_move = settings.BOARD_WIDTH
-                    else:
-                        steps_to_move = int(arr_timer / arr_threshold)
-                    move_piece(steps_to_move * move_dir, 0)
-                    if arr_threshold == 0: # avoids divide by 0 error
-                        arr_timer = 0
-                    else:
-                        arr_timer = arr_timer % arr_threshold
-
-    elif das_started: # saves performance by only checking this stuff when das_timer is still running
-        if not das_reset_started:
-            das_reset_timer = 0
-            das_reset_clock.tick()
-            das_reset_started = True
-
-        else:
-            das_reset_timer += das_reset_clock.tick()
-
-        if (das_reset_timer >= settings.DAS_RESET_THRESHOLD): # if das reset timer goes through, then reset all timers
-            das_timer = 0
-            das_started = False
-            das_reset_timer = 0
-            das_reset_started = False
-
-        arr_timer = 0 # reset the ARR timer only to keep things clean
-        arr_started = False
-
-def unpack_1kf_binds():
-    global onekf_key_array
-    for row, col in numpy.ndindex((4, 10)): # indexes through all coordinates in a 4x10 array
-        string_index = (row * 10) + col
-        onekf_key_array[row][col] = pygame.key.key_code(settings.ONEKF_STRING[string_index : string_index + 1])
-
-def handle_1kf(key, keydir = "DOWN"):
-    global piece_rotation, game_state_changed
-    key_row, key_col = numpy.where(onekf_key_array == key)
-    # converts keyboard rows into their rotation states
-    match key_row:
-        case 0:
-            piece_rotation = 2
-        case 1:
-            piece_rotation = 3
-        case 2:
-            piece_rotation = 0
-        case 3:
-            piece_rotation = 1
-
-    current_shape = pieces_dict[piece_bags[0][0]]["shapes"][piece_rotation]
-    rightmost_point = numpy.max(numpy.where(current_shape != 0)[1]) # gets the distance between piece_x and the rightmost point of the piece
-    leftmost_point = numpy.min(numpy.where(current_shape != 0)[1]) # this is usually 0, but needed for O piece
-
-    if key_col < 5:
-        steps_to_move = int(key_col - piece_x - leftmost_point) # cast to int since numpy.where always returns an array for some reason
-    else:
-        steps_to_move = int(key_col - piece_x - rightmost_point) # cast to int since numpy.where always returns an array for some reason
-
-    game_state_changed = True
-    move_piece(steps_to_move, 0) # done in two steps because otherwise it stops early when colliding with the wall
-    move_piece(0, settings.BOARD_HEIGHT)
-    lock_piece()
-
-def rotate_piece(amount):
-    global piece_rotation, piece_board, piece_x, piece_y, game_state_changed
-    kick_list = []
-
-    new_rotation = (piece_rotation + amount) % 4
-    new_shape = pieces_dict[piece_bags[0][0]]["shapes"][new_rotation]
-
-    # offset pieces rotating from state 4 to make them kick more symetrically
-    # for example, think 180ing a state 4 z piece, will behave as if nothing happened
-
-    # a problem with the bias system is that if an unbiased (state 2) rotation would collide and allow a kick to be performed,
-    # and an biased (state 4) rotation simply won't collide at all when rotating, then it will perform asymmetrically
-    # if piece_rotation == 0 and piece_bags[0][0] in (1, 3, 4, 5): # covers pieces Z, S, O, I
-    #     bias = -1
-    # else:
-    #     bias = 0
-
-    # slightly weird i kick behaviour on edge with hole underneath platform like this iiii
-    #                                                                                  ---
-    if new_rotation == 0 and piece_bags[0][0] in (1, 3, 4, 5): # ensures the kick order is symmetrical for Z, S, O, I
-        kick_list = pieces.kick_list_left
-    else:
-        kick_list = pieces.kick_list_right
-
-    for kick in kick_list:
-        kick_x, kick_y = kick
-        if not check_collisions(kick_x, kick_y, new_shape): # continue if no collisions found
-            piece_rotation = new_rotation
-            # move the piece
-            piece_x += kick_x # update the position variables
-            piece_y += kick_y
-            piece_board = new_shape * piece_bags[0][0]
-            update_ghost_piece()
-            game_state_changed = True
-            return
-
-def mirror_piece():
-    global piece_board, piece_bags, game_state_changed, piece_x, piece_y
-
-    mirrored_piece = piece_inversions[piece_bags[0][0]] # get the mirror
-    new_shape = pieces_dict[mirrored_piece]["shapes"][piece_rotation] # get its shape
-
-    kick_list = pieces.kick_list_mirror
-
-    for kick in kick_list:
-        kick_x, kick_y = kick
-        if not check_collisions(kick_x, kick_y, new_shape):
-            game_state_changed = True
-            piece_x += kick_x # update the coordinates
-            piece_y += kick_y
-            piece_bags[0][0] = mirrored_piece # update the piece in the queue
-            piece_board = new_shape * piece_bags[0][0] # update the piece board
-            update_ghost_piece()
-            break
-
-def hold_piece(type, infinite):
-    if type == "PUPPY":
-        hold_puppy()
-    elif type == "GUIDELINE":
-        hold_guideline(infinite)
-
-def hold_puppy():
-    global piece_bags, hold_pieces, hold_boards, next_boards, piece_board, game_state_changed
-    game_state_changed = True
-
-    if len(hold_pieces) >= max_hold_pieces: # if hold bag is full
-        new_shape = pieces_dict[hold_pieces[0]]["shapes"][piece_rotation] # returns the next piece in the hold queue
-    else:
-        new_shape = pieces_dict[(piece_bags[0] + piece_bags[1])[1]]["shapes"][piece_rotation] # returns the next piece in the next queue
-
-    if not check_collisions(0, 0, new_shape):
-        hold_pieces.append(piece_bags[0][0]) # take the current piece and add it to hold queue
-        piece_bags[0].pop(0) # remove the current piece from piece bag
-
-        # if hold queue is full (enforce max hold pieces)
-        if len(hold_pieces) > max_hold_pieces:
-            piece_bags[0].insert(0, hold_pieces[0]) # insert the next hold piece as the new current piece
-            hold_pieces.pop(0) # remove the inserted hold piece from the hold queue
-        else:
-            # only ever necessary if the hold queue wasn't already full
-            gen_next_boards()
-
-    # regen bags if the bag is emptied because of hold
-    if not piece_bags[0]:
-        piece_bags[0] = piece_bags[1]
-        piece_bags[1] = generate_bag(piece_gen_type)
-
-    # refresh current active piece
-    piece_board = pieces_dict[(piece_bags[0] + piece_bags[1])[0]]["shapes"][piece_rotation] * piece_bags[0][0] # gets the next piece, this implementation is required cause holding can sometimes empty bag 1
-    update_ghost_piece()
-    gen_hold_boards()
-
-def hold_guideline(infinite_holds = False):
-    global piece_bags, hold_pieces, hold_boards, next_boards, game_state_changed, holds_used
-    global piece_x, piece_y, piece_rotation, piece_board
-    game_state_changed = True
-
-    if holds_used < max_hold_pieces or infinite_holds:
-        hold_pieces.append(piece_bags[0][0]) # take the current piece and add it to hold queue
-        piece_bags[0].pop(0) # remove the current piece from piece bag
-
-        # if hold queue is full (enforce max hold pieces)
-        if len(hold_pieces) > max_hold_pieces:
-            piece_bags[0].insert(0, hold_pieces[0]) # insert the next hold piece as the new current piece
-            hold_pieces.pop(0) # remove the inserted hold piece from the hold queue
-        else:
-            # only ever necessary if the hold queue wasn't already full
-            gen_next_boards()
-
-        # regen bags if the bag is emptied because of hold
-        if not piece_bags[0]:
-            piece_bags[0] = piece_bags[1]
-            piece_bags[1] = generate_bag(piece_gen_type)
-
-        # refresh current active piece
-        piece_board = pieces_dict[(piece_bags[0] + piece_bags[1])[0]]["shapes"][STARTING_ROTATION] * piece_bags[0][0] # gets the next piece, this implementation is required cause holding can sometimes empty bag 1
-        update_starting_coords()
-        holds_used += 1
-
-        update_ghost_piece()
-        gen_hold_boards()
-
-        # top-out check
-        if check_collisions(0, 0, piece_board):
-            top_out()
-
-def lockdown(type, frametime):
-    global lockdown_timer, prevent_harddrop_timer, prevent_harddrop_clock, prevent_harddrop_started
-    global lockdown_start_x, lockdown_start_y, lockdown_start_rotation, lockdown_resets
-
-    if current_gravity > 0.01:
-        lockdown_threshold = settings.LOCKDOWN_THRESHOLD # default setting, won't be overriden for any mode but classic
-    else: lockdown_threshold = math.inf
-
-    if type == "GUIDELINE" or type == "STEP" and lockdown_timer == 0: # calculate starting coords for step and guideline style
-        lockdown_start_x = piece_x
-        lockdown_start_y = piece_y
-
-    elif type == "CLASSIC": # calculate piece falling time for classic style
-        if current_gravity == 0:
-            lockdown_threshold = math.inf
-        else:
-            lockdown_threshold = 16.6666667/current_gravity
-
-    lockdown_timer += frametime
-
-    if type == "GUIDELINE": # update position if guideline type
-        piece_moved = lockdown_start_x != piece_x or lockdown_start_y != piece_y or lockdown_start_rotation != piece_rotation
-        if piece_moved and lockdown_resets > 0: # if the piece has moved at all
-            lockdown_resets -= 1
-            lockdown_timer = 0 # if the piece has moved, reset the timer
-            lockdown_start_x = piece_x # reset the position variables
-            lockdown_start_y = piece_y
-            lockdown_start_rotation = piece_rotation
-
-    elif type == "STEP":
-        if lockdown_start_y < piece_y:
-            lockdown_timer = 0 # if the piece has fallen, reset the timer
-            lockdown_start_y = piece_y # reset the position variable
-
-    if lockdown_timer >= lockdown_threshold:
-        lockdown_resets = settings.LOCKDOWN_RESETS_COUNT
-        prevent_harddrop_timer = 0 # start the harddrop delay timer
-        prevent_harddrop_started = True
-        prevent_harddrop_clock.tick()
-        lock_piece()
-
-def lock_piece():
-    global game_board, piece_board, piece_bags, queue_spawn_piece, pieces_placed, lockdown_timer, history_index, board_state_changed
-    new_board = game_board.copy()
-    for coords in numpy.argwhere(piece_board != 0):
-        new_board[piece_y + coords[0], piece_x + coords[1]] = piece_board[coords[0], coords[1]]
-    piece_board = numpy.zeros_like(piece_board)
-    piece_bags[0].pop(0)
-
-    if not piece_bags[0]:
-        piece_bags[0] = piece_bags[1]
-        piece_bags[1] = generate_bag(piece_gen_type)
-
-    lockdown_timer = 0
-    pieces_placed += 1
-    queue_spawn_piece = True
-    board_state_changed = True
-
-    # update the next piece early so it looks nice
-    update_starting_coords()
-    piece_board = pieces_dict[piece_bags[0][0]]["shapes"][piece_rotation] * piece_bags[0][0] # update piece board early so it looks nice
-
-    update_game_board(new_board)
-    clear_lines()
-    update_ghost_piece()
-    # this has to happen at the very end
-    update_history()
-
-def clear_lines():
-    global game_board, lines_cleared
-    # returns a 1d array of booleans for each line, true if its completed, false if not
-    lines_to_clear = numpy.all(game_board != 0, axis=1)
-    line_clear_count = numpy.where(lines_to_clear)[0].size
-    if line_clear_count > 0:
-        lines_cleared += line_clear_count
-        board_mask = game_board[~lines_to_clear] # masks the board, removing lines where the mask returned true
-        new_lines = numpy.zeros((line_clear_count, settings.BOARD_WIDTH), dtype=numpy.int8)
-        new_board = numpy.vstack((new_lines, board_mask), dtype=numpy.int8)
-        update_game_board(new_board)
-
-def top_out():
-    # TODO: add extra functionality later like displaying a score panel at the end
-    reset_game()
-
-def update_game_board(new_board):
-    global game_board, game_state_changed
-    game_state_changed = True
-    game_board = new_board.copy()
-
-def gen_topout_board():
-    global topout_board
-    extra_height = settings.BOARD_EXTRA_HEIGHT
-    topout_board = numpy.zeros((piece_size, piece_size), dtype=numpy.int8)
-    next_shape = pieces_dict[(piece_bags[0] + piece_bags[1])[1]]["shapes"][STARTING_ROTATION]
-
-    # create the two boards to compare
-    top_rows = extra_height + math.floor(settings.BOARD_HEIGHT/16) + 10 # 1 row less for boards < 24 high, and 2 less for boards < 8 high TODO: NO LONGER TRUE
-    top_rows = game_board[:top_rows].copy()
-    top_mask = top_rows.copy()
-    full_rows_index = extra_height + piece_size - 3 # min index of rows that should be all 1
-    for i, row in enumerate(top_mask):
-        if i < full_rows_index:
-            top_mask[i] = 1
-        else:
-            top_mask[i][0:i-full_rows_index] = 0
-            top_mask[i][i-full_rows_index:settings.BOARD_WIDTH-(i-full_rows_index)] = 1
-            top_mask[i][settings.BOARD_WIDTH-(i-full_rows_index):settings.BOARD_WIDTH] = 0
-    if numpy.any((top_rows != 0) & (top_mask != 0)):
-        topout_board = next_shape
-    else:
-        topout_board = None
-
-def update_ghost_piece(): # make sure piece_board has been updated before calling this function
-    global ghost_piece_x, ghost_piece_y, ghost_board, piece_y
-    if settings.ONEKF_ENABLED: # return an empty board if 1kf is enabled
-        ghost_board = numpy.zeros_like(ghost_board)
-        return
-    # calculate the coords
-    ghost_piece_x = piece_x
-    ghost_piece_y = piece_y # STARTS at piece y and looks from there
-    for _ in range(piece_y, settings.BOARD_HEIGHT):
-        if not check_collisions(0, 1, piece_board, ghost_piece=True): # fourth param for ghost pieces
-            ghost_piece_y += 1
-        else: break
-    # update the board
-    ghost_board = piece_board.copy()
-
-def gen_next_boards():
-    global next_boards
-
-    next_boards = []
-    next_list = (piece_bags[0] + piece_bags[1])[1:next_queue_size + 1] # gets a truncated next_pieces list
-
-    for piece_id in next_list:
-        piece_shape = pieces_dict[piece_id]["shapes"][0]
-        board = numpy.zeros((5, 5), dtype=numpy.int8)  # 5x5 board for hold piece
-        for coords in numpy.argwhere(piece_shape != 0):
-            board[coords[0], coords[1]] = piece_id
-        next_boards.append(board)
-
-def gen_hold_boards():
-    global hold_boards
-
-    hold_boards = []
-
-    for piece_id in hold_pieces:
-        piece_shape = pieces_dict[piece_id]["shapes"][0]
-        board = numpy.zeros((5, 5), dtype=numpy.int8)  # 5x5 board for hold piece
-        for coords in numpy.argwhere(piece_shape != 0):
-            board[coords[0], coords[1]] = piece_id
-        hold_boards.append(board)
-
-def reset_game():
-    global game_board, game_history, piece_board, piece_bags, hold_pieces, bag_count, holds_used
-    global piece_x, piece_y, piece_rotation, hold_boards, next_boards
-    global das_timer, arr_timer, sdr_timer, das_reset_timer, prevent_harddrop_timer
-    global das_started, arr_started, sdr_started, das_reset_started, prevent_harddrop_started
-    global last_move_dir, gravity_timer, softdrop_overrides, timer, lines_cleared, pieces_placed, queue_spawn_piece, STATE, board_state_changed, game_state_changed
-
-    # Clear boards
-    game_board = numpy.zeros_like(game_board)
-    game_history = [None] * settings.MAX_HISTORY
-    piece_board = numpy.zeros_like(piece_board)
-
-    # Reset timers
-    das_timer = arr_timer = sdr_timer = das_reset_timer = prevent_harddrop_timer = 0
-    das_started = arr_started = sdr_started = das_reset_started = prevent_harddrop_started = False
-
-    # Reset active piece
-    piece_x = starting_x
-    piece_y = starting_y
-    piece_rotation = STARTING_ROTATION
-    last_move_dir = 0
-    gravity_timer = 0
-    softdrop_overrides = True
-    bag_count = 0
-    queue_spawn_piece = True
-    game_state_changed = True
-    board_state_changed = True
-
-    # Reset hold
-    hold_boards = numpy.zeros((max_hold_pieces, 5, 5), dtype=numpy.int8)
-    hold_pieces = []
-    holds_used = 0
-
-    # Reset piece bag, should usually be done again when loading gamemode
-    piece_bags[0] = generate_bag(piece_gen_type)
-    piece_bags[1] = generate_bag(piece_gen_type)
-
-    # Reset stats
-    timer.reset()
-    lines_cleared = 0
-    pieces_placed = 0
-    STATE = 2
-
-    gen_next_boards()
-    update_ghost_piece()
-    update_history()
-
-def reset_gamemode():
-    global pieces_dict, piece_inversions, piece_gen_type, lockdown_type, next_queue_size, das_threshold, arr_threshold, sdr_threshold, are_threshold
-    global allow_sonic_drop, allow_180, allow_mirror, entry_delay, max_hold_pieces, spawn_y_offset, infinite_holds, starting_gravity, mino_count, piece_types
-
-    # reset gamemode specific vars (defaults)
-    pieces_dict = pieces.tetra_dict
-    piece_inversions = pieces.TETRA_INVERSIONS
-    piece_gen_type = "BAG"
-    lockdown_type = "GUIDELINE"
-    next_queue_size = 4 # next pieces count is the user settings max
-                        # next_queue_size will sometimes be smaller than the max depending on the gamemode
-    das_threshold = settings.DAS_THRESHOLD # 266.6666666
-    arr_threshold = settings.ARR_THRESHOLD # 100
-    sdr_threshold = settings.SDR_THRESHOLD # 33.33333333
-    are_threshold = 1000
-    allow_sonic_drop = True
-    allow_180 = True
-    allow_mirror = False
-    entry_delay = 0
-    max_hold_pieces = 1
-    spawn_y_offset = 0
-    infinite_holds = False
-    starting_gravity = 0 # measured in G (1g = 1 fall/frame, 20g = max speed at 60fps (should jump to like 200g though for more consistency)
-    mino_count = 4
-    piece_types = 7
-
-def handle_sonic_drop(keys):
-    global softdrop_overrides, game_state_changed
-    if keys[settings.MOVE_SONICDROP] and allow_sonic_drop:
-        softdrop_overrides = True
-        return move_piece(0, settings.BOARD_HEIGHT)
-    return 0
-
-def handle_soft_drop(keys, frametime):
-    global sdr_timer, sdr_started, softdrop_overrides
-    if current_gravity > 0.001:
-        softdrop_overrides = (sdr_threshold <= 16.666667 / current_gravity and keys[settings.MOVE_SOFTDROP]) # returns true if softdrop is pressed and is faster than gravity
-    elif keys[settings.MOVE_SOFTDROP]:
-        softdrop_overrides = True # returns true always if gravity is 0 (prevents divide by 0)
-    else:
-        softdrop_overrides = False
-
-    if sdr_threshold == 0:
-        steps_to_move = settings.BOARD_HEIGHT + 10
-    else:
-        steps_to_move = max(int(frametime / sdr_threshold), 1) # predicts how much softdrop should move for first button press
-
-    if softdrop_overrides:
-        if not sdr_started:
-            sdr_timer = 0
-            sdr_clock.tick()
-            sdr_started = True
-            return move_piece(0, steps_to_move) # returns remaining steps
-        else:
-            sdr_timer += sdr_clock.tick()
-            if sdr_timer >= sdr_threshold:
-                if sdr_threshold == 0: # avoids divide by 0 error
-                    steps_to_move == settings.BOARD_HEIGHT + 10
-                    sdr_timer = 0
-                else:
-                    steps_to_move = int(sdr_timer / sdr_threshold)
-                    sdr_timer = sdr_timer % sdr_threshold
-
-                return move_piece(0, steps_to_move) # returns remaining steps
-    else:
-        sdr_timer = 0
-        sdr_started = False
-    return 0
-
-def hard_drop():
-    global prevent_harddrop_clock, prevent_harddrop_timer, prevent_harddrop_started, prevent_harddrop_clock
-    prevent_harddrop_timer += prevent_harddrop_clock.tick()
-    if not prevent_harddrop_started or prevent_harddrop_timer >= settings.PREVENT_HARDDROP_THRESHOLD:
-        move_piece(0, settings.BOARD_HEIGHT + 10)
-        lock_piece()
-
-    prevent_harddrop_timer = 0 # reset either way, because it only applies to the first hard drop after lockdown
-    prevent_harddrop_clock.tick()
-    prevent_harddrop_started = False # remove the timer flag
-
-def do_gravity(frametime):
-    global gravity_timer, current_gravity, game_state_changed
-
-    if current_gravity >= 15.8: # make instant drop at 20g regardless of framerate
-        remaining_steps = move_piece(0, settings.BOARD_HEIGHT + 10)
-        return remaining_steps
-
-    if current_gravity <= 0.0001: # disable gravity if too low
-        return 0
-
-    if not softdrop_overrides: # only process gravity this frame if user isn't pressing the softdrop key
-        gravity_timer += frametime # use frametime clock because precision is not necessary, only consistent pacing is
-        if (gravity_timer >= 16.666667 / current_gravity):
-            steps_to_move = int(gravity_timer / (16.666667 / current_gravity))
-            remaining_steps = move_piece(0, steps_to_move)
-            gravity_timer = gravity_timer % (16.666667 / current_gravity)
-            return remaining_steps
-    return 0
-
-def do_leftover_gravity(remaining_steps): # for when a piece falls, touches the ground, then loses ground inside the same frame. prevents hanging for a frame.
-    if remaining_steps != 0: # check if the piece can move at all
-        move_piece(0, remaining_steps) # move the piece by the leftover amount from this frame
-
-def handle_entry_delay(frametime, threshold = are_threshold): # currently buggy. need to fix
-    global are_timer, queue_spawn_piece
-    if threshold == 0 or not queue_spawn_piece: # if piece not spawning
-        return
-    if queue_spawn_piece and are_timer == 0: # if timer not started
-        are_timer += frametime*0.9 # estimate of this frame's frametime inbetween locking and spawning pieces will be
-    elif are_timer < threshold: # if timer not ready
-        are_timer += frametime
-    elif are_timer >= threshold:
-        print(are_timer, "spawning")
-        are_timer = 0
-        queue_spawn_piece = False
-        spawn_piece()
-
-def update_pps():
-    global pps
-    total_time = timer.get_seconds()
-    pps = pieces_placed / total_time
-    pps = round(pps, 2)
+"""
+engine.py is the core engine of the game. Has functions for handling
+piece movement, rotation, collision, gravity, etc.
+All of the game state lives on an Engine instance, so any number of games
+can run side by side in one process (bots, replays, load tests) without a display.
+main.py drives the one instance that gets rendered, although
+some functions call each-other on their own.
+"""
+
+import math
+import os
+import time
+import pygame
+import numpy
+
+import pieces, settings, bitboard, history, rng, replay, timers, placements, zobrist
+
+STATE = 0
+running = True # so we can turn the game loop on and off
+bot_playing = False # main.py lets bot.Bot play game instead of the keyboard, toggled in the menu
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+skins_dir = os.path.join(script_dir, "skin")
+replays_dir = os.path.join(script_dir, "replays")
+profiles_dir = os.path.join(script_dir, "profiles")
+
+game = None # the Engine instance that main.py, ui.py and menu.py drive, set up by main.py
+
+STEP_STAGES = ("spawn", "soft_drop", "sonic_drop", "gravity", "lockdown", "movement") # what Engine.step_times splits a tick into
+
+class Timer:
+    def __init__(self):
+        self.start_time = None
+        self.running = False
+
+    def start(self):
+        self.start_time = time.perf_counter()
+        self.running = True
+
+    def stop(self):
+        self.running = False
+
+    def reset(self):
+        self.start_time = time.perf_counter()
+
+    def split_strings(self):
+        """Return ('M:SS', '.XX') with hundredths of a second."""
+        if not self.running or self.start_time is None:
+            return "0:00", ".00"
+
+        elapsed = time.perf_counter() - self.start_time
+        minutes = int(elapsed // 60)
+        seconds = int(elapsed % 60)
+        hundredths = int((elapsed * 100) % 100)  # rounds to .XX
+
+        return f"{minutes}:{seconds:02d}", f".{hundredths:02d}"
+
+    def get_seconds(self):
+        """Return the time in seconds as an integer"""
+        if not self.running or self.start_time is None:
+            return 0
+
+        elapsed = time.perf_counter() - self.start_time
+
+        return elapsed
+
+class Engine:
+    """
+    One game of puppytris. Owns the board, the queue, the active piece and all the timers.
+    Nothing in here touches the display, so it can be stepped headless.
+    """
+    def __init__(self, board_width=None, board_height=None, board_extra_height=None, board_backend=None, seed=None):
+        self.board_width = settings.BOARD_WIDTH if board_width is None else board_width
+        self.board_extra_height = settings.BOARD_EXTRA_HEIGHT if board_extra_height is None else board_extra_height
+        self.board_height = settings.BOARD_HEIGHT if board_height is None else board_height
+        self.board_backend = settings.BOARD_BACKEND if board_backend is None else board_backend
+        if self.board_backend == "BITBOARD":
+            self.bitboard = bitboard.BitBoard(self.board_width, self.board_height)
+        else: # "ARRAY", checks cells on game_board directly
+            self.bitboard = None
+        self.recorder = None # replay.Recorder, only set while a replay is being recorded
+        self.step_times = None # {stage in STEP_STAGES: ns} that step adds to while it's set, main.py's profiler reads and zeroes it every frame
+
+        self.timers = timers.TimerService() # das, arr, soft_drop, das_reset, gravity, lockdown, prevent_harddrop and are
+
+        self.lines_cleared, self.pieces_placed, self.pps, self.bag_count, self.last_move_dir = 0, 0, 0, 0, 0
+        self.rng_seed = rng.new_seed() if seed is None else seed # every bag is generated from this, see rng.py
+        self.softdrop_overrides = True
+        self.game_state_changed = False
+        self.board_state_changed = False
+        self.queue_spawn_piece = True
+
+        self.piece_bags = [[],[]]
+        self.hold_pieces = []
+        self.hold_pieces_count = 0 # only set by the piece set gamemodes, ui only draws the hold panel when this is above 0
+
+        # gamemode specific vars (defaults)
+        self.reset_gamemode()
+
+        self.piece_size = self.mino_count
+        self.holds_used = 0
+        self.current_gravity = self.starting_gravity
+
+        self.hold_boards = numpy.zeros((self.max_hold_pieces, 5, 5), dtype=numpy.int8)
+        self.next_boards = numpy.zeros((self.next_queue_size, 5, 5), dtype=numpy.int8)
+        self.topout_board = numpy.zeros((5, 5), dtype=numpy.int8)
+
+        self.onekf_key_array = numpy.zeros((4, 10), dtype=int) # int8 is too small
+
+        self.starting_x = 3
+        self.starting_y = 2
+        self.STARTING_ROTATION = 0
+
+        self.game_board = numpy.zeros((self.board_height, self.board_width), numpy.int8)
+        self.board_hash = 0 # zobrist hash of the filled cells, kept up to date by update_game_board
+        self.queue_hash = 0 # zobrist hash of the current piece, the next queue and hold, see update_queue_hash
+        self.game_history = history.History(settings.MAX_HISTORY, self.board_width)
+        self.piece_board = numpy.zeros((self.piece_size, self.piece_size), numpy.int8)
+        self.ghost_board = numpy.zeros_like(self.piece_board)
+
+        self.piece_x, self.ghost_piece_x = self.starting_x, self.starting_x
+        self.piece_y, self.ghost_piece_y = self.starting_y, self.starting_y
+        self.piece_rotation = self.STARTING_ROTATION
+        self.lockdown_start_x = self.starting_x
+        self.lockdown_start_y = -self.board_extra_height
+        self.lockdown_start_rotation = self.STARTING_ROTATION
+        self.lockdown_resets = 15
+
+        self.timer = Timer()
+
+    def load_game(self):
+        """Fill the queue and spawn the first piece. Headless version of main.load_game (no skins)."""
+        self.piece_bags[0] = self.generate_bag(self.piece_gen_type) # generate the first two bags
+        self.piece_bags[1] = self.generate_bag(self.piece_gen_type)
+        self.update_queue_hash()
+        self.gen_next_boards()
+        self.spawn_piece()
+        self.update_ghost_piece()
+        self.update_history()
+
+    def load_gamemode(self, gamemode):
+        if self.recorder is not None: self.recorder.record(replay.GAMEMODE, gamemode.__name__)
+        self.gamemode_names.append(gamemode.__name__) # so a replay can stack the same gamemodes again
+        for attr, value in vars(gamemode).items():
+            if not attr.startswith("__"): # skip the class internals (__module__, __dict__, etc.)
+                setattr(self, attr, value)
+        self.update_piece_masks() # pieces_dict might have changed
+        # regenerate the bags
+        self.piece_bags[0] = self.generate_bag(self.piece_gen_type)
+        self.piece_bags[1] = self.generate_bag(self.piece_gen_type)
+        self.update_queue_hash()
+
+    def update_starting_coords(self):
+        current_piece = self.piece_bags[0][0]
+        self.piece_size = self.piece_table.sizes[current_piece]
+        height_offset = self.piece_table.spawn_offsets[current_piece]
+        self.starting_x = (self.board_width - self.piece_size) // 2 # dynamically calculate starting position based on board and piece size.
+        self.starting_y = self.board_extra_height - self.piece_size//5 - height_offset + self.spawn_y_offset # need to subtract the blank space in the piece here
+        self.piece_x = self.starting_x
+        self.piece_y = self.starting_y
+        self.piece_rotation = self.STARTING_ROTATION
+
+        # starting_x = 0
+        # piece_x = starting_x
+        # piece_y = 1
+        # starting_y = piece_y
+
+    def spawn_piece(self):
+        if self.recorder is not None: self.recorder.record(replay.SPAWN)
+        self.queue_spawn_piece = False
+        self.update_starting_coords()
+        self.holds_used = 0
+        self.game_state_changed = True
+
+        self.piece_board = self.piece_table.piece_boards[self.piece_bags[0][0]][self.piece_rotation]
+        self.gen_next_boards()
+        self.gen_topout_board()
+        self.update_ghost_piece()
+        # top-out check
+        if self.check_collisions(0, 0, self.piece_bags[0][0], self.piece_rotation):
+            self.top_out()
+
+    def generate_bag(self, type="BAG"):
+        self.bag_count += 1
+        bag_rng = rng.for_bag(self.rng_seed, self.bag_count)
+        generated_bag = []
+        piece_bags = self.piece_bags
+
+        if (type == "BAG"):
+            for piece, data in self.pieces_dict.items(): # put all the pieces in the bag
+                # Skip if rare piece (x) and we're on an odd bag
+                if data.get("rare", False) and self.bag_count % 2 == 1:
+                    continue
+                generated_bag.append(piece)
+            bag_rng.shuffle(generated_bag)
+
+        elif (type == "RANDOM"):
+            for i in range(7):
+                piece = bag_rng.randint(1, self.piece_types)
+                generated_bag.append(piece)
+
+        elif (type == "CLASSIC"):
+            for i in range(7):
+                if not piece_bags[0] and i == 0:
+                    prev_piece = -1
+                elif i == 0:
+                    prev_piece = (piece_bags[0] + piece_bags[1])[0]
+                else:
+                    prev_piece = generated_bag[0]
+                piece = bag_rng.randint(0, self.piece_types)
+                if (piece == 0 or piece == prev_piece):
+                    piece = bag_rng.randint(1, self.piece_types)
+                generated_bag.insert(0, piece)
+
+        elif type.startswith("4MEMR"): # ANY 4 memory, reroll 6 times is TGM2 style
+            reroll_count = int(type[-1]) # gets the last character
+            prev_pieces = [1, 1, 1, 1] # placeholder
+            for i in range(7):
+                if not piece_bags[0] and i == 0:
+                    if self.piece_types == 7:
+                        prev_pieces = [1,4,1,4]
+                    else: # assume piece_types must equal 18
+                        prev_pieces = [14, 14, 14, 14] # temp placeholder
+                elif i == 0:
+                    prev_pieces = (piece_bags[0] + piece_bags[1])[:4]
+                else:
+                    prev_pieces.append(generated_bag[0])
+                    prev_pieces.pop(0)
+                piece = bag_rng.randint(1, self.piece_types)
+                for _ in range(reroll_count):
+                    if piece in prev_pieces:
+                        piece = bag_rng.randint(1, self.piece_types)
+                generated_bag.insert(0, piece)
+
+        return generated_bag
+
+    def update_history(self, placed_cells=(), cleared_rows=(), cleared_cells=None):
+        # only the cells that changed get stored, see history.py. bag_count is all the rng needs
+        self.game_history.push(placed_cells, cleared_rows, cleared_cells, self.pieces_placed, self.lines_cleared,
+                               self.bag_count, self.piece_bags, self.hold_pieces, self.state_hash())
+
+    def undo(self, amount):
+        if self.pieces_placed - amount >= 0:
+            new_board = self.game_history.undo(self.game_board, amount)
+            if new_board is None: # went past the oldest entry still in the ring buffer
+                return
+            if self.recorder is not None: self.recorder.record(replay.UNDO, amount)
+            self.game_state_changed = True
+
+            # revert history
+            self.pieces_placed, self.lines_cleared, self.bag_count, self.piece_bags, self.hold_pieces = self.game_history.newest_state()
+            self.update_queue_hash()
+            self.update_game_board(new_board, self.game_history.newest_hash() ^ self.queue_hash) # the entry has the whole state hash, no need to rehash the board
+
+            # reset position
+            self.update_starting_coords()
+            self.holds_used = 0
+
+            self.piece_board = self.piece_table.piece_boards[self.piece_bags[0][0]][self.piece_rotation] # update piece board early so it looks nice
+            self.queue_spawn_piece = True
+            self.board_state_changed = True
+            # updating all these even thought spawn_piece does it for us because want it to update on frame 0
+            self.gen_topout_board()
+            self.gen_hold_boards()
+            self.gen_next_boards()
+            self.update_ghost_piece()
+
+    def add_mino(self, x, y): # used for drawing directly on the board and other whatever else might add a single mino
+        self.game_board[x, y] == -2
+
+    def move_piece(self, move_x, move_y):
+        current_piece = self.piece_bags[0][0]
+        if move_x == 0 and move_y > 0: # straight down (gravity, soft/sonic/hard drop), ask the drop oracle instead of checking one row at a time
+            fall = min(move_y, self.drop_distance())
+            if fall > 0:
+                self.piece_y += fall
+                self.game_state_changed = True
+                if self.recorder is not None: self.recorder.record(replay.MOVE, 0, fall)
+            self.piece_board = self.piece_table.piece_boards[current_piece][self.piece_rotation]
+            return move_y - fall # same as the loop below, the remaining steps after the first collision
+
+        move_dir_x = int((move_x > 0) - (move_x < 0)) # treats bools like integers then converts to int to get direction
+        move_dir_y = int((move_y > 0) - (move_y < 0))
+        steps_to_move = max(abs(move_x), abs(move_y), 1)
+        remaining_steps = 0 # set to zero as default
+        start_x, start_y = self.piece_x, self.piece_y
+
+        for step in range(steps_to_move): # loops over whichever number is farther from 0 (the most moves), min 1
+            if not self.check_collisions(move_dir_x, move_dir_y, current_piece, self.piece_rotation): # only goes through with the movement if no collisions occur
+                self.piece_x = move_dir_x + self.piece_x # int(move_x > 0) returns 0 if move_x is 0, and 1 otherwise
+                self.piece_y = move_dir_y + self.piece_y
+                self.game_state_changed = True # this is set multiple times, but its fiiiine
+            else: # break when first collision happens
+                remaining_steps = steps_to_move - step
+                break
+
+        self.piece_board = self.piece_table.piece_boards[current_piece][self.piece_rotation]
+        if move_x != 0: self.update_ghost_piece()
+        if self.recorder is not None and (self.piece_x != start_x or self.piece_y != start_y): # record how far it really went, not how far it was asked to
+            self.recorder.record(replay.MOVE, self.piece_x - start_x, self.piece_y - start_y)
+        return remaining_steps
+
+    def check_collisions(self, target_move_x, target_move_y, target_piece, target_rotation, ghost_piece = False):
+        if ghost_piece:
+            return self.collides_at(target_piece, target_rotation, target_move_x + self.ghost_piece_x, target_move_y + self.ghost_piece_y)
+        return self.collides_at(target_piece, target_rotation, target_move_x + self.piece_x, target_move_y + self.piece_y)
+
+    def collides_at(self, target_piece, target_rotation, new_x, new_y):
+        """Would the piece collide with anything at this exact position (not relative to the current piece)"""
+        if self.bitboard is not None:
+            masks_by_x = self.piece_masks[target_piece][target_rotation]
+            index = new_x + self.piece_masks_pad
+            if index < 0 or index >= len(masks_by_x): # entirely outside the walls
+                return True
+            return self.bitboard.collides(masks_by_x[index], new_y)
+
+        game_board = self.game_board
+        collided = False
+        # make sure positions aren't out of bounds first
+        for coords in self.piece_table.minos[target_piece][target_rotation]: # precompiled (row, col) of every filled cell
+            if (coords[0] + new_y > self.board_height - 1): # check for collision with the bottom of the board
+                collided = True
+                break
+            if (coords[0] + new_y < 0): # check for collision with the top of the board (negative indexes would wrap around)
+                collided = True
+                break
+            if (coords[1] + new_x < 0 or coords[1] + new_x > self.board_width - 1): # check for collision with the sides of the board
+                collided = True
+                break
+            if (game_board[coords[0] + new_y, coords[1] + new_x]): # check for collision with minos
+                collided = True
+                break
+        if collided: return True
+        else: return False
+
+    def drop_distance(self):
+        """How many rows the current piece can fall before it lands"""
+        current_piece = self.piece_bags[0][0]
+        if self.check_collisions(0, 0, current_piece, self.piece_rotation): # already stuck (about to top out), can't fall
+            return 0
+        if self.bitboard is not None:
+            drop_profile = self.piece_table.drop_profiles[current_piece][self.piece_rotation]
+            return self.bitboard.drop_distance(drop_profile, self.piece_x, self.piece_y)
+
+        distance = 0
+        while not self.check_collisions(0, distance + 1, current_piece, self.piece_rotation):
+            distance += 1
+        return distance
+
+    def check_touching_ground(self):
+        # touching the ground is the same as not being able to move down one
+        return self.check_collisions(0, 1, self.piece_bags[0][0], self.piece_rotation)
+
+    def update_piece_masks(self):
+        if self.bitboard is not None:
+            self.piece_masks_pad, self.piece_masks = bitboard.build_piece_masks(self.piece_table, self.board_width)
+
+    def step(self, keys, dt):
+        """
+        One simulation tick of dt milliseconds: spawning, drops, gravity, lockdown and DAS/ARR.
+        main.py calls this at settings.SIM_TICK_RATE no matter how fast frames are drawn.
+        """
+        step_times = self.step_times
+        if step_times is not None:
+            last = time.perf_counter_ns()
+        self.timers.advance(round(dt * timers.NS_PER_MS))
+        if self.queue_spawn_piece:
+            self.spawn_piece()
+        if step_times is not None: last = self.add_step_time("spawn", last)
+        remaining_grav = self.handle_soft_drop(keys, dt)
+        if step_times is not None: last = self.add_step_time("soft_drop", last)
+        remaining_grav += self.handle_sonic_drop(keys)
+        if step_times is not None: last = self.add_step_time("sonic_drop", last)
+        remaining_grav += self.do_gravity(dt) # this logic works the same as max() would, since one of them is always bound to be zero
+        if step_times is not None: last = self.add_step_time("gravity", last)
+        if self.check_touching_ground():
+            self.lockdown(self.lockdown_type, dt)
+        else:
+            self.timers.postpone("lockdown", dt) # lockdown only counts while the piece is on the ground
+        if step_times is not None: last = self.add_step_time("lockdown", last)
+
+        if not self.queue_spawn_piece: # if no more piece, skip remaining movement logic
+            if not settings.ONEKF_ENABLED:
+                self.handle_movement(keys, dt)
+            self.do_leftover_gravity(remaining_grav)
+        if step_times is not None: self.add_step_time("movement", last)
+
+    def add_step_time(self, stage, since):
+        """Adds the ns since `since` to stage in step_times, returns now so the next stage can count from it"""
+        now = time.perf_counter_ns()
+        self.step_times[stage] += now - since
+        return now
+
+    def handle_held_keys(self, keys):
+        """
+        Runs the soft drop and DAS/ARR logic right when a key goes down or up instead of waiting for the next step,
+        so a press starts DAS (and makes its first move) at the moment it happened.
+        """
+        if self.queue_spawn_piece:
+            return
+        self.handle_soft_drop(keys, 0)
+        if not settings.ONEKF_ENABLED:
+            self.handle_movement(keys, 0)
+
+    def handle_movement(self, keys, dt):
+        # find which horizontal input the user pressed (0 if none)
+        if keys[settings.MOVE_LEFT] and not keys[settings.MOVE_RIGHT]:
+            move_dir = -1
+        elif keys[settings.MOVE_RIGHT] and not keys[settings.MOVE_LEFT]:
+            move_dir = 1
+        else:
+            move_dir = 0
+
+        # handle horizontal movement according to DAS and ARR rules
+        if move_dir != 0:
+            if (self.last_move_dir != move_dir and settings.DAS_RESET_THRESHOLD <= 0): # if switching movement direction (and DAS_RESET_THRESHOLD is set to 0), reset DAS and ARR
+                self.timers.stop("das") # last_move_dir is set to 0 by default so it will reset for the first movement, but that doesn't matter because it starts that way anyways
+                self.timers.stop("arr")
+
+            self.last_move_dir = move_dir
+            self.timers.stop("das_reset") # a direction is held again, so the release doesn't count anymore
+
+            if not self.timers.running("das"):
+                self.move_piece(move_dir, 0)
+                self.timers.start("das") # start the DAS timer
+
+            if self.timers.expired("das", self.das_threshold):
+                if self.arr_threshold == 0: # avoids divide by 0 error
+                    self.move_piece(self.board_width * move_dir, 0)
+                elif not self.timers.running("arr"):
+                    self.move_piece(move_dir, 0)
+                    self.timers.start("arr", at=self.timers.deadline("das", self.das_threshold)) # ARR counts from the exact moment DAS ran out, not from this tick
+                else:
+                    steps_to_move = self.timers.periods("arr", self.arr_threshold) # leftover time carries over to the next step
+                    if steps_to_move:
+                        self.move_piece(steps_to_move * move_dir, 0)
+
+        elif self.timers.running("das"): # saves performance by only checking this stuff when DAS is still running
+            if not self.timers.running("das_reset"):
+                self.timers.start("das_reset")
+
+            if self.timers.expired("das_reset", settings.DAS_RESET_THRESHOLD): # if das reset timer goes through, then reset all timers
+                self.timers.stop("das")
+                self.timers.stop("das_reset")
+
+            self.timers.stop("arr") # reset the ARR timer only to keep things clean
+
+    def unpack_1kf_binds(self):
+        for row, col in numpy.ndindex((4, 10)): # indexes through all coordinates in a 4x10 array
+            string_index = (row * 10) + col
+            self.onekf_key_array[row][col] = pygame.key.key_code(settings.ONEKF_STRING[string_index : string_index + 1])
+
+    def handle_1kf(self, key, keydir = "DOWN"):
+        key_row, key_col = numpy.where(self.onekf_key_array == key)
+        # converts keyboard rows into their rotation states
+        match key_row:
+            case 0:
+                self.piece_rotation = 2
+            case 1:
+                self.piece_rotation = 3
+            case 2:
+                self.piece_rotation = 0
+            case 3:
+                self.piece_rotation = 1
+        if self.recorder is not None: self.recorder.record(replay.SET_ROTATION, self.piece_rotation)
+
+        # leftmost is usually 0, but needed for O piece. rightmost is the distance between piece_x and the rightmost point of the piece
+        leftmost_point, rightmost_point = self.piece_table.column_extents[self.piece_bags[0][0]][self.piece_rotation]
+
+        if key_col < 5:
+            steps_to_move = int(key_col - self.piece_x - leftmost_point) # cast to int since numpy.where always returns an array for some reason
+        else:
+            steps_to_move = int(key_col - self.piece_x - rightmost_point) # cast to int since numpy.where always returns an array for some reason
+
+        self.game_state_changed = True
+        self.move_piece(steps_to_move, 0) # done in two steps because otherwise it stops early when colliding with the wall
+        self.move_piece(0, self.board_height)
+        self.lock_piece()
+
+    def find_kick(self, target_piece, target_rotation, x, y, kick_list):
+        """The first kick in kick_list that fits the piece at (x + kick_x, y + kick_y), or None. Doesn't change anything."""
+        for kick_x, kick_y in kick_list:
+            if not self.collides_at(target_piece, target_rotation, x + kick_x, y + kick_y):
+                return kick_x, kick_y
+        return None
+
+    def find_placements(self, with_paths=True):
+        """Every distinct spot the current piece can lock in, and the inputs that get it there. See placements.py"""
+        return placements.find_placements(self, with_paths)
+
+    def rotate_piece(self, amount):
+        new_rotation = (self.piece_rotation + amount) % 4
+
+        # offset pieces rotating from state 4 to make them kick more symetrically
+        # for example, think 180ing a state 4 z piece, will behave as if nothing happened
+
+        # a problem with the bias system is that if an unbiased (state 2) rotation would collide and allow a kick to be performed,
+        # and an biased (state 4) rotation simply won't collide at all when rotating, then it will perform asymmetrically
+        # if piece_rotation == 0 and piece_bags[0][0] in (1, 3, 4, 5): # covers pieces Z, S, O, I
+        #     bias = -1
+        # else:
+        #     bias = 0
+
+        # slightly weird i kick behaviour on edge with hole underneath platform like this iiii
+        #                                                                                  ---
+        kick_list = pieces.rotation_kicks(self.piece_bags[0][0], new_rotation)
+        kick = self.find_kick(self.piece_bags[0][0], new_rotation, self.piece_x, self.piece_y, kick_list)
+        if kick is not None: # continue if no collisions found
+            kick_x, kick_y = kick
+            if self.recorder is not None: self.recorder.record(replay.ROTATE, amount)
+            self.piece_rotation = new_rotation
+            # move the piece
+            self.piece_x += kick_x # update the position variables
+            self.piece_y += kick_y
+            self.piece_board = self.piece_table.piece_boards[self.piece_bags[0][0]][new_rotation]
+            self.update_ghost_piece()
+            self.game_state_changed = True
+
+    def mirror_piece(self):
+        mirrored_piece = self.piece_inversions[self.piece_bags[0][0]] # get the mirror
+
+        kick = self.find_kick(mirrored_piece, self.piece_rotation, self.piece_x, self.piece_y, pieces.kick_list_mirror)
+        if kick is not None:
+            kick_x, kick_y = kick
+            if self.recorder is not None: self.recorder.record(replay.MIRROR)
+            self.game_state_changed = True
+            self.piece_x += kick_x # update the coordinates
+            self.piece_y += kick_y
+            self.piece_bags[0][0] = mirrored_piece # update the piece in the queue
+            self.update_queue_hash()
+            self.piece_board = self.piece_table.piece_boards[mirrored_piece][self.piece_rotation] # update the piece board
+            self.update_ghost_piece()
+
+    def hold_piece(self, type, infinite):
+        if type == "PUPPY":
+            self.hold_puppy()
+        elif type == "GUIDELINE":
+            self.hold_guideline(infinite)
+
+    def hold_puppy(self):
+        if self.recorder is not None: self.recorder.record(replay.HOLD_PUPPY)
+        piece_bags, hold_pieces = self.piece_bags, self.hold_pieces
+        self.game_state_changed = True
+
+        if len(hold_pieces) >= self.max_hold_pieces: # if hold bag is full
+            new_piece = hold_pieces[0] # returns the next piece in the hold queue
+        else:
+            new_piece = (piece_bags[0] + piece_bags[1])[1] # returns the next piece in the next queue
+
+        if not self.check_collisions(0, 0, new_piece, self.piece_rotation):
+            hold_pieces.append(piece_bags[0][0]) # take the current piece and add it to hold queue
+            piece_bags[0].pop(0) # remove the current piece from piece bag
+
+            # if hold queue is full (enforce max hold pieces)
+            if len(hold_pieces) > self.max_hold_pieces:
+                piece_bags[0].insert(0, hold_pieces[0]) # insert the next hold piece as the new current piece
+                hold_pieces.pop(0) # remove the inserted hold piece from the hold queue
+            else:
+                # only ever necessary if the hold queue wasn't already full
+                self.gen_next_boards()
+
+        # regen bags if the bag is emptied because of hold
+        if not piece_bags[0]:
+            piece_bags[0] = piece_bags[1]
+            piece_bags[1] = self.generate_bag(self.piece_gen_type)
+        self.update_queue_hash()
+
+        # refresh current active piece
+        self.piece_board = self.piece_table.piece_boards[(piece_bags[0] + piece_bags[1])[0]][self.piece_rotation] # gets the next piece, this implementation is required cause holding can sometimes empty bag 1
+        self.update_ghost_piece()
+        self.gen_hold_boards()
+
+    def hold_guideline(self, infinite_holds = False):
+        piece_bags, hold_pieces = self.piece_bags, self.hold_pieces
+        self.game_state_changed = True
+
+        if self.holds_used < self.max_hold_pieces or infinite_holds:
+            if self.recorder is not None: self.recorder.record(replay.HOLD, int(infinite_holds))
+            hold_pieces.append(piece_bags[0][0]) # take the current piece and add it to hold queue
+            piece_bags[0].pop(0) # remove the current piece from piece bag
+
+            # if hold queue is full (enforce max hold pieces)
+            if len(hold_pieces) > self.max_hold_pieces:
+                piece_bags[0].insert(0, hold_pieces[0]) # insert the next hold piece as the new current piece
+                hold_pieces.pop(0) # remove the inserted hold piece from the hold queue
+            else:
+                # only ever necessary if the hold queue wasn't already full
+                self.gen_next_boards()
+
+            # regen bags if the bag is emptied because of hold
+            if not piece_bags[0]:
+                piece_bags[0] = piece_bags[1]
+                piece_bags[1] = self.generate_bag(self.piece_gen_type)
+            self.update_queue_hash()
+
+            # refresh current active piece
+            self.piece_board = self.piece_table.piece_boards[(piece_bags[0] + piece_bags[1])[0]][self.STARTING_ROTATION] # gets the next piece, this implementation is required cause holding can sometimes empty bag 1
+            self.update_starting_coords()
+            self.holds_used += 1
+
+            self.update_ghost_piece()
+            self.gen_hold_boards()
+
+            # top-out check
+            if self.check_collisions(0, 0, piece_bags[0][0], self.piece_rotation):
+                self.top_out()
+
+    def lockdown(self, type, dt):
+        if self.current_gravity > 0.01:
+            lockdown_threshold = settings.LOCKDOWN_THRESHOLD # default setting, won't be overriden for any mode but classic
+        else: lockdown_threshold = math.inf
+
+        if type == "GUIDELINE" or type == "STEP" and not self.timers.running("lockdown"): # calculate starting coords for step and guideline style
+            self.lockdown_start_x = self.piece_x
+            self.lockdown_start_y = self.piece_y
+
+        elif type == "CLASSIC": # calculate piece falling time for classic style
+            if self.current_gravity == 0:
+                lockdown_threshold = math.inf
+            else:
+                lockdown_threshold = 16.6666667/self.current_gravity
+
+        if not self.timers.running("lockdown"):
+            self.timers.start("lockdown")
+
+        if type == "GUIDELINE": # update position if guideline type
+            piece_moved = self.lockdown_start_x != self.piece_x or self.lockdown_start_y != self.piece_y or self.lockdown_start_rotation != self.piece_rotation
+            if piece_moved and self.lockdown_resets > 0: # if the piece has moved at all
+                self.lockdown_resets -= 1
+                self.timers.start("lockdown") # if the piece has moved, reset the timer
+                self.lockdown_start_x = self.piece_x # reset the position variables
+                self.lockdown_start_y = self.piece_y
+                self.lockdown_start_rotation = self.piece_rotation
+
+        elif type == "STEP":
+            if self.lockdown_start_y < self.piece_y:
+                self.timers.start("lockdown") # if the piece has fallen, reset the timer
+                self.lockdown_start_y = self.piece_y # reset the position variable
+
+        if self.timers.expired("lockdown", lockdown_threshold):
+            self.lockdown_resets = settings.LOCKDOWN_RESETS_COUNT
+            self.timers.start("prevent_harddrop") # start the harddrop delay timer
+            self.lock_piece()
+
+    def lock_piece(self):
+        if self.recorder is not None: self.recorder.record(replay.LOCK)
+        new_board = self.game_board.copy()
+        current_piece = self.piece_bags[0][0]
+        placed_cells = [(self.piece_y + row, self.piece_x + col) for row, col in self.piece_table.minos[current_piece][self.piece_rotation]]
+        for row, col in placed_cells:
+            new_board[row, col] = current_piece
+        self.piece_board = numpy.zeros_like(self.piece_board)
+        self.piece_bags[0].pop(0)
+
+        if not self.piece_bags[0]:
+            self.piece_bags[0] = self.piece_bags[1]
+            self.piece_bags[1] = self.generate_bag(self.piece_gen_type)
+        self.update_queue_hash()
+
+        self.timers.stop("lockdown")
+        self.pieces_placed += 1
+        self.queue_spawn_piece = True
+        self.board_state_changed = True
+
+        # update the next piece early so it looks nice
+        self.update_starting_coords()
+        self.piece_board = self.piece_table.piece_boards[self.piece_bags[0][0]][self.piece_rotation] # update piece board early so it looks nice
+
+        self.update_game_board(new_board, self.board_hash ^ zobrist.cells_hash(placed_cells)) # only the new cells changed
+        cleared_rows = self.clear_lines()
+        self.update_ghost_piece()
+        # this has to happen at the very end
+        self.update_history(placed_cells, cleared_rows, new_board[cleared_rows])
+
+    def clear_lines(self):
+        # returns a 1d array of booleans for each line, true if its completed, false if not
+        lines_to_clear = numpy.all(self.game_board != 0, axis=1)
+        line_clear_count = numpy.where(lines_to_clear)[0].size
+        if line_clear_count > 0:
+            self.lines_cleared += line_clear_count
+            board_mask = self.game_board[~lines_to_clear] # masks the board, removing lines where the mask returned true
+            new_lines = numpy.zeros((line_clear_count, self.board_width), dtype=numpy.int8)
+            new_board = numpy.vstack((new_lines, board_mask), dtype=numpy.int8)
+            moved = numpy.flatnonzero(lines_to_clear)[-1] + 1 # rows below the lowest cleared one didn't move
+            self.update_game_board(new_board, self.board_hash ^ zobrist.board_hash(self.game_board[:moved]) ^ zobrist.board_hash(new_board[:moved]))
+        return numpy.flatnonzero(lines_to_clear) # indexes of the cleared lines, for the history
+
+    def top_out(self):
+        # TODO: add extra functionality later like displaying a score panel at the end
+        # the next seed comes from this one, so a replay tops out into the same pieces without recording the reset
+        self.reset_game(rng.mix(self.rng_seed + 1), record=False)
+
+    def update_game_board(self, new_board, board_hash=None): # anything that replaces or edits game_board should go through here, so the bitboard and hash stay in sync
+        self.game_state_changed = True
+        self.game_board = new_board.copy()
+        if self.bitboard is not None:
+            self.bitboard.load(self.game_board)
+        self.board_hash = zobrist.board_hash(self.game_board) if board_hash is None else board_hash # callers that know what changed pass the new hash
+
+    def update_queue_hash(self): # call after anything that changes the queue or hold
+        self.queue_hash = zobrist.queue_hash((self.piece_bags[0] + self.piece_bags[1])[:self.next_queue_size + 1], self.hold_pieces)
+
+    def state_hash(self):
+        """Zobrist hash of the board, the current piece, the next queue and hold (not where the piece is)"""
+        return self.board_hash ^ self.queue_hash
+
+    def gen_topout_board(self):
+        extra_height = self.board_extra_height
+        piece_size = self.piece_size
+        self.topout_board = numpy.zeros((piece_size, piece_size), dtype=numpy.int8)
+        next_shape = self.piece_table.piece_boards[(self.piece_bags[0] + self.piece_bags[1])[1]][self.STARTING_ROTATION] # same box as the shape, stamped with the id
+
+        # create the two boards to compare
+        top_rows = extra_height + math.floor(self.board_height/16) + 10 # 1 row less for boards < 24 high, and 2 less for boards < 8 high TODO: NO LONGER TRUE
+        top_rows = self.game_board[:top_rows].copy()
+        top_mask = top_rows.copy()
+        full_rows_index = extra_height + piece_size - 3 # min index of rows that should be all 1
+        for i, row in enumerate(top_mask):
+            if i < full_rows_index:
+                top_mask[i] = 1
+            else:
+                top_mask[i][0:i-full_rows_index] = 0
+                top_mask[i][i-full_rows_index:self.board_width-(i-full_rows_index)] = 1
+                top_mask[i][self.board_width-(i-full_rows_index):self.board_width] = 0
+        if numpy.any((top_rows != 0) & (top_mask != 0)):
+            self.topout_board = next_shape
+        else:
+            self.topout_board = None
+
+    def update_ghost_piece(self): # make sure piece_board has been updated before calling this function
+        if settings.ONEKF_ENABLED: # return an empty board if 1kf is enabled
+            self.ghost_board = numpy.zeros_like(self.ghost_board)
+            return
+        # calculate the coords
+        self.ghost_piece_x = self.piece_x
+        self.ghost_piece_y = self.piece_y + self.drop_distance() # lands wherever the piece would land
+        # update the board
+        self.ghost_board = self.piece_board.copy()
+
+    def gen_next_boards(self):
+        self.next_boards = []
+        next_list = (self.piece_bags[0] + self.piece_bags[1])[1:self.next_queue_size + 1] # gets a truncated next_pieces list
+
+        for piece_id in next_list:
+            self.next_boards.append(self.piece_table.preview_boards[piece_id]) # precompiled 5x5 board, read only
+
+    def gen_hold_boards(self):
+        self.hold_boards = []
+
+        for piece_id in self.hold_pieces:
+            self.hold_boards.append(self.piece_table.preview_boards[piece_id]) # precompiled 5x5 board, read only
+
+    def reset_game(self, seed=None, record=True):
+        # Clear boards
+        self.update_game_board(numpy.zeros_like(self.game_board))
+        self.game_history.reset()
+        self.piece_board = numpy.zeros_like(self.piece_board)
+
+        # Reset timers
+        self.timers.stop_all()
+
+        # Reset active piece
+        self.piece_x = self.starting_x
+        self.piece_y = self.starting_y
+        self.piece_rotation = self.STARTING_ROTATION
+        self.last_move_dir = 0
+        self.softdrop_overrides = True
+        self.bag_count = 0
+        self.rng_seed = rng.new_seed() if seed is None else seed # new game, new pieces
+        if record and self.recorder is not None: self.recorder.record(replay.RESET, self.rng_seed)
+        self.queue_spawn_piece = True
+        self.game_state_changed = True
+        self.board_state_changed = True
+
+        # Reset hold
+        self.hold_boards = numpy.zeros((self.max_hold_pieces, 5, 5), dtype=numpy.int8)
+        self.hold_pieces = []
+        self.holds_used = 0
+
+        # Reset piece bag, should usually be done again when loading gamemode
+        self.piece_bags[0] = self.generate_bag(self.piece_gen_type)
+        self.piece_bags[1] = self.generate_bag(self.piece_gen_type)
+        self.update_queue_hash()
+
+        # Reset stats
+        self.timer.reset()
+        self.lines_cleared = 0
+        self.pieces_placed = 0
+
+        self.gen_next_boards()
+        self.update_ghost_piece()
+        self.update_history()
+
+    def load_position(self, board, queue, hold_pieces=()):
+        """
+        Puts a prepared position on the board (a preset, see presets.py) without reset_game or load_game: board is
+        the bottom rows of the board, queue the current piece first, and the bags carry on after it. The stats and
+        history start over from the position, the seed stays the same.
+        """
+        board = numpy.asarray(board, dtype=numpy.int8)
+        # check everything before touching the game, a bad preset shouldn't leave it half loaded
+        if board.size % self.board_width or board.size // self.board_width > self.board_height:
+            raise ValueError(f"a board of {board.size} cells doesn't fit on a {self.board_width}x{self.board_height} board")
+        if not len(queue):
+            raise ValueError("the queue needs at least the current piece")
+        if len(hold_pieces) > self.max_hold_pieces:
+            raise ValueError(f"the position has {len(hold_pieces)} hold pieces, this game only holds {self.max_hold_pieces}")
+        piece_ids = range(1, self.piece_table.piece_types + 1)
+        if any(piece not in piece_ids for piece in list(queue) + list(hold_pieces)) or (board.size and not 0 <= board.min() <= board.max() <= piece_ids[-1]):
+            raise ValueError(f"the position has pieces that aren't in this game's piece set (1 to {piece_ids[-1]})")
+        board = board.reshape(-1, self.board_width)
+        if self.recorder is not None: self.recorder.record(replay.LOAD_POSITION, board.ravel().tolist(), list(queue), list(hold_pieces))
+        new_board = numpy.zeros_like(self.game_board)
+        if len(board):
+            new_board[-len(board):] = board
+        self.update_game_board(new_board)
+        self.piece_bags = [list(queue), self.generate_bag(self.piece_gen_type)]
+        self.hold_pieces = list(hold_pieces)
+        self.holds_used = 0
+        self.update_queue_hash()
+
+        self.timers.stop_all()
+        self.last_move_dir = 0
+        self.softdrop_overrides = True
+        self.timer.reset()
+        self.lines_cleared = 0
+        self.pieces_placed = 0
+        self.game_history.reset()
+        self.update_history()
+
+        # same as undo, everything the next spawn needs
+        self.update_starting_coords()
+        self.piece_board = self.piece_table.piece_boards[self.piece_bags[0][0]][self.piece_rotation]
+        self.queue_spawn_piece = True
+        self.game_state_changed = True
+        self.board_state_changed = True
+        self.gen_topout_board()
+        self.gen_hold_boards()
+        self.gen_next_boards()
+        self.update_ghost_piece()
+
+    def reset_gamemode(self):
+        if self.recorder is not None: self.recorder.record(replay.RESET_GAMEMODE)
+        # reset gamemode specific vars (defaults)
+        self.gamemode_names = []
+        self.pieces_dict = pieces.tetra_dict
+        self.piece_table = pieces.tetra_table
+        self.piece_inversions = pieces.TETRA_INVERSIONS
+        self.piece_gen_type = "BAG"
+        self.lockdown_type = "GUIDELINE"
+        self.next_queue_size = 4 # next pieces count is the user settings max
+                                 # next_queue_size will sometimes be smaller than the max depending on the gamemode
+        self.das_threshold = settings.DAS_THRESHOLD # 266.6666666
+        self.arr_threshold = settings.ARR_THRESHOLD # 100
+        self.sdr_threshold = settings.SDR_THRESHOLD # 33.33333333
+        self.are_threshold = 1000
+        self.allow_sonic_drop = True
+        self.allow_180 = True
+        self.allow_mirror = False
+        self.entry_delay = 0
+        self.max_hold_pieces = 1
+        self.spawn_y_offset = 0
+        self.infinite_holds = False
+        self.starting_gravity = 0 # measured in G (1g = 1 fall/frame, 20g = max speed at 60fps (should jump to like 200g though for more consistency)
+        self.mino_count = 4
+        self.piece_types = 7
+        self.update_piece_masks()
+
+    def handle_sonic_drop(self, keys):
+        if keys[settings.MOVE_SONICDROP] and self.allow_sonic_drop:
+            self.softdrop_overrides = True
+            return self.move_piece(0, self.board_height)
+        return 0
+
+    def handle_soft_drop(self, keys, dt):
+        if self.current_gravity > 0.001:
+            self.softdrop_overrides = (self.sdr_threshold <= 16.666667 / self.current_gravity and keys[settings.MOVE_SOFTDROP]) # returns true if softdrop is pressed and is faster than gravity
+        elif keys[settings.MOVE_SOFTDROP]:
+            self.softdrop_overrides = True # returns true always if gravity is 0 (prevents divide by 0)
+        else:
+            self.softdrop_overrides = False
+
+        if self.sdr_threshold == 0:
+            steps_to_move = self.board_height + 10
+        else:
+            steps_to_move = max(int(dt / self.sdr_threshold), 1) # predicts how much softdrop should move for first button press
+
+        if self.softdrop_overrides:
+            if not self.timers.running("soft_drop"):
+                self.timers.start("soft_drop")
+                return self.move_piece(0, steps_to_move) # returns remaining steps
+            if self.sdr_threshold != 0: # avoids divide by 0 error, steps_to_move is already the whole board then
+                steps_to_move = self.timers.periods("soft_drop", self.sdr_threshold)
+            if steps_to_move:
+                return self.move_piece(0, steps_to_move) # returns remaining steps
+        else:
+            self.timers.stop("soft_drop")
+        return 0
+
+    def hard_drop(self):
+        if not self.timers.running("prevent_harddrop") or self.timers.expired("prevent_harddrop", settings.PREVENT_HARDDROP_THRESHOLD):
+            self.move_piece(0, self.board_height + 10)
+            self.lock_piece()
+
+        self.timers.stop("prevent_harddrop") # stop it either way, because it only applies to the first hard drop after lockdown
+
+    def do_gravity(self, dt):
+        if self.current_gravity >= 15.8: # make instant drop at 20g regardless of framerate
+            remaining_steps = self.move_piece(0, self.board_height + 10)
+            return remaining_steps
+
+        if self.current_gravity <= 0.0001: # disable gravity if too low
+            return 0
+
+        if not self.softdrop_overrides: # only process gravity this tick if user isn't pressing the softdrop key
+            if not self.timers.running("gravity"):
+                self.timers.start("gravity")
+            steps_to_move = self.timers.periods("gravity", 16.666667 / self.current_gravity)
+            if steps_to_move:
+                return self.move_piece(0, steps_to_move) # returns remaining steps
+        else:
+            self.timers.postpone("gravity", dt) # hold gravity still while soft drop is faster
+        return 0
+
+    def do_leftover_gravity(self, remaining_steps): # for when a piece falls, touches the ground, then loses ground inside the same frame. prevents hanging for a frame.
+        if remaining_steps != 0: # check if the piece can move at all
+            self.move_piece(0, remaining_steps) # move the piece by the leftover amount from this frame
+
+    def handle_entry_delay(self, threshold = None): # currently buggy. need to fix
+        if threshold is None:
+            threshold = self.are_threshold
+        if threshold == 0 or not self.queue_spawn_piece: # if piece not spawning
+            return
+        if not self.timers.running("are"): # if timer not started
+            self.timers.start("are")
+        elif self.timers.expired("are", threshold):
+            self.timers.stop("are")
+            self.queue_spawn_piece = False
+            self.spawn_piece()
+
+    def update_pps(self):
+        total_time = self.timer.get_seconds()
+        if total_time == 0: # timer hasn't been started (headless games)
+            self.pps = 0
+            return
+        self.pps = round(self.pieces_placed / total_time, 2)
@@ -0,0 +1,130 @@
+"""
+history.py keeps the undo history as a ring buffer of small deltas.
+Each placement only records the cells it filled, which rows it cleared, and the queue/hold/stats/hash after it,
+all in arrays that are allocated once up front, so an entry costs the same no matter how big the board is.
+What was in the cleared rows goes in a ring of rows of its own, which only fills up as lines get cleared.
+Undo walks backwards through the deltas to rebuild the board instead of copying whole snapshots around.
+"""
+
+import numpy
+
+MAX_MINOS = 5 # biggest piece in any set, which is also the most lines one placement can clear
+MAX_QUEUE = 64 # both bags together, plenty for 18 pentominos plus whatever got swapped in from hold
+MAX_HOLD = 8
+
+class History:
+    def __init__(self, capacity, board_width, row_capacity=None):
+        self.capacity = capacity
+        self.board_width = board_width
+        self.row_capacity = capacity if row_capacity is None else row_capacity # a line per placement on average, a 4 wide combo's worth
+
+        self.mino_cells = numpy.zeros((capacity, MAX_MINOS, 2), dtype=numpy.int16) # (row, col) of each mino the placement added
+        self.mino_counts = numpy.zeros(capacity, dtype=numpy.int8)
+        self.cleared_rows = numpy.zeros((capacity, MAX_MINOS), dtype=numpy.int16) # row indexes from before the clear, top to bottom
+        self.cleared_counts = numpy.zeros(capacity, dtype=numpy.int8)
+        self.cleared_starts = numpy.zeros(capacity, dtype=numpy.int64) # where its rows start in the row ring, counted from the reset
+        self.stats = numpy.zeros((capacity, 3), dtype=numpy.int32) # pieces_placed, lines_cleared, bag_count
+        self.queues = numpy.zeros((capacity, MAX_QUEUE), dtype=numpy.int8) # both bags back to back
+        self.bag_lengths = numpy.zeros((capacity, 2), dtype=numpy.int8)
+        self.holds = numpy.zeros((capacity, MAX_HOLD), dtype=numpy.int8)
+        self.hold_counts = numpy.zeros(capacity, dtype=numpy.int8)
+        self.hashes = numpy.zeros(capacity, dtype=numpy.uint64) # Engine.state_hash after the placement
+        self.cleared_cells = numpy.zeros((self.row_capacity, board_width), dtype=numpy.int8) # what was in the cleared rows, so undo can put them back
+        self.rows_written = 0 # rows that have gone into cleared_cells since the reset, less the ones undo took back
+        self.first_kept_row = 0 # rows_written count of the oldest row that hasn't been written over yet
+
+        self.newest = -1 # index of the latest entry
+        self.size = 0 # how many entries are valid, the oldest one is the state undo can rewind to
+
+    def reset(self):
+        self.newest = -1
+        self.size = 0
+        self.rows_written = self.first_kept_row = 0
+
+    def nbytes_per_entry(self):
+        """Bytes every entry takes, not counting the cleared rows (board_width bytes for each row a placement clears)"""
+        arrays = (self.mino_cells, self.mino_counts, self.cleared_rows, self.cleared_counts, self.cleared_starts,
+                  self.stats, self.queues, self.bag_lengths, self.holds, self.hold_counts, self.hashes)
+        return sum(array.nbytes for array in arrays) // self.capacity
+
+    def push(self, placed_cells, cleared_rows, cleared_cells, pieces_placed, lines_cleared, bag_count, piece_bags, hold_pieces, state_hash=0):
+        """
+        Record one placement. placed_cells is a list of (row, col), cleared_rows are the rows it cleared
+        (indexes before the clear) and cleared_cells is what those rows held.
+        The very first entry after a reset has no cells, it's just the starting queue.
+        """
+        index = (self.newest + 1) % self.capacity
+
+        self.mino_counts[index] = len(placed_cells)
+        if placed_cells:
+            self.mino_cells[index, :len(placed_cells)] = placed_cells
+        self.cleared_counts[index] = len(cleared_rows)
+        if len(cleared_rows):
+            self.cleared_rows[index, :len(cleared_rows)] = cleared_rows
+            self.cleared_starts[index] = self.rows_written
+            self.cleared_cells[(self.rows_written + numpy.arange(len(cleared_rows))) % self.row_capacity] = cleared_cells
+            self.rows_written += len(cleared_rows)
+            self.first_kept_row = max(self.first_kept_row, self.rows_written - self.row_capacity)
+
+        self.stats[index] = (pieces_placed, lines_cleared, bag_count)
+        first_bag_length, second_bag_length = len(piece_bags[0]), len(piece_bags[1])
+        self.bag_lengths[index] = (first_bag_length, second_bag_length)
+        self.queues[index, :first_bag_length] = piece_bags[0]
+        self.queues[index, first_bag_length:first_bag_length + second_bag_length] = piece_bags[1]
+        self.hold_counts[index] = len(hold_pieces)
+        self.holds[index, :len(hold_pieces)] = hold_pieces
+        self.hashes[index] = state_hash
+
+        self.newest = index
+        self.size = min(self.size + 1, self.capacity)
+
+    def undo(self, board, amount):
+        """
+        Applies the inverse of the last amount placements to a copy of board and drops those entries.
+        Returns the rebuilt board, or None if there isn't that much history left.
+        """
+        if amount >= self.size:
+            return None
+        entries = (self.newest - numpy.arange(amount)) % self.capacity
+        clearing = entries[self.cleared_counts[entries] > 0]
+        if len(clearing) and self.cleared_starts[clearing].min() < self.first_kept_row:
+            return None # the rows those placements cleared have been written over since
+        board = board.copy()
+        for _ in range(amount):
+            index = self.newest
+            cleared_count = self.cleared_counts[index]
+            if cleared_count:
+                # put the cleared rows back where they were, everything above them shifts back up
+                cleared_mask = numpy.zeros(board.shape[0], dtype=bool)
+                cleared_mask[self.cleared_rows[index, :cleared_count]] = True
+                rebuilt = numpy.empty_like(board)
+                start = self.cleared_starts[index]
+                rebuilt[cleared_mask] = self.cleared_cells[(start + numpy.arange(cleared_count)) % self.row_capacity]
+                rebuilt[~cleared_mask] = board[cleared_count:] # the top rows were the blank ones the clear added
+                board = rebuilt
+                self.rows_written = start # the next clear can have those rows
+            cells = self.mino_cells[index, :self.mino_counts[index]]
+            board[cells[:, 0], cells[:, 1]] = 0 # take the piece back out
+
+            self.newest = (index - 1) % self.capacity
+            self.size -= 1
+        return board
+
+    def count_hash(self, state_hash):
+        """How many entries still in the buffer (the newest one too) had state_hash, so 2 or more is a repeated position"""
+        entries = (self.newest - numpy.arange(self.size)) % self.capacity
+        return int(numpy.count_nonzero(self.hashes[entries] == numpy.uint64(state_hash)))
+
+    def newest_state(self):
+        """Returns (pieces_placed, lines_cleared, bag_count, piece_bags, hold_pieces) of the latest entry"""
+        index = self.newest
+        pieces_placed, lines_cleared, bag_count = (int(value) for value in self.stats[index])
+        first_bag_length, second_bag_length = (int(length) for length in self.bag_lengths[index])
+        queue = self.queues[index].tolist()
+        piece_bags = [queue[:first_bag_length], queue[first_bag_length:first_bag_length + second_bag_length]]
+        hold_pieces = self.holds[index, :self.hold_counts[index]].tolist()
+        return pieces_placed, lines_cleared, bag_count, piece_bags, hold_pieces
+
+    def newest_hash(self):
+        """The state hash the latest entry was pushed with"""
+        return int(self.hashes[self.newest])
@@ -4,9 +4,11 @@ Loads the game, handles all gameloop functions in order, then does rendering.
 """
 
 import os, pygame, ctypes, numpy
-import engine, skinloader, ui, settings, menu, pieces
+pygame.init() # has to happen before ui is imported, it opens the window and loads fonts on import
+import engine, skinloader, ui, settings, menu, pieces, replay, profiler, timers, search, rollout, pcsolver, openings, combo, presets
 
 import time
+import collections
 
 os.environ['SDL_VIDEO_WINDOW_POS'] = str(settings.WINDOW_WIDTH / 2) + "," + str(settings.WINDOW_HEIGHT / 2)
 os.environ['SDL_VIDEO_CENTERED'] = '1'
@@ -17,8 +19,35 @@ pygame.display.set_caption("puppytris!!!!!")
 # trying all three things because what works depends on window manager?
 pygame.display.set_window_position((settings.WINDOW_POS_X, settings.WINDOW_POS_Y)) 
 
-def get_events():
-    return pygame.event.get()
+def poll_events():
+    """
+    Pulls everything out of pygame's queue and stamps it with perf_counter_ns as event.timestamp
+    (pygame events don't carry one). Called about every ms while waiting for the next frame,
+    so the stamp is within a ms or so of when the key actually went down.
+    """
+    now = time.perf_counter_ns()
+    for event in pygame.event.get():
+        event.timestamp = now
+        polled_events.append(event)
+
+def get_events():
+    poll_events()
+    events = polled_events[:]
+    polled_events.clear()
+    return events
+
+def wait_for_next_frame():
+    """Sleeps until the next frame is due at MAX_FRAMERATE, polling input in ~1ms naps instead of one long sleep"""
+    global next_frame_time
+    frame_ns = 1000000000 // settings.MAX_FRAMERATE
+    now = time.perf_counter_ns()
+    if next_frame_time is None or now - next_frame_time > frame_ns: # first frame, or we fell way behind, so don't try to catch up
+        next_frame_time = now
+    while now < next_frame_time:
+        poll_events()
+        time.sleep(min(next_frame_time - now, 1000000) / 1e9)
+        now = time.perf_counter_ns()
+    next_frame_time += frame_ns
 
 def toggle_fullscreen(is_fullscreen):
     if is_fullscreen:
@@ -53,114 +82,258 @@ def toggle_fullscreen(is_fullscreen):
     # update the skins
     pieces.init_skins()
     # make sure it draws everything
-    engine.game_state_changed = True
-    engine.board_state_changed = True
+    engine.game.game_state_changed = True
+    engine.game.board_state_changed = True
     ui.draw_background()
 
+frametime_clock = pygame.time.Clock() # only measures the fps now, wait_for_next_frame does the limiting
+next_frame_time = None # perf_counter_ns the next frame is due at
+polled_events = [] # events stamped by poll_events that the next frame hasn't handled yet
+held_keys = collections.defaultdict(bool) # what the simulation thinks is held down, updated from KEYDOWN/KEYUP in the order they happened
+frame_profiler = profiler.Profiler() # times every stage of the frame, F3 shows it
+show_profiler = False
+game_bot = search.SearchBot() # plays instead of the keyboard while engine.bot_playing is on
+pc_hint = pcsolver.PerfectClearHint() # looks for perfect clears in the background while a person is playing
+opening_book = openings.load_book(settings.OPENING_BOOK) # memory mapped, so even a huge book opens straight away
+position_analysis = rollout.PositionAnalysis() # F5, the playouts run on worker processes that are kept between analyses
+shown_hints = [] # the hint moves on screen, the board gets redrawn when they change
+shown_analysis = None # the analysis lines on screen, same idea
+puzzle_run = None # presets.PuzzleRun while puzzle mode is on
+
 # pre game stuff
+engine.game = engine.Engine()
+engine.game.step_times = dict.fromkeys(engine.STEP_STAGES, 0) # step adds up how long each of its stages took, game_loop hands that to frame_profiler
+
 def load_game(): # all this stuff is done twice after reset_game has called. it should be smarter.
     pieces.init_skins()
-    engine.piece_bags[0] = engine.generate_bag(engine.piece_gen_type) # generate the first two bags
-    engine.piece_bags[1] = engine.generate_bag(engine.piece_gen_type)
-    engine.gen_next_boards()
-    engine.spawn_piece() # later want delayed spawn first piece mechanic
-    engine.update_ghost_piece()
-    engine.unpack_1kf_binds()
-    engine.update_history()
+    engine.game.unpack_1kf_binds()
+    engine.game.load_game() # later want delayed spawn first piece mechanic
 
 load_game()
 mouse_was_down = False
 remaining_steps = 0 # remaining steps for gravity or soft-drop
-engine.game_state_changed = True # always true on the first frame
+engine.game.game_state_changed = True # always true on the first frame
 ui.draw_background()
 
-engine.timer.start()
+engine.game.timer.start()
 
-engine.game_board[9][0] = 1
+if settings.RECORD_REPLAYS:
+    os.makedirs(engine.replays_dir, exist_ok=True)
+    replay_path = os.path.join(engine.replays_dir, time.strftime("%Y-%m-%d_%H-%M-%S") + ".ptr")
+    engine.game.recorder = replay.Recorder(replay_path, engine.game)
 
-def game_loop(events):    for event in events:
+def game_loop(events):
+    global shown_hints, shown_analysis    for event in events:
         if event.type == pygame.KEYDOWN:
             if event.key == settings.KEY_EXIT:
                 if engine.STATE == 0: engine.running = False
                 else: engine.STATE -= 1
             if event.key == settings.KEY_FULLSCREEN:
                 toggle_fullscreen(False)
-                
-            if not settings.ONEKF_ENABLED:
-                if event.key == settings.KEY_HOLD:
-                    engine.hold_guideline(engine.infinite_holds)
-                if event.key == settings.ROTATE_180:
-                    if engine.allow_180: engine.rotate_piece(2)
-                if event.key == settings.ROTATE_CW:
-                    engine.rotate_piece(1)
-                if event.key == settings.ROTATE_CCW:
-                    engine.rotate_piece(3)
-                if event.key == settings.ROTATE_MIRROR:
-                    if engine.allow_mirror: engine.mirror_piece()
-                if event.key == settings.MOVE_HARDDROP:
-                    engine.hard_drop()
-                if event.key == settings.KEY_RESET:
-                    engine.reset_game()
-                if event.key == settings.KEY_UNDO: # TODO: NEED TO MAKE ALT UNDO KEYS AND RESET KEYS FOR 1KF
-                    engine.undo(1)
-            else:
-                if numpy.isin(event.key, engine.onekf_key_array):
-                    engine.handle_1kf(event.key)
-                if event.key == settings.ONEKF_HOLD:
-                    engine.hold_guideline()
+            if event.key == settings.KEY_ANALYZE:
+                analyze_position()
+            if event.key == settings.KEY_PC_HINT:
+                settings.PC_HINT = not settings.PC_HINT
+            if event.key == settings.KEY_PUZZLE:
+                toggle_puzzle_mode()
+            if event.key == settings.KEY_NEXT_PUZZLE and puzzle_run is not None:
+                if not puzzle_run.next(engine.game): toggle_puzzle_mode()
         if event.type == pygame.QUIT:
             engine.running = False
         if event.type == pygame.ACTIVEEVENT:
             if event.state & pygame.APPACTIVE > 0 and event.gain == 1: # weird bitwise stuff because activity is represented as bits in an integer
-                engine.game_state_changed = True
-                engine.board_state_changed = True
-
-    frametime = engine.frametime_clock.get_time()
-    keys = pygame.key.get_pressed()
-    if engine.queue_spawn_piece:
-        engine.spawn_piece()
-    remaining_grav = engine.handle_soft_drop(keys, frametime)
-    remaining_grav += engine.handle_sonic_drop(keys)
-    remaining_grav += engine.do_gravity(frametime) # this logic works the same as max() would, since one of them is always bound to be zero
-    if engine.check_touching_ground():
-        engine.lockdown(engine.lockdown_type, frametime)
-
-    if not engine.queue_spawn_piece: # if no more piece, skip remaining movement logic
-        if not settings.ONEKF_ENABLED:
-            engine.handle_movement(keys)
-        engine.do_leftover_gravity(remaining_grav)
+                engine.game.game_state_changed = True
+                engine.game.board_state_changed = True
+    frame_profiler.mark("input")
 
-    if engine.board_state_changed:
+    run_simulation([event for event in events if event.type == pygame.KEYDOWN or event.type == pygame.KEYUP])
+    step_times = engine.game.step_times
+    for stage in engine.STEP_STAGES: # every tick this frame added together, per stage, so a hitch still shows which one it was
+        frame_profiler.add(stage, step_times[stage])
+        step_times[stage] = 0
+    frame_profiler.mark("simulation") # whatever's left, the keys and the bot in between ticks
+    if puzzle_run is not None:
+        if not puzzle_run.update(engine.game): # the next puzzle goes on with load_position, no load_game
+            toggle_puzzle_mode() # every puzzle left in the file was turned down by load_position
+        frame_profiler.mark("puzzle")
+    if engine.bot_playing:
+        game_bot.think(engine.game, settings.BOT_THINK_SLICE_MS) # a slice of the lookahead every frame, it plays in run_simulation once it's decided
+        frame_profiler.mark("bot")
+    position_analysis.update(engine.game) # only picks up finished playouts, unless there's no worker to run them
+    frame_profiler.mark("analysis")
+    hints = [move for move in [position_analysis.best_move(engine.game)] if move is not None] # the analysis first, then the opening book, then a perfect clear, then the combo graph
+    if settings.OPENING_HINT and opening_book is not None and not engine.bot_playing and not hints:
+        hints = [move for move in [opening_book.move(engine.game)] if move is not None] # a binary search for the position's zobrist hash
+    if settings.PC_HINT and not engine.bot_playing and not hints:
+        pc_hint.update(engine.game, settings.PC_HINT_SLICE_MS) # never waits on the search, it just picks up whatever's finished
+        hints = [move for move in [pc_hint.suggestion(engine.game)] if move is not None]
+        frame_profiler.mark("pc_hint")
+    if settings.COMBO_HINT and not engine.bot_playing and not hints:
+        combo_graph = combo.graph_for(engine.game) # loaded once per piece set and board size
+        if combo_graph is not None:
+            hints = combo_graph.moves(engine.game)
+    if hints != shown_hints: # a solution turned up (or went away) without the game changing
+        shown_hints = hints
+        engine.game.game_state_changed = True
+    analysis = position_analysis.lines(engine.game)
+    if analysis is not shown_analysis: # redraw what the old overlay covered
+        shown_analysis = analysis
+        engine.game.game_state_changed = True
+
+    if engine.game.board_state_changed:
         ui.draw_board() # if the board state has changed, update the board surface
-    if engine.game_state_changed:
+        frame_profiler.mark("draw_board")
+    if engine.game.game_state_changed:
         ui.MAIN_SCREEN.blit(ui.BACKGROUND_SURFACE) # TODO: offset is being drawn into the surface itself, instead of using blit(cordx, cordy, surface)
+        frame_profiler.mark("blit_background")
         ui.draw_board_background()
+        frame_profiler.mark("draw_board_background")
         ui.draw_grid_lines()
+        frame_profiler.mark("draw_grid_lines")
         ui.draw_ghost_board()
+        frame_profiler.mark("draw_ghost_board")
+        ui.draw_move_hints(shown_hints)
+        frame_profiler.mark("draw_move_hints")
         ui.MAIN_SCREEN.blit(ui.BOARD_SURFACE)
+        frame_profiler.mark("blit_board")
         ui.draw_piece_board()
+        frame_profiler.mark("draw_piece_board")
         ui.draw_topout_board()
+        frame_profiler.mark("draw_topout_board")
         ui.draw_stats_panel_bg()
+        frame_profiler.mark("draw_stats_panel_bg")
         ui.draw_next_panel()
-        if engine.hold_pieces_count > 0: ui.draw_hold_panel()
+        frame_profiler.mark("draw_next_panel")
+        if engine.game.hold_pieces_count > 0: ui.draw_hold_panel()
+        frame_profiler.mark("draw_hold_panel")
         ui.draw_score_panel(level="99", score="99,999")
-    engine.game_state_changed = False # reset it for next frame
-    engine.board_state_changed = False
+        frame_profiler.mark("draw_score_panel")
+    engine.game.game_state_changed = False # reset it for next frame
+    engine.game.board_state_changed = False
 
-    mins_secs, dot_ms = engine.timer.split_strings()
-    engine.update_pps()
+    mins_secs, dot_ms = engine.game.timer.split_strings()
+    engine.game.update_pps()
     ui.draw_stats_panel_text(
-        PPS=str(engine.pps),
+        PPS=str(engine.game.pps),
         TIME_S=mins_secs,
         TIME_MS=dot_ms,
-        CLEARED=str(engine.lines_cleared)
+        CLEARED=str(engine.game.lines_cleared)
     )
+    frame_profiler.mark("draw_stats_panel_text")
+    if shown_analysis is not None:
+        ui.draw_analysis(shown_analysis)
+        frame_profiler.mark("draw_analysis")
+
+def handle_game_key(event):
+    """One KEYDOWN/KEYUP, handled at the point in the simulation where it happened"""
+    if event.type == pygame.KEYDOWN:
+        held_keys[event.key] = True
+        if not settings.ONEKF_ENABLED:
+            if event.key == settings.KEY_HOLD:
+                engine.game.hold_guideline(engine.game.infinite_holds)
+            if event.key == settings.ROTATE_180:
+                if engine.game.allow_180: engine.game.rotate_piece(2)
+            if event.key == settings.ROTATE_CW:
+                engine.game.rotate_piece(1)
+            if event.key == settings.ROTATE_CCW:
+                engine.game.rotate_piece(3)
+            if event.key == settings.ROTATE_MIRROR:
+                if engine.game.allow_mirror: engine.game.mirror_piece()
+            if event.key == settings.MOVE_HARDDROP:
+                engine.game.hard_drop()
+            if event.key == settings.KEY_RESET:
+                engine.game.reset_game()
+            if event.key == settings.KEY_UNDO: # TODO: NEED TO MAKE ALT UNDO KEYS AND RESET KEYS FOR 1KF
+                engine.game.undo(1)
+        else:
+            if numpy.isin(event.key, engine.game.onekf_key_array):
+                engine.game.handle_1kf(event.key)
+            if event.key == settings.ONEKF_HOLD:
+                engine.game.hold_guideline()
+    else:
+        held_keys[event.key] = False
+    engine.game.handle_held_keys(held_keys) # so a tap shorter than a tick still moves, and DAS charges from the real press
+
+def run_simulation(key_events):
+    """
+    Steps the engine in fixed ticks of 1 / SIM_TICK_RATE seconds until its clock has caught up with perf_counter_ns,
+    so gravity, DAS and lockdown don't depend on the framerate. Drawing just shows whatever state it ends on.
+    Key events are handled in between the ticks, in order, at the tick their timestamp falls in.
+    While the bot is playing it gets a go every tick instead, and the keys are ignored.
+    """
+    game_timers = engine.game.timers
+    target = time.perf_counter_ns()
+    max_behind = settings.MAX_SIM_CATCHUP * timers.NS_PER_MS
+    if target - game_timers.now > max_behind:
+        game_timers.skip(target - game_timers.now - max_behind)
+
+    tick_ns = 1000000000 // settings.SIM_TICK_RATE
+    tick_ms = tick_ns / timers.NS_PER_MS
+    if engine.bot_playing:
+        key_events = []
+    index = 0
+    while game_timers.now + tick_ns <= target:
+        while index < len(key_events) and key_events[index].timestamp <= game_timers.now:
+            handle_game_key(key_events[index])
+            index += 1
+        if engine.bot_playing:
+            game_bot.update(engine.game)
+        engine.game.step(held_keys, tick_ms)
+    for event in key_events[index:]: # stamped after the last full tick, still this frame
+        handle_game_key(event)
+
+def pause_simulation():
+    """Keeps the game clock level with real time while the game isn't being stepped, so it doesn't fast forward after"""
+    game_timers = engine.game.timers
+    game_timers.skip(max(0, time.perf_counter_ns() - game_timers.now))
+    held_keys.clear() # key ups can get eaten by the menu
 
 def menu_loop(events):
+    pause_simulation()
     menu.draw_menu(events)
+    frame_profiler.mark("menu")
 
 def mod_screen_loop(events):
+    pause_simulation()
     menu.draw_mod_screen(events)
+    frame_profiler.mark("menu")
+
+def handle_profiler_keys(events):
+    global show_profiler
+    for event in events:
+        if event.type == pygame.KEYDOWN:
+            if event.key == settings.KEY_PROFILER:
+                show_profiler = not show_profiler
+                if not show_profiler: # redraw everything the overlay was covering
+                    engine.game.game_state_changed = True
+                    engine.game.board_state_changed = True
+            if event.key == settings.KEY_PROFILER_DUMP:
+                os.makedirs(engine.profiles_dir, exist_ok=True)
+                frame_profiler.dump(os.path.join(engine.profiles_dir, time.strftime("%Y-%m-%d_%H-%M-%S") + ".json"))
+
+def analyze_position():
+    """Starts a rollout analysis of every move for the current piece, it shows up in the top left once the playouts are done"""
+    position_analysis.start(engine.game)
+
+def toggle_puzzle_mode():
+    """Turns puzzle mode on (from the first puzzle in PUZZLE_FILE) or off (back to a normal game)"""
+    global puzzle_run
+    if puzzle_run is not None:
+        print(f"puzzle mode off, {puzzle_run.solved} solved, {puzzle_run.failed} failed")
+        puzzle_run = None
+        engine.game.reset_game()
+        return
+    puzzle_presets = presets.load_presets(settings.PUZZLE_FILE) # memory mapped, so it's there straight away
+    if puzzle_presets is None or not len(puzzle_presets):
+        print(f"no puzzles in {settings.PUZZLE_FILE}, make some with puzzlegen.py")
+        return
+    if not puzzle_presets.matches(engine.game): # another piece set's ids would go straight into load_position
+        print(f"{settings.PUZZLE_FILE} is for a {puzzle_presets.width}x{puzzle_presets.height} board with other rules, make it again with puzzlegen.py")
+        return
+    puzzle_run = presets.PuzzleRun(puzzle_presets)
+    if not puzzle_run.load(engine.game):
+        print(f"none of the puzzles in {settings.PUZZLE_FILE} fit this game, make them again with puzzlegen.py")
+        puzzle_run = None
 
 def go_back():
     engine.STATE -= 1
@@ -172,19 +345,34 @@ state_funcs = {
 }
 
 while engine.running:
-    engine.frametime_clock.tick(settings.MAX_FRAMERATE)
-    fps = str(int(engine.frametime_clock.get_fps()))
+    frame_profiler.frame_start()
+    wait_for_next_frame()
+    frametime_clock.tick()
+    fps = str(int(frametime_clock.get_fps()))
+    frame_profiler.mark("wait") # time spent sleeping until the next frame
 
     # Run current state’s logic
     events = get_events()
+    handle_profiler_keys(events)
+    frame_profiler.mark("events")
     state_funcs[engine.STATE](events)
 
     # Draw FPS (universal part)
     ui.draw_fps(fps)
+    if show_profiler:
+        ui.draw_profiler(frame_profiler)
+    frame_profiler.mark("draw_fps")
 
     pygame.display.flip()
+    frame_profiler.mark("flip")
 
     if not engine.running: # wait for the main loop to finish running to quit properly
 
+        if engine.game.recorder is not None:
+            engine.game.recorder.close(engine.game) # writes out whatever is still buffered
+        game_bot.close()
+        pc_hint.close()
+        position_analysis.close()
+
         pygame.quit()
     
\ No newline at end of file
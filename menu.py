@@ -5,7 +5,7 @@ menu.py has UI functions and stuff for the menu I guess (kity put more info here
 import pygame
 import math
 
-import ui, engine, settings, gamemodes
+import ui, engine, settings, gamemodes, bot
 
 from ui import draw_rect, draw_text
 
@@ -81,18 +81,27 @@ def draw_menu(events):
     button_spacing = 20  # vertical space between buttons
 
     def start_tetra():
-        engine.reset_game()
-        engine.load_gamemode(gamemodes.TetraminoBase)
+        engine.game.reset_game()
+        engine.game.load_gamemode(gamemodes.TetraminoBase)
         engine.STATE = 1
 
     def start_penta():
-        engine.reset_game()
-        engine.load_gamemode(gamemodes.PentominoBase)
+        engine.game.reset_game()
+        engine.game.load_gamemode(gamemodes.PentominoBase)
         engine.STATE = 1
 
+    def toggle_bot():
+        engine.bot_playing = not engine.bot_playing
+
+    if engine.game.board_height > bot.MAX_BOARD_HEIGHT: # the bot can't play on a board this tall, so no button for it
+        bot_button = ("Bot: board too tall", None)
+    else:
+        bot_button = ("Bot: On" if engine.bot_playing else "Bot: Off", toggle_bot)
+
     button_data = [
         ("Start Tetris", start_tetra),
         ("Start Pentris", start_penta),
+        bot_button,
         ("Quit", pygame.quit)
     ]
 
@@ -175,32 +184,32 @@ def draw_mod_screen(events):
     grid_cols = 3  # number of buttons per row
     
     def Default():
-        engine.reset_game()
-        engine.reset_gamemode()
+        engine.game.reset_game()
+        engine.game.reset_gamemode()
         engine.STATE = 2
     
     def Guideline():
-        engine.reset_game()
-        engine.reset_gamemode()
-        engine.load_gamemode(gamemodes.Guideline)
+        engine.game.reset_game()
+        engine.game.reset_gamemode()
+        engine.game.load_gamemode(gamemodes.Guideline)
         engine.STATE = 2
         
     def Classic():
-        engine.reset_game()
-        engine.reset_gamemode()
-        engine.load_gamemode(gamemodes.Classic)
+        engine.game.reset_game()
+        engine.game.reset_gamemode()
+        engine.game.load_gamemode(gamemodes.Classic)
         engine.STATE = 2
         
     def Arcade():
-        engine.reset_game()
-        engine.reset_gamemode()
-        engine.load_gamemode(gamemodes.BetterArcade)
+        engine.game.reset_game()
+        engine.game.reset_gamemode()
+        engine.game.load_gamemode(gamemodes.BetterArcade)
         engine.STATE = 2
         
     def Teeny():
-        engine.reset_game()
-        engine.reset_gamemode()
-        engine.load_gamemode(gamemodes.Teeny)
+        engine.game.reset_game()
+        engine.game.reset_gamemode()
+        engine.game.load_gamemode(gamemodes.Teeny)
         engine.STATE = 2
     
     button_data = [
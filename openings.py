@@ -0,0 +1,245 @@
+"""
+openings.py is the opening book: the best placement for every position near the start of a game, worked out
+ahead of time and looked up while playing, for practising openings. The builder starts from an empty board,
+plays every piece of the first bag everywhere it can go (with hold), and for every board it gets to and every
+order the rest of the bag could come in, picks the move with the lookahead (search.plan_move), or the first
+move of a perfect clear with --perfect-clears.
+
+    python openings.py --gamemode Guideline --pieces 2                 written to settings.OPENING_BOOK
+    python openings.py --board 10x24 --pieces 1 --depth 5 -j 8
+
+A book is one file: a 64 byte header, then every key as a sorted uint64, then the move for every key as a fixed
+5 byte record. The key of a position is its Engine.state_hash() (the Zobrist hash of the board, the visible
+queue and hold), so looking a position up while playing costs nothing to compute. OpeningBook memory maps the
+keys and the moves and finds a key with a binary search, so opening a book reads only the header and a lookup
+only touches the few pages the search lands on, however big the file is.
+The builder keeps everything in memory until it sorts and writes the file, so that's where the size limit is.
+"""
+
+import os
+import sys
+import time
+import hashlib
+import argparse
+import itertools
+import multiprocessing
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy
+
+import engine, gamemodes, bot, pcsolver, search, settings, zobrist
+
+MAGIC = b"PTBOOK01"
+VERSION = 1
+HEADER_DTYPE = numpy.dtype([("magic", "S8"), ("version", "<u4"), ("queue_size", "<u4"), ("count", "<u8"), ("rules", "<u8"), ("reserved", "V32")])
+KEY_DTYPE = numpy.dtype("<u8")
+MOVE_DTYPE = numpy.dtype([("held", "u1"), ("piece", "u1"), ("x", "i1"), ("y", "i1"), ("rotation", "u1")])
+
+def rules_id(game):
+    """64 bit fingerprint of everything a book's moves depend on, a book only gets used in a game with the same one"""
+    rules = search.Rules(game)
+    description = repr((rules.key, game.next_queue_size, game.max_hold_pieces, game.board_extra_height))
+    return int.from_bytes(hashlib.blake2b(description.encode(), digest_size=8).digest(), "little")
+
+def position_key(board, queue, hold):
+    """The same number Engine.state_hash() gives for board with queue (current piece first) and hold (0 for none)"""
+    return zobrist.board_hash(board) ^ zobrist.queue_hash(queue, [hold] if hold else [])
+
+def bag_pieces(game, bag_count):
+    """The pieces in the bag_count-th "BAG" bag (rare pieces only come in the even ones), like Engine.generate_bag"""
+    return [piece for piece, data in game.pieces_dict.items() if not (data.get("rare", False) and bag_count % 2 == 1)]
+
+class OpeningBook:
+    """A book file, memory mapped. move(game) is the book move for game's position, or None"""
+    def __init__(self, path):
+        header = numpy.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if len(header) != 1 or header["magic"][0] != MAGIC or header["version"][0] != VERSION:
+            raise ValueError(f"{path} isn't an opening book")
+        self.path = path
+        self.count = int(header["count"][0])
+        self.queue_size = int(header["queue_size"][0])
+        self.rules = int(header["rules"][0])
+        if self.count: # numpy can't map an empty range
+            self.keys = numpy.memmap(path, dtype=KEY_DTYPE, mode="r", offset=HEADER_DTYPE.itemsize, shape=(self.count,))
+            self.moves = numpy.memmap(path, dtype=MOVE_DTYPE, mode="r", offset=HEADER_DTYPE.itemsize + KEY_DTYPE.itemsize * self.count, shape=(self.count,))
+        else:
+            self.keys, self.moves = numpy.zeros(0, dtype=KEY_DTYPE), numpy.zeros(0, dtype=MOVE_DTYPE)
+        self._rules_cache = {} # (id(game), gamemodes, board size) -> whether the book is for that game
+
+    def find(self, key):
+        """(held first or not, piece, x, y, rotation) for a position key, or None if it isn't in the book"""
+        index = int(numpy.searchsorted(self.keys, numpy.uint64(key))) # a uint64 needle, anything else makes numpy convert all the keys
+        if index == self.count or int(self.keys[index]) != key:
+            return None
+        held, piece, x, y, rotation = self.moves[index].tolist()
+        return bool(held), piece, x, y, rotation
+
+    def matches(self, game):
+        cache_key = id(game), tuple(game.gamemode_names), game.board_width, game.board_height
+        if cache_key not in self._rules_cache:
+            self._rules_cache[cache_key] = rules_id(game) == self.rules
+        return self._rules_cache[cache_key]
+
+    def move(self, game):
+        """The book move for game's current piece, placed from its spawn, or None"""
+        if game.queue_spawn_piece or not self.matches(game):
+            return None
+        move = self.find(game.state_hash())
+        if move is not None and move[0] and not (game.holds_used < game.max_hold_pieces or game.infinite_holds):
+            return None # the book holds here but this piece already has
+        return move
+
+def load_book(path):
+    """OpeningBook for path (relative to the game folder), or None if there's no book there"""
+    if not path:
+        return None
+    path = os.path.join(engine.script_dir, path)
+    return OpeningBook(path) if os.path.exists(path) else None
+
+def write_book(path, rules, queue_size, keys, moves):
+    """Sorts the records by key (the first one of a key wins) and writes them out as a book"""
+    order = numpy.argsort(keys, kind="stable")
+    keys, moves = keys[order], moves[order]
+    first = numpy.ones(len(keys), dtype=bool)
+    first[1:] = keys[1:] != keys[:-1]
+    keys, moves = keys[first].astype(KEY_DTYPE), moves[first]
+    header = numpy.zeros(1, dtype=HEADER_DTYPE)
+    header["magic"], header["version"], header["queue_size"], header["count"], header["rules"] = MAGIC, VERSION, queue_size, len(keys), rules
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", "wb") as file: # a game that has the old book mapped keeps reading the old file
+        file.write(header.tobytes())
+        file.write(keys.tobytes())
+        file.write(moves.tobytes())
+    os.replace(path + ".tmp", path)
+    return len(keys)
+
+def queue_windows(first_bag, second_bag, used, hold, size):
+    """Every visible queue (current piece first) the rest of the first bag and then the second bag could give"""
+    left = [piece for piece in first_bag if piece not in used and piece != hold]
+    if len(left) >= size:
+        yield from itertools.permutations(left, size)
+        return
+    for start in itertools.permutations(left):
+        for end in itertools.permutations(second_bag, size - len(left)):
+            yield start + end
+
+def child_positions(rules, board, used, hold, first_bag, can_hold):
+    """(board, used, hold) after every placement of every piece the position could play next, with or without hold"""
+    board_hash = zobrist.board_hash(board)
+    left = [piece for piece in first_bag if piece not in used and piece != hold]
+    plays = [] # (piece to place, pieces used after, hold after)
+    for current in left:
+        plays.append((current, used | {current}, hold))
+        if can_hold and hold:
+            plays.append((hold, used | {current}, current))
+        elif can_hold:
+            plays += [(following, used | {current, following}, current) for following in left if following != current]
+    children = []
+    columns = bot.board_columns(board)
+    for piece, new_used, new_hold in plays:
+        candidates = search.cached_placements(rules, board, board_hash, piece)
+        if not candidates:
+            continue
+        pieces_xyr = numpy.array([candidate[:4] for candidate in candidates], dtype=numpy.intp)
+        new_columns, lines = bot.place_pieces(rules.piece_table, numpy.tile(columns, (len(candidates), 1)), *pieces_xyr.T)
+        for child in new_columns:
+            children.append((search.columns_board(child, rules.board_height), frozenset(new_used), new_hold))
+    return children
+
+def build_job(job):
+    """The book records for one position and every queue it could have, as (keys, moves) arrays"""
+    rules, weights, board, used, hold, first_bag, second_bag, options = job
+    queue_size, depth, beam_width, can_hold, perfect_clears, piece_size, main_height = options
+    keys, moves = [], []
+    plans = {} # the lookahead never gets past queue[depth] (hold takes one more), so queues that start the same get the same move
+    for queue in queue_windows(first_bag, second_bag, used, hold, queue_size):
+        move = None
+        if perfect_clears:
+            pc_search = pcsolver.PerfectClearSearch(rules, board, queue, hold, can_hold, True, piece_size, main_height)
+            pc_search.work()
+            if pc_search.solution:
+                move = pc_search.solution[0]
+        if move is None:
+            if queue[:depth + 1] not in plans:
+                plans[queue[:depth + 1]] = search.plan_move(rules, weights, board, queue, hold, depth, beam_width, can_hold)
+            plan = plans[queue[:depth + 1]]
+            if plan is None:
+                continue
+            held, (piece, x, y, rotation, path) = plan
+            move = held, piece, x, y, rotation
+        keys.append(position_key(board, queue, hold))
+        moves.append(move)
+    return numpy.array(keys, dtype=KEY_DTYPE), numpy.array(moves, dtype=MOVE_DTYPE).reshape(-1)
+
+def reachable_positions(game, rules, pieces_played, first_bag):
+    """Every distinct (board, used pieces, hold) from the empty board after 0 to pieces_played - 1 pieces of the first bag"""
+    can_hold = game.max_hold_pieces == 1
+    level = [(numpy.zeros((game.board_height, game.board_width), dtype=bool), frozenset(), 0)]
+    for played in range(pieces_played):
+        yield from level
+        if played == pieces_played - 1:
+            break
+        seen, next_level = set(), []
+        for board, used, hold in level:
+            for child in child_positions(rules, board, used, hold, first_bag, can_hold):
+                key = zobrist.board_hash(child[0]), child[1], child[2]
+                if key not in seen and len(child[1]) < len(first_bag): # something left in the first bag (used has the hold piece too)
+                    seen.add(key)
+                    next_level.append(child)
+        level = next_level
+
+def build(game, pieces_played, depth=None, beam_width=None, perfect_clears=False, weights=None, processes=1, log=print):
+    """All the book records for game's rules as (keys, moves), see the module docstring"""
+    if game.piece_gen_type != "BAG":
+        raise ValueError(f"opening books need the \"BAG\" randomizer, not {game.piece_gen_type}")
+    rules = search.Rules(game)
+    queue_size = game.next_queue_size + 1
+    can_hold = game.max_hold_pieces == 1 # the search only knows the one slot hold_guideline swaps with
+    options = (queue_size, settings.BOT_LOOKAHEAD if depth is None else depth, settings.BOT_BEAM_WIDTH if beam_width is None else beam_width,
+               can_hold, perfect_clears, game.mino_count, game.board_height - game.board_extra_height)
+    first_bag, second_bag = bag_pieces(game, 1), bag_pieces(game, 2)
+    weights = dict(bot.WEIGHTS if weights is None else weights)
+    jobs = ((rules, weights, board, used, hold, first_bag, second_bag, options)
+            for board, used, hold in reachable_positions(game, rules, pieces_played, first_bag))
+    keys, moves = [], []
+    start = time.perf_counter()
+    pool = multiprocessing.Pool(processes) if processes > 1 else None
+    try:
+        results = pool.imap_unordered(build_job, jobs) if pool is not None else map(build_job, jobs)
+        for done, (job_keys, job_moves) in enumerate(results, 1):
+            keys.append(job_keys)
+            moves.append(job_moves)
+            if done % 50 == 0:
+                log(f"{done} positions, {sum(map(len, keys))} records  {time.perf_counter() - start:.1f}s")
+    finally:
+        if pool is not None:
+            pool.terminate()
+    return rules_id(game), queue_size, numpy.concatenate(keys), numpy.concatenate(moves)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Build an opening book of the best move for positions early in a game.")
+    parser.add_argument("--gamemode", default="Guideline", help="gamemode on top of the piece set, its randomizer has to be \"BAG\"")
+    parser.add_argument("--pentominos", action="store_true", help="the pentomino piece set instead of tetrominos")
+    parser.add_argument("--board", type=lambda text: tuple(int(part) for part in text.lower().split("x")),
+                        default=(settings.BOARD_WIDTH, settings.BOARD_HEIGHT), help="WIDTHxHEIGHT (height includes the extra rows)")
+    parser.add_argument("--pieces", type=int, default=2, help="positions before each of the first this many pieces")
+    parser.add_argument("--depth", type=int, default=None, help="pieces the lookahead plays (default BOT_LOOKAHEAD)")
+    parser.add_argument("--beam-width", type=int, default=None)
+    parser.add_argument("--perfect-clears", action="store_true", help="play towards a perfect clear wherever the queue has one")
+    parser.add_argument("-j", "--processes", type=int, default=os.cpu_count(), help="worker processes (1 runs in this process)")
+    parser.add_argument("--out", default=os.path.join(engine.script_dir, settings.OPENING_BOOK), help="book file (default settings.OPENING_BOOK, where the game looks)")
+    options = parser.parse_args(argv)
+
+    game = engine.Engine(board_width=options.board[0], board_height=options.board[1], seed=0)
+    game.load_gamemode(gamemodes.PentominoBase if options.pentominos else gamemodes.TetraminoBase)
+    game.load_gamemode(getattr(gamemodes, options.gamemode))
+    game.reset_game(0, record=False)
+    start = time.perf_counter()
+    rules, queue_size, keys, moves = build(game, options.pieces, options.depth, options.beam_width, options.perfect_clears, processes=options.processes)
+    count = write_book(options.out, rules, queue_size, keys, moves)
+    print(f"{count} positions in {options.out} ({os.path.getsize(options.out):,} bytes)  {time.perf_counter() - start:.1f}s")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,315 @@
+"""
+pcsolver.py looks for a perfect clear: a way to play the current piece, the visible next queue and hold that
+leaves the board completely empty. On the default 4 wide board that's only a handful of pieces, so it can just
+try everything. PerfectClearHint runs it in the background and ui.draw_move_hints shows the next placement of the
+solution on the board, next to the ghost.
+
+The board is one int (a bitboard): bit row * width + col, with row 0 the bottom row, so placing a piece is an OR,
+a full row is a mask compare and clearing it is a couple of shifts. A perfect clear of `rows` lines means every
+cell under that line gets filled and nothing goes above it, so rows is picked first (the lowest the pieces can
+fill exactly) and every placement that pokes above it is skipped. Boards that can't work out are kept in a set by
+(board, rows, queue index, hold), so the same dead end reached through hold or in a different order is only
+searched once. Like most perfect clear finders it first skips boards with an empty area whose size isn't a
+multiple of the piece size. That misses the odd solution where a line clear joins two areas together, so if it
+finds nothing it goes through everything again without that check.
+"""
+
+import time
+
+import numpy
+
+import placements, search, settings
+
+_placements_cache = {} # (rules key, board, piece) -> [(piece, x, y, rotation, cells mask)], kept between searches
+
+def board_field(board):
+    """A numpy board (row 0 at the top) as a bitboard int (row 0 at the bottom)"""
+    filled = numpy.packbits(board[::-1] != 0, axis=None, bitorder="little")
+    return int.from_bytes(filled.tobytes(), "little")
+
+def field_board(field, width, height):
+    """board_field backwards"""
+    size = width * height
+    cells = numpy.unpackbits(numpy.frombuffer(field.to_bytes((size + 7) // 8, "little"), dtype=numpy.uint8), bitorder="little")
+    return cells[:size].reshape(height, width)[::-1]
+
+def cached_placements(rules, field, piece):
+    """find_placements for piece on the bitboard field, each with the mask of the cells it fills"""
+    key = rules.key, field, piece
+    if key not in _placements_cache:
+        if len(_placements_cache) >= search.MAX_CACHED_PLACEMENTS:
+            _placements_cache.clear()
+        width, height = rules.board_width, rules.board_height
+        board = field_board(field, width, height)
+        minos = rules.piece_table.minos
+        found = []
+        for piece_id, x, y, rotation, path in placements.find_placements(search.Position(rules, board, piece), with_paths=False):
+            mask = 0
+            for row, col in minos[piece_id][rotation]:
+                mask |= 1 << ((height - 1 - y - row) * width + x + col)
+            found.append((piece_id, x, y, rotation, mask))
+        found.sort(key=lambda placement: placement[4]) # lowest first, filling the bottom is usually what works
+        _placements_cache[key] = found
+    return _placements_cache[key]
+
+def clear_lines(field, rows, width):
+    """Takes the full rows out of the bottom `rows` rows of field, returns (field, rows left)"""
+    full_row = (1 << width) - 1
+    row = 0
+    while row < rows:
+        shift = row * width
+        if (field >> shift) & full_row == full_row:
+            field = (field & ((1 << shift) - 1)) | (field >> (shift + width) << shift)
+            rows -= 1
+        else:
+            row += 1
+    return field, rows
+
+def column_mask(col, width, rows):
+    """Bits of one column over `rows` rows"""
+    mask = 0
+    for row in range(rows):
+        mask |= 1 << (row * width + col)
+    return mask
+
+def areas_fit(field, rows, width, piece_size):
+    """Whether every separate empty area under the perfect clear line could be filled exactly with pieces"""
+    empty = ~field & ((1 << rows * width) - 1)
+    not_left, not_right = ~column_mask(0, width, rows), ~column_mask(width - 1, width, rows)
+    while empty:
+        area = empty & -empty
+        while True: # flood fill, one step in every direction at a time
+            grown = (area | (area << 1) & not_left | (area >> 1) & not_right | area << width | area >> width) & empty
+            if grown == area:
+                break
+            area = grown
+        if area.bit_count() % piece_size:
+            return False
+        empty &= ~area
+    return True
+
+def queue_options(queue, index, hold, can_hold, hold_now):
+    """
+    (held first or not, piece, hold after, queue index after) for every piece that can go next, with queue[index]
+    up and one hold slot (hold_now is whether the first piece can still be held)
+    """
+    options = []
+    if index < len(queue):
+        options.append((False, queue[index], hold, index + 1))
+        if can_hold and (index > 0 or hold_now):
+            if hold and hold != queue[index]:
+                options.append((True, hold, queue[index], index + 1))
+            elif not hold and index + 1 < len(queue):
+                options.append((True, queue[index + 1], queue[index], index + 2))
+    return options
+
+def play_move(rules, field, hold, queue, index, move):
+    """(field, hold, queue index) after a solution's move, with queue[index] up"""
+    width, height = rules.board_width, rules.board_height
+    held, piece, x, y, rotation = move
+    if held:
+        if hold:
+            hold, index = queue[index], index + 1
+        else:
+            hold, index = queue[index], index + 2
+    else:
+        index += 1
+    for row, col in rules.piece_table.minos[piece][rotation]:
+        field |= 1 << ((height - 1 - y - row) * width + x + col)
+    field, _ = clear_lines(field, height, width)
+    return field, hold, index
+
+class PerfectClearSearch:
+    """
+    Depth first search for a perfect clear from one position. work() runs it up to a deadline, so it can be
+    spread over frames like search.BeamSearch. solution ends up as the moves (held first or not, piece, x, y,
+    rotation) that get there, or stays None if finished without one.
+    """
+    def __init__(self, rules, board, queue, hold, can_hold, hold_now, piece_size, main_height):
+        self.rules, self.queue = rules, tuple(queue)
+        self.width, self.piece_size = rules.board_width, piece_size
+        self.can_hold, self.hold_now = can_hold, hold_now # hold at all, and for the current piece (holds_used)
+        self.root = board_field(board), hold
+        self.failed = set()
+        self.solution = None
+        self.nodes = 0
+        self.stack = [] # (state, children generator), one per piece placed so far
+        self.moves = []
+        filled = self.root[0].bit_count()
+        stack_rows = (self.root[0].bit_length() + self.width - 1) // self.width
+        available = len(self.queue) + (hold != 0)
+        # every height the pieces we can see could fill exactly, lowest first
+        self.all_heights = [rows for rows in range(max(stack_rows, 1), main_height + 1)
+                            if (rows * self.width - filled) % piece_size == 0 and (rows * self.width - filled) // piece_size <= available]
+        self.heights = list(self.all_heights)
+        self.check_areas = True
+        self.finished = False
+        self.next_height()
+
+    def next_height(self):
+        if self.solution is None and not self.heights and self.check_areas and self.all_heights: # the slow way, without the area check
+            self.check_areas = False
+            self.heights = list(self.all_heights)
+            self.failed.clear() # dead ends with the check might not be without it
+        if self.solution is not None or not self.heights:
+            self.finished = True
+            return
+        field, hold = self.root
+        state = field, self.heights.pop(0), 0, hold
+        self.stack = [(state, self.children(state))]
+        self.moves = []
+
+    def children(self, state):
+        """(move, state after) for every placement from state that keeps a perfect clear possible"""
+        field, rows, index, hold = state
+        width, piece_size = self.width, self.piece_size
+        for held, piece, new_hold, new_index in queue_options(self.queue, index, hold, self.can_hold, self.hold_now):
+            for piece_id, x, y, rotation, mask in cached_placements(self.rules, field, piece):
+                if mask >> (rows * width): # sticks out above the perfect clear line
+                    continue
+                new_field, new_rows = clear_lines(field | mask, rows, width)
+                new_state = new_field, new_rows, new_index, new_hold
+                if new_rows and new_state in self.failed:
+                    continue
+                needed = (new_rows * width - new_field.bit_count()) // piece_size
+                if needed > len(self.queue) - new_index + (new_hold != 0): # not enough pieces left
+                    continue
+                if self.check_areas and new_rows and not areas_fit(new_field, new_rows, width, piece_size):
+                    continue
+                yield (held, piece_id, x, y, rotation), new_state
+
+    def work(self, deadline_ns=None):
+        """Searches until it's done or perf_counter_ns passes deadline_ns, returns whether it's done"""
+        while not self.finished:
+            state, children = self.stack[-1]
+            child = next(children, None)
+            self.nodes += 1
+            if child is None: # nothing from here works
+                self.failed.add(state)
+                self.stack.pop()
+                if self.moves:
+                    self.moves.pop()
+                if not self.stack:
+                    self.next_height()
+            else:
+                move, new_state = child
+                self.moves.append(move)
+                if new_state[1] == 0: # every row cleared
+                    self.solution = list(self.moves)
+                    self.finished = True
+                else:
+                    self.stack.append((new_state, self.children(new_state)))
+            if deadline_ns is not None and time.perf_counter_ns() >= deadline_ns:
+                break
+        return self.finished
+
+def search_args(game):
+    """Everything a PerfectClearSearch for game's current piece needs, small enough to send to a worker process"""
+    queue = (game.piece_bags[0] + game.piece_bags[1])[:game.next_queue_size + 1] # only what a player can see
+    can_hold = game.max_hold_pieces == 1 # the search only knows the one slot hold_guideline swaps with
+    hold = game.hold_pieces[0] if can_hold and game.hold_pieces else 0
+    hold_now = game.holds_used < game.max_hold_pieces or game.infinite_holds
+    main_height = game.board_height - game.board_extra_height # a perfect clear can't go up into the hidden rows
+    return search.Rules(game), game.game_board.copy(), queue, hold, can_hold, hold_now, game.mino_count, main_height
+
+def solve_job(job):
+    """Runs a PerfectClearSearch on a worker until it finishes or think_ms runs out, returns (queue, solution)"""
+    args, think_ms = job
+    pc_search = PerfectClearSearch(*args)
+    pc_search.work(search.deadline_after(time.perf_counter_ns(), think_ms))
+    return pc_search.queue, pc_search.root, pc_search.solution
+
+class PerfectClearHint:
+    """
+    Keeps a perfect clear solution for the game's position up to date in the background. update() is called
+    every frame and never blocks: the search runs on a forked worker process where there is one, otherwise
+    it gets a slice of PC_HINT_SLICE_MS every frame. suggestion() is the next move of the solution, if any.
+    """
+    def __init__(self, think_ms=None, use_worker=None):
+        self.think_ms = settings.PC_HINT_MS if think_ms is None else think_ms
+        self.use_worker = settings.PC_HINT_WORKER if use_worker is None else use_worker
+        self.pool = None
+        self.pending = None # (state key, PerfectClearSearch or the pool's AsyncResult, when it started)
+        self.searched = None # state key of the last finished search
+        self.plan = [] # [(field, hold, queue the rest needs, move)] for every move of the last solution found
+
+    def state_key(self, game):
+        """Changes whenever the position does (a placement, a hold, an undo, a reset, the board being poked)"""
+        return id(game), game.rng_seed, game.state_hash(), game.holds_used
+
+    def planned_move(self, game):
+        """The move the current plan has for game's position, or None if the position isn't on it"""
+        if not self.plan:
+            return None
+        field = board_field(game.game_board)
+        hold = game.hold_pieces[0] if game.hold_pieces else 0
+        queue = tuple((game.piece_bags[0] + game.piece_bags[1])[:game.next_queue_size + 1])
+        for step_field, step_hold, step_queue, move in self.plan:
+            if step_field == field and step_hold == hold and queue[:len(step_queue)] == step_queue:
+                if move[0] and not (game.holds_used < game.max_hold_pieces or game.infinite_holds):
+                    return None # already held this piece
+                return move
+        return None
+
+    def set_plan(self, rules, queue, root, solution):
+        self.plan = []
+        if solution is None:
+            return
+        field, hold = root
+        index = 0
+        for move in solution:
+            self.plan.append((field, hold, tuple(queue[index:]), move))
+            field, hold, index = play_move(rules, field, hold, queue, index, move)
+
+    def update(self, game, budget_ms=None):
+        """Starts, continues or picks up the search for game's position, for up to budget_ms in this process"""
+        if game.queue_spawn_piece:
+            return
+        key = self.state_key(game)
+        if self.pending is not None:
+            pending_key, pc_search, started = self.pending
+            if isinstance(pc_search, PerfectClearSearch):
+                if pending_key != key: # the position moved on, start over
+                    self.pending = None
+                else:
+                    give_up = search.deadline_after(started, self.think_ms)
+                    deadline = search.deadline_after(time.perf_counter_ns(), budget_ms) if budget_ms is not None else None
+                    if give_up is not None:
+                        deadline = give_up if deadline is None else min(deadline, give_up)
+                    if not pc_search.work(deadline) and (give_up is None or time.perf_counter_ns() < give_up):
+                        return
+                    self.finish(key, pc_search.rules, pc_search.queue, pc_search.root, pc_search.solution)
+                    return
+            else:
+                if not pc_search.ready(): # a worker search can't be stopped, wait for it even if it's stale
+                    return
+                queue, root, solution = pc_search.get()
+                self.finish(pending_key, search.Rules(game), queue, root, solution)
+        if key == self.searched or self.planned_move(game) is not None:
+            return
+        args = search_args(game)
+        if self.pool is None and self.use_worker:
+            self.pool = search.make_pool(1)
+        if self.pool is None:
+            self.pending = key, PerfectClearSearch(*args), time.perf_counter_ns()
+            self.update(game, budget_ms)
+        else:
+            self.pending = key, self.pool.apply_async(solve_job, ((args, self.think_ms),)), time.perf_counter_ns()
+
+    def finish(self, key, rules, queue, root, solution):
+        self.pending = None
+        self.searched = key
+        if solution is not None or not self.plan: # keep following an old plan if the new position has no solution of its own
+            self.set_plan(rules, queue, root, solution)
+
+    def suggestion(self, game):
+        """(held first or not, piece, x, y, rotation) of the next perfect clear move, or None"""
+        if game.queue_spawn_piece:
+            return None
+        return self.planned_move(game)
+
+    def close(self):
+        """Stops the worker process, if there is one"""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
@@ -1,810 +1,873 @@
-"""
-pieces.py defines a bunch of constants relating to pieces, including:
--shapes for all piece rotations
--piece names and skins (initialized to placeholders)
--piece mirror mappings (inversions)
--constants for amount piece types
--kick tables
-"""
-
-import numpy, skinloader
-
-TETRA_INVERSIONS = {
-    1: 4,
-    2: 6,
-    3: 3,
-    4: 1,
-    5: 5,
-    6: 2,
-    7: 7
-}
-PENTA_INVERSIONS = {
-    1: 2,
-    2: 1,
-    3: 3,
-    4: 5,
-    5: 4,
-    6: 7,
-    7: 6,
-    8: 9,
-    9: 8,
-    10: 10,
-    11: 11,
-    12: 12,
-    13: 13,
-    14: 14,
-    15: 16,
-    16: 15,
-    17: 18,
-    18: 17
-}
-
-PIECE_TYPES_TETRA = 7
-PIECE_TYPES_PENTA = 18
-
-tetra_dict = {
-    1: {
-        "name": "Z",
-        "shapes": [
-            numpy.array([
-                [0,0,0],
-                [1,1,0],
-                [0,1,1]
-            ]),
-            numpy.array([
-                [0,0,1],
-                [0,1,1],
-                [0,1,0]
-            ]),
-            numpy.array([
-                [0,0,0],
-                [1,1,0],
-                [0,1,1]
-            ]),
-            numpy.array([
-                [0,1,0],
-                [1,1,0],
-                [1,0,0]
-            ])
-        ],
-        "color": (243, 139, 168),  # red
-        "skin": 0
-        },
-    2: {
-        "name": "L",
-        "shapes": [
-            numpy.array([
-                [0,0,0],
-                [0,0,1],
-                [1,1,1]
-            ]),
-            numpy.array([
-                [0,1,0],
-                [0,1,0],
-                [0,1,1]
-            ]),
-            numpy.array([
-                [0,0,0],
-                [1,1,1],
-                [1,0,0]
-            ]),
-            numpy.array([
-                [1,1,0],
-                [0,1,0],
-                [0,1,0]
-            ])
-        ],
-        "color": (250, 179, 135),  # orange
-        "skin": 1
-    },
-    3: {
-        "name": "O",
-        "shapes": [
-            numpy.array([
-                [0,0,0,0],
-                [0,1,1,0],
-                [0,1,1,0],
-                [0,0,0,0]
-            ]),
-            numpy.array([
-                [0,0,0,0],
-                [0,1,1,0],
-                [0,1,1,0],
-                [0,0,0,0]
-            ]),
-            numpy.array([
-                [0,0,0,0],
-                [0,1,1,0],
-                [0,1,1,0],
-                [0,0,0,0]
-            ]),
-            numpy.array([
-                [0,0,0,0],
-                [0,1,1,0],
-                [0,1,1,0],
-                [0,0,0,0]
-            ])
-        ],
-        "color": (249, 226, 175),  # yellow
-        "skin": 2
-    },
-    4: {
-        "name": "S",
-        "shapes": [
-            numpy.array([
-                [0,0,0],
-                [0,1,1],
-                [1,1,0]
-            ]),
-            numpy.array([
-                [0,1,0],
-                [0,1,1],
-                [0,0,1]
-            ]),
-            numpy.array([
-                [0,0,0],
-                [0,1,1],
-                [1,1,0]
-            ]),
-            numpy.array([
-                [1,0,0],
-                [1,1,0],
-                [0,1,0]
-            ])
-        ],
-        "color": (166, 227, 161),  # green
-        "skin": 3
-    },
-    5: {
-        "name": "I",
-        "shapes": [
-            numpy.array([
-                [0,0,0,0],
-                [0,0,0,0],
-                [1,1,1,1],
-                [0,0,0,0]
-            ]),
-            numpy.array([
-                [0,0,1,0],
-                [0,0,1,0],
-                [0,0,1,0],
-                [0,0,1,0]
-            ]),
-            numpy.array([
-                [0,0,0,0],
-                [0,0,0,0],
-                [1,1,1,1],
-                [0,0,0,0]
-            ]),
-            numpy.array([
-                [0,1,0,0],
-                [0,1,0,0],
-                [0,1,0,0],
-                [0,1,0,0]
-            ])
-        ],
-        "color": (137, 220, 235),  # cyan
-        "skin": 4
-    },
-    6: {
-        "name": "J",
-        "shapes": [
-            numpy.array([
-                [0,0,0],
-                [1,0,0],
-                [1,1,1]
-            ]),
-            numpy.array([
-                [0,1,1],
-                [0,1,0],
-                [0,1,0]
-            ]),
-            numpy.array([
-                [0,0,0],
-                [1,1,1],
-                [0,0,1]
-            ]),
-            numpy.array([
-                [0,1,0],
-                [0,1,0],
-                [1,1,0]
-            ])
-        ],
-        "color": (137, 180, 250),  # blue
-        "skin": 5
-    },
-    7: {
-        "name": "T",
-        "shapes": [
-            numpy.array([
-                [0,1,0],
-                [1,1,1],
-                [0,0,0]
-            ]),
-            numpy.array([
-                [0,1,0],
-                [0,1,1],
-                [0,1,0]
-            ]),
-            numpy.array([
-                [0,0,0],
-                [1,1,1],
-                [0,1,0]
-            ]),
-            numpy.array([
-                [0,1,0],
-                [1,1,0],
-                [0,1,0]
-            ])
-        ],
-        "color": (203, 166, 247),  # purple
-        "skin": 6
-    }
-}
-penta_dict = {
-    1: {
-        "name": "F",
-        "shapes": [
-            numpy.array([
-                [0,1,0],
-                [1,1,1],
-                [0,0,1],
-            ]),
-            numpy.array([
-                [0,1,0],
-                [0,1,1],
-                [1,1,0]
-            ]),
-            numpy.array([
-                [1,0,0],
-                [1,1,1],
-                [0,1,0]
-            ]),
-            numpy.array([
-                [0,1,1],
-                [1,1,0],
-                [0,1,0]
-            ])
-        ],
-        "color": (243, 139, 168),  # red
-        "skin": 0 #red
-        },
-    2: {
-        "name": "F", # mirror
-        "shapes": [
-            numpy.array([
-                [0,1,0],
-                [1,1,1],
-                [1,0,0]
-            ]),
-            numpy.array([
-                [1,1,0],
-                [0,1,1],
-                [0,1,0]
-            ]),
-            numpy.array([
-                [0,0,1],
-                [1,1,1],
-                [0,1,0]
-            ]),
-            numpy.array([
-                [0,1,0],
-                [1,1,0],
-                [0,1,1]
-            ])
-        ],
-        "color": (243, 139, 168),  # red
-        "skin": 1 # orang
-        },
-    3: {
-        "name": "I",
-        "shapes": [
-            numpy.array([
-                [0,0,0,0,0],
-                [0,0,0,0,0],
-                [1,1,1,1,1],
-                [0,0,0,0,0],
-                [0,0,0,0,0]
-            ]),
-            numpy.array([
-                [0,0,1,0,0],
-                [0,0,1,0,0],
-                [0,0,1,0,0],
-                [0,0,1,0,0],
-                [0,0,1,0,0]
-            ]),
-            numpy.array([
-                [0,0,0,0,0],
-                [0,0,0,0,0],
-                [1,1,1,1,1],
-                [0,0,0,0,0],
-                [0,0,0,0,0]
-            ]),
-            numpy.array([
-                [0,0,1,0,0],
-                [0,0,1,0,0],
-                [0,0,1,0,0],
-                [0,0,1,0,0],
-                [0,0,1,0,0]
-            ])
-        ],
-        "color": (250, 179, 135),  # orange
-        "skin": 2 #orange yelo
-    },
-    4: {
-        "name": "P",
-        "shapes": [
-            numpy.array([
-                [0,0,0,0],
-                [0,1,1,1],
-                [0,1,1,0],
-                [0,0,0,0]
-            ]),
-            numpy.array([
-                [0,0,0,0],
-                [0,1,1,0],
-                [0,1,1,0],
-                [0,0,1,0]
-            ]),
-            numpy.array([
-                [0,0,0,0],
-                [0,1,1,0],
-                [1,1,1,0],
-                [0,0,0,0]
-            ]),
-            numpy.array([
-                [0,1,0,0],
-                [0,1,1,0],
-                [0,1,1,0],
-                [0,0,0,0]
-            ])
-        ],
-        "color": (249, 226, 175),  # yellow
-        "skin": 3 #yelo
-    },
-    5: {
-        "name": "P", # mirror
-        "shapes": [
-            numpy.array([
-                [0,0,0,0],
-                [0,1,1,0],
-                [0,1,1,1],
-                [0,0,0,0]
-            ]),
-            numpy.array([
-                [0,0,0,0],
-                [0,1,1,0],
-                [0,1,1,0],
-                [0,1,0,0]
-            ]),
-            numpy.array([
-                [0,0,0,0],
-                [1,1,1,0],
-                [0,1,1,0],
-                [0,0,0,0]
-            ]),
-            numpy.array([
-                [0,0,1,0],
-                [0,1,1,0],
-                [0,1,1,0],
-                [0,0,0,0]
-            ])
-        ],
-        "color": (249, 226, 175),  # yellow
-        "skin": 4 #lime
-    },
-    6: {
-        "name": "L",
-        "shapes": [
-            numpy.array([
-                [0,0,0,0],
-                [1,1,1,1],
-                [1,0,0,0],
-                [0,0,0,0]
-            ]),
-            numpy.array([
-                [0,1,1,0],
-                [0,0,1,0],
-                [0,0,1,0],
-                [0,0,1,0]
-            ]),
-            numpy.array([
-                [0,0,0,0],
-                [0,0,0,1],
-                [1,1,1,1],
-                [0,0,0,0]
-            ]),
-            numpy.array([
-                [0,1,0,0],
-                [0,1,0,0],
-                [0,1,0,0],
-                [0,1,1,0]
-            ])
-        ],
-        "color": (166, 227, 161),  # green
-        "skin": 5 #geen
-    },
-    7: {
-        "name": "L", # mirror
-        "shapes": [
-            numpy.array([
-                [0,0,0,0],
-                [1,0,0,0],
-                [1,1,1,1],
-                [0,0,0,0]
-            ]),
-            numpy.array([
-                [0,1,1,0],
-                [0,1,0,0],
-                [0,1,0,0],
-                [0,1,0,0]
-            ]),
-            numpy.array([
-                [0,0,0,0],
-                [1,1,1,1],
-                [0,0,0,1],
-                [0,0,0,0]
-            ]),
-            numpy.array([
-                [0,0,1,0],
-                [0,0,1,0],
-                [0,0,1,0],
-                [0,1,1,0]
-            ])
-        ],
-        "color": (166, 227, 161),  # green
-        "skin": 6 #geen
-    },
-    8: {
-        "name": "N",
-        "shapes": [
-            numpy.array([
-                [0,0,0,0],
-                [1,1,0,0],
-                [0,1,1,1],
-                [0,0,0,0]
-            ]),
-            numpy.array([
-                [0,0,1,0],
-                [0,1,1,0],
-                [0,1,0,0],
-                [0,1,0,0]
-            ]),
-            numpy.array([
-                [0,0,0,0],
-                [1,1,1,0],
-                [0,0,1,1],
-                [0,0,0,0]
-            ]),
-            numpy.array([
-                [0,0,1,0],
-                [0,0,1,0],
-                [0,1,1,0],
-                [0,1,0,0]
-            ]),
-        ],
-        "color": (137, 220, 235),  # cyan
-        "skin": 7 # geenish blu
-    },
-    9: {
-        "name": "N", #mirror
-        "shapes": [
-            numpy.array([
-                [0,0,0,0],
-                [0,0,1,1],
-                [1,1,1,0],
-                [0,0,0,0]
-            ]),
-            numpy.array([
-                [0,1,0,0],
-                [0,1,0,0],
-                [0,1,1,0],
-                [0,0,1,0],
-            ]),
-            numpy.array([
-                [0,0,0,0],
-                [0,1,1,1],
-                [1,1,0,0],
-                [0,0,0,0]
-            ]),
-            numpy.array([
-                [0,1,0,0],
-                [0,1,1,0],
-                [0,0,1,0],
-                [0,0,1,0]
-            ])
-        ],
-        "color": (137, 220, 235),  # cyan
-        "skin": 8 # bluish geen
-    },
-    10: {
-        "name": "T",
-        "shapes": [
-            numpy.array([
-                [1,1,1],
-                [0,1,0],
-                [0,1,0]
-            ]),
-            numpy.array([
-                [0,0,1],
-                [1,1,1],
-                [0,0,1]
-            ]),
-            numpy.array([
-                [0,1,0],
-                [0,1,0],
-                [1,1,1]
-            ]),
-            numpy.array([
-                [1,0,0],
-                [1,1,1],
-                [1,0,0]
-            ])
-        ],
-        "color": (137, 180, 250),  # blue
-        "skin": 9 #cyan
-    },
-    11: {
-        "name": "U",
-        "shapes": [
-            numpy.array([
-                [0,0,0],
-                [1,1,1],
-                [1,0,1]
-            ]),
-            numpy.array([
-                [0,1,1],
-                [0,0,1],
-                [0,1,1]
-            ]),
-            numpy.array([
-                [0,0,0],
-                [1,0,1],
-                [1,1,1]
-            ]),
-            numpy.array([
-                [1,1,0],
-                [1,0,0],
-                [1,1,0]
-            ])
-        ],
-        "color": (203, 166, 247),  # purple
-        "skin": 10 #blue
-    },
-    12: {
-        "name": "V",
-        "shapes": [
-            numpy.array([
-                [1,1,1],
-                [1,0,0],
-                [1,0,0]
-            ]),
-            numpy.array([
-                [1,1,1],
-                [0,0,1],
-                [0,0,1]
-            ]),
-            numpy.array([
-                [0,0,1],
-                [0,0,1],
-                [1,1,1]
-            ]),
-            numpy.array([
-                [1,0,0],
-                [1,0,0],
-                [1,1,1]
-            ])
-        ],
-        "color": (203, 166, 247),  # purple
-        "skin": 11 # dark blu
-    },
-    13: {
-        "name": "W",
-        "shapes": [
-            numpy.array([
-                [1,0,0],
-                [1,1,0],
-                [0,1,1]
-            ]),
-            numpy.array([
-                [0,1,1],
-                [1,1,0],
-                [1,0,0]
-            ]),
-            numpy.array([
-                [1,1,0],
-                [0,1,1],
-                [0,0,1]
-            ]),
-            numpy.array([
-                [0,0,1],
-                [0,1,1],
-                [1,1,0]
-            ])
-        ],
-        "color": (203, 166, 247),  # purple
-        "skin": 12 # rly dark blu
-    },
-    14: {
-        "name": "X",
-        "rare": True,
-        "shapes": [
-            numpy.array([
-                [0,1,0],
-                [1,1,1],
-                [0,1,0]
-            ]),
-            numpy.array([
-                [0,0,1,0,0],
-                [0,1,1,1,0],
-                [0,0,1,0,0]
-            ]),
-            numpy.array([
-                [0,1,0],
-                [1,1,1],
-                [0,1,0]
-            ]),
-            numpy.array([
-                [0,1,0],
-                [1,1,1],
-                [0,1,0]
-            ])
-        ],
-        "color": (203, 166, 247),  # purple
-        "skin": 13 # urple
-    },
-    15: {
-        "name": "Y",
-        "shapes": [
-            numpy.array([
-                [0,0,0,0,0],
-                [0,0,0,0,0],
-                [0,1,1,1,1],
-                [0,0,1,0,0],
-                [0,0,0,0,0]
-            ]),
-            numpy.array([
-                [0,0,0,0,0],
-                [0,0,1,0,0],
-                [0,1,1,0,0],
-                [0,0,1,0,0],
-                [0,0,1,0,0]
-            ]),
-            numpy.array([
-                [0,0,0,0,0],
-                [0,0,0,0,0],
-                [0,0,1,0,0],
-                [1,1,1,1,0],
-                [0,0,0,0,0]
-            ]),
-            numpy.array([
-                [0,0,0,0,0],
-                [0,0,1,0,0],
-                [0,0,1,0,0],
-                [0,0,1,1,0],
-                [0,0,1,0,0]
-            ])
-        ],
-        "color": (203, 166, 247),  # purple
-        "skin": 14 # urple-er
-    },
-    16: {
-        "name": "Y", # mirror
-        "shapes": [
-            numpy.array([
-                [0,0,0,0,0],
-                [0,0,0,0,0],
-                [0,0,1,0,0],
-                [0,1,1,1,1],
-                [0,0,0,0,0]
-            ]),
-            numpy.array([
-                [0,0,0,0,0],
-                [0,0,1,0,0],
-                [0,0,1,1,0],
-                [0,0,1,0,0],
-                [0,0,1,0,0]
-            ]),
-            numpy.array([
-                [0,0,0,0,0],
-                [0,0,0,0,0],
-                [1,1,1,1,0],
-                [0,0,1,0,0],
-                [0,0,0,0,0]
-            ]),
-            numpy.array([
-                [0,0,0,0,0],
-                [0,0,1,0,0],
-                [0,0,1,0,0],
-                [0,1,1,0,0],
-                [0,0,1,0,0]
-            ])
-        ],
-        "color": (203, 166, 247),  # purple
-        "skin": 15 #pimk
-    },
-    17: {
-        "name": "Z",
-        "shapes": [
-            numpy.array([
-                [0,0,1],
-                [1,1,1],
-                [1,0,0]
-            ]),
-            numpy.array([
-                [1,1,0],
-                [0,1,0],
-                [0,1,1]
-            ]),
-            numpy.array([
-                [0,0,1],
-                [1,1,1],
-                [1,0,0]
-            ]),
-            numpy.array([
-                [1,1,0],
-                [0,1,0],
-                [0,1,1]
-            ])
-        ],
-        "color": (203, 166, 247),  # purple
-        "skin": 16 # prety
-    },
-    18: {
-        "name": "Z", # mirror
-        "shapes": [
-            numpy.array([
-                [1,0,0],
-                [1,1,1],
-                [0,0,1]
-            ]),
-            numpy.array([
-                [0,1,1],
-                [0,1,0],
-                [1,1,0]
-            ]),
-            numpy.array([
-                [1,0,0],
-                [1,1,1],
-                [0,0,1]
-            ]),
-            numpy.array([
-                [0,1,1],
-                [0,1,0],
-                [1,1,0]
-
-            ])
-        ],
-        "color": (203, 166, 247),  # purple
-        "skin": 17 # rubyish?
-    }
-}
-
-other_skins = []
-
-def init_skins():
-    """
-    Lazy loader for skin textures.
-    Replaces placeholders with surfaces from the arrays already declared in skinloader.py
-    """
-    global other_skins 
-    other_skins = [] # clear the list
-    skinloader.set_tetra_skins()
-    skinloader.set_penta_skins()
-    skinloader.set_other_skins()
-
-    for i, piece in penta_dict.items():
-        piece["skin"] = skinloader.penta_skins[i-1]
-    for i, piece in tetra_dict.items():
-        piece["skin"] = skinloader.tetra_skins[i-1]
-    for skin in skinloader.other_skins:
-        other_skins.append(skin)
-
-# checks left to right if kicking right
-kick_list_right = [(0, 0), (0, 1), (-1, 1), (1, 1), (-1, 0), (1, 0), (-2, 0), (2, 0), (0, -1)]
-# checks right to left if kicking left
-kick_list_left = [(0, 0), (0, 1), (1, 1), (-1, 1), (1, 0), (-1, 0), (2, 0), (-2, 0), (0, -1)]
-# there are some rotation states where using the biased lists wouldn't make sense, for example rotating a state 4 I piece to a state 1 or 3.
-# it should be fine though because it only affects kick order, and if anything gives advanced players more control.
-
-kick_list_mirror = [(0, 0), (0, 1), (1, 1), (-1, 1), (1, 0), (-1, 0), (2, 0), (-2, 0), (0, -1)]
+"""
+pieces.py defines a bunch of constants relating to pieces, including:
+-shapes for all piece rotations
+-piece names and skins (initialized to placeholders)
+-piece mirror mappings (inversions)
+-constants for amount piece types
+-kick tables
+-compiled piece tables (built once at import, so the engine doesn't redo numpy work on every call)
+"""
+
+import numpy, skinloader
+
+TETRA_INVERSIONS = {
+    1: 4,
+    2: 6,
+    3: 3,
+    4: 1,
+    5: 5,
+    6: 2,
+    7: 7
+}
+PENTA_INVERSIONS = {
+    1: 2,
+    2: 1,
+    3: 3,
+    4: 5,
+    5: 4,
+    6: 7,
+    7: 6,
+    8: 9,
+    9: 8,
+    10: 10,
+    11: 11,
+    12: 12,
+    13: 13,
+    14: 14,
+    15: 16,
+    16: 15,
+    17: 18,
+    18: 17
+}
+
+PIECE_TYPES_TETRA = 7
+PIECE_TYPES_PENTA = 18
+
+tetra_dict = {
+    1: {
+        "name": "Z",
+        "shapes": [
+            numpy.array([
+                [0,0,0],
+                [1,1,0],
+                [0,1,1]
+            ]),
+            numpy.array([
+                [0,0,1],
+                [0,1,1],
+                [0,1,0]
+            ]),
+            numpy.array([
+                [0,0,0],
+                [1,1,0],
+                [0,1,1]
+            ]),
+            numpy.array([
+                [0,1,0],
+                [1,1,0],
+                [1,0,0]
+            ])
+        ],
+        "color": (243, 139, 168),  # red
+        "skin": 0
+        },
+    2: {
+        "name": "L",
+        "shapes": [
+            numpy.array([
+                [0,0,0],
+                [0,0,1],
+                [1,1,1]
+            ]),
+            numpy.array([
+                [0,1,0],
+                [0,1,0],
+                [0,1,1]
+            ]),
+            numpy.array([
+                [0,0,0],
+                [1,1,1],
+                [1,0,0]
+            ]),
+            numpy.array([
+                [1,1,0],
+                [0,1,0],
+                [0,1,0]
+            ])
+        ],
+        "color": (250, 179, 135),  # orange
+        "skin": 1
+    },
+    3: {
+        "name": "O",
+        "shapes": [
+            numpy.array([
+                [0,0,0,0],
+                [0,1,1,0],
+                [0,1,1,0],
+                [0,0,0,0]
+            ]),
+            numpy.array([
+                [0,0,0,0],
+                [0,1,1,0],
+                [0,1,1,0],
+                [0,0,0,0]
+            ]),
+            numpy.array([
+                [0,0,0,0],
+                [0,1,1,0],
+                [0,1,1,0],
+                [0,0,0,0]
+            ]),
+            numpy.array([
+                [0,0,0,0],
+                [0,1,1,0],
+                [0,1,1,0],
+                [0,0,0,0]
+            ])
+        ],
+        "color": (249, 226, 175),  # yellow
+        "skin": 2
+    },
+    4: {
+        "name": "S",
+        "shapes": [
+            numpy.array([
+                [0,0,0],
+                [0,1,1],
+                [1,1,0]
+            ]),
+            numpy.array([
+                [0,1,0],
+                [0,1,1],
+                [0,0,1]
+            ]),
+            numpy.array([
+                [0,0,0],
+                [0,1,1],
+                [1,1,0]
+            ]),
+            numpy.array([
+                [1,0,0],
+                [1,1,0],
+                [0,1,0]
+            ])
+        ],
+        "color": (166, 227, 161),  # green
+        "skin": 3
+    },
+    5: {
+        "name": "I",
+        "shapes": [
+            numpy.array([
+                [0,0,0,0],
+                [0,0,0,0],
+                [1,1,1,1],
+                [0,0,0,0]
+            ]),
+            numpy.array([
+                [0,0,1,0],
+                [0,0,1,0],
+                [0,0,1,0],
+                [0,0,1,0]
+            ]),
+            numpy.array([
+                [0,0,0,0],
+                [0,0,0,0],
+                [1,1,1,1],
+                [0,0,0,0]
+            ]),
+            numpy.array([
+                [0,1,0,0],
+                [0,1,0,0],
+                [0,1,0,0],
+                [0,1,0,0]
+            ])
+        ],
+        "color": (137, 220, 235),  # cyan
+        "skin": 4
+    },
+    6: {
+        "name": "J",
+        "shapes": [
+            numpy.array([
+                [0,0,0],
+                [1,0,0],
+                [1,1,1]
+            ]),
+            numpy.array([
+                [0,1,1],
+                [0,1,0],
+                [0,1,0]
+            ]),
+            numpy.array([
+                [0,0,0],
+                [1,1,1],
+                [0,0,1]
+            ]),
+            numpy.array([
+                [0,1,0],
+                [0,1,0],
+                [1,1,0]
+            ])
+        ],
+        "color": (137, 180, 250),  # blue
+        "skin": 5
+    },
+    7: {
+        "name": "T",
+        "shapes": [
+            numpy.array([
+                [0,1,0],
+                [1,1,1],
+                [0,0,0]
+            ]),
+            numpy.array([
+                [0,1,0],
+                [0,1,1],
+                [0,1,0]
+            ]),
+            numpy.array([
+                [0,0,0],
+                [1,1,1],
+                [0,1,0]
+            ]),
+            numpy.array([
+                [0,1,0],
+                [1,1,0],
+                [0,1,0]
+            ])
+        ],
+        "color": (203, 166, 247),  # purple
+        "skin": 6
+    }
+}
+penta_dict = {
+    1: {
+        "name": "F",
+        "shapes": [
+            numpy.array([
+                [0,1,0],
+                [1,1,1],
+                [0,0,1],
+            ]),
+            numpy.array([
+                [0,1,0],
+                [0,1,1],
+                [1,1,0]
+            ]),
+            numpy.array([
+                [1,0,0],
+                [1,1,1],
+                [0,1,0]
+            ]),
+            numpy.array([
+                [0,1,1],
+                [1,1,0],
+                [0,1,0]
+            ])
+        ],
+        "color": (243, 139, 168),  # red
+        "skin": 0 #red
+        },
+    2: {
+        "name": "F", # mirror
+        "shapes": [
+            numpy.array([
+                [0,1,0],
+                [1,1,1],
+                [1,0,0]
+            ]),
+            numpy.array([
+                [1,1,0],
+                [0,1,1],
+                [0,1,0]
+            ]),
+            numpy.array([
+                [0,0,1],
+                [1,1,1],
+                [0,1,0]
+            ]),
+            numpy.array([
+                [0,1,0],
+                [1,1,0],
+                [0,1,1]
+            ])
+        ],
+        "color": (243, 139, 168),  # red
+        "skin": 1 # orang
+        },
+    3: {
+        "name": "I",
+        "shapes": [
+            numpy.array([
+                [0,0,0,0,0],
+                [0,0,0,0,0],
+                [1,1,1,1,1],
+                [0,0,0,0,0],
+                [0,0,0,0,0]
+            ]),
+            numpy.array([
+                [0,0,1,0,0],
+                [0,0,1,0,0],
+                [0,0,1,0,0],
+                [0,0,1,0,0],
+                [0,0,1,0,0]
+            ]),
+            numpy.array([
+                [0,0,0,0,0],
+                [0,0,0,0,0],
+                [1,1,1,1,1],
+                [0,0,0,0,0],
+                [0,0,0,0,0]
+            ]),
+            numpy.array([
+                [0,0,1,0,0],
+                [0,0,1,0,0],
+                [0,0,1,0,0],
+                [0,0,1,0,0],
+                [0,0,1,0,0]
+            ])
+        ],
+        "color": (250, 179, 135),  # orange
+        "skin": 2 #orange yelo
+    },
+    4: {
+        "name": "P",
+        "shapes": [
+            numpy.array([
+                [0,0,0,0],
+                [0,1,1,1],
+                [0,1,1,0],
+                [0,0,0,0]
+            ]),
+            numpy.array([
+                [0,0,0,0],
+                [0,1,1,0],
+                [0,1,1,0],
+                [0,0,1,0]
+            ]),
+            numpy.array([
+                [0,0,0,0],
+                [0,1,1,0],
+                [1,1,1,0],
+                [0,0,0,0]
+            ]),
+            numpy.array([
+                [0,1,0,0],
+                [0,1,1,0],
+                [0,1,1,0],
+                [0,0,0,0]
+            ])
+        ],
+        "color": (249, 226, 175),  # yellow
+        "skin": 3 #yelo
+    },
+    5: {
+        "name": "P", # mirror
+        "shapes": [
+            numpy.array([
+                [0,0,0,0],
+                [0,1,1,0],
+                [0,1,1,1],
+                [0,0,0,0]
+            ]),
+            numpy.array([
+                [0,0,0,0],
+                [0,1,1,0],
+                [0,1,1,0],
+                [0,1,0,0]
+            ]),
+            numpy.array([
+                [0,0,0,0],
+                [1,1,1,0],
+                [0,1,1,0],
+                [0,0,0,0]
+            ]),
+            numpy.array([
+                [0,0,1,0],
+                [0,1,1,0],
+                [0,1,1,0],
+                [0,0,0,0]
+            ])
+        ],
+        "color": (249, 226, 175),  # yellow
+        "skin": 4 #lime
+    },
+    6: {
+        "name": "L",
+        "shapes": [
+            numpy.array([
+                [0,0,0,0],
+                [1,1,1,1],
+                [1,0,0,0],
+                [0,0,0,0]
+            ]),
+            numpy.array([
+                [0,1,1,0],
+                [0,0,1,0],
+                [0,0,1,0],
+                [0,0,1,0]
+            ]),
+            numpy.array([
+                [0,0,0,0],
+                [0,0,0,1],
+                [1,1,1,1],
+                [0,0,0,0]
+            ]),
+            numpy.array([
+                [0,1,0,0],
+                [0,1,0,0],
+                [0,1,0,0],
+                [0,1,1,0]
+            ])
+        ],
+        "color": (166, 227, 161),  # green
+        "skin": 5 #geen
+    },
+    7: {
+        "name": "L", # mirror
+        "shapes": [
+            numpy.array([
+                [0,0,0,0],
+                [1,0,0,0],
+                [1,1,1,1],
+                [0,0,0,0]
+            ]),
+            numpy.array([
+                [0,1,1,0],
+                [0,1,0,0],
+                [0,1,0,0],
+                [0,1,0,0]
+            ]),
+            numpy.array([
+                [0,0,0,0],
+                [1,1,1,1],
+                [0,0,0,1],
+                [0,0,0,0]
+            ]),
+            numpy.array([
+                [0,0,1,0],
+                [0,0,1,0],
+                [0,0,1,0],
+                [0,1,1,0]
+            ])
+        ],
+        "color": (166, 227, 161),  # green
+        "skin": 6 #geen
+    },
+    8: {
+        "name": "N",
+        "shapes": [
+            numpy.array([
+                [0,0,0,0],
+                [1,1,0,0],
+                [0,1,1,1],
+                [0,0,0,0]
+            ]),
+            numpy.array([
+                [0,0,1,0],
+                [0,1,1,0],
+                [0,1,0,0],
+                [0,1,0,0]
+            ]),
+            numpy.array([
+                [0,0,0,0],
+                [1,1,1,0],
+                [0,0,1,1],
+                [0,0,0,0]
+            ]),
+            numpy.array([
+                [0,0,1,0],
+                [0,0,1,0],
+                [0,1,1,0],
+                [0,1,0,0]
+            ]),
+        ],
+        "color": (137, 220, 235),  # cyan
+        "skin": 7 # geenish blu
+    },
+    9: {
+        "name": "N", #mirror
+        "shapes": [
+            numpy.array([
+                [0,0,0,0],
+                [0,0,1,1],
+                [1,1,1,0],
+                [0,0,0,0]
+            ]),
+            numpy.array([
+                [0,1,0,0],
+                [0,1,0,0],
+                [0,1,1,0],
+                [0,0,1,0],
+            ]),
+            numpy.array([
+                [0,0,0,0],
+                [0,1,1,1],
+                [1,1,0,0],
+                [0,0,0,0]
+            ]),
+            numpy.array([
+                [0,1,0,0],
+                [0,1,1,0],
+                [0,0,1,0],
+                [0,0,1,0]
+            ])
+        ],
+        "color": (137, 220, 235),  # cyan
+        "skin": 8 # bluish geen
+    },
+    10: {
+        "name": "T",
+        "shapes": [
+            numpy.array([
+                [1,1,1],
+                [0,1,0],
+                [0,1,0]
+            ]),
+            numpy.array([
+                [0,0,1],
+                [1,1,1],
+                [0,0,1]
+            ]),
+            numpy.array([
+                [0,1,0],
+                [0,1,0],
+                [1,1,1]
+            ]),
+            numpy.array([
+                [1,0,0],
+                [1,1,1],
+                [1,0,0]
+            ])
+        ],
+        "color": (137, 180, 250),  # blue
+        "skin": 9 #cyan
+    },
+    11: {
+        "name": "U",
+        "shapes": [
+            numpy.array([
+                [0,0,0],
+                [1,1,1],
+                [1,0,1]
+            ]),
+            numpy.array([
+                [0,1,1],
+                [0,0,1],
+                [0,1,1]
+            ]),
+            numpy.array([
+                [0,0,0],
+                [1,0,1],
+                [1,1,1]
+            ]),
+            numpy.array([
+                [1,1,0],
+                [1,0,0],
+                [1,1,0]
+            ])
+        ],
+        "color": (203, 166, 247),  # purple
+        "skin": 10 #blue
+    },
+    12: {
+        "name": "V",
+        "shapes": [
+            numpy.array([
+                [1,1,1],
+                [1,0,0],
+                [1,0,0]
+            ]),
+            numpy.array([
+                [1,1,1],
+                [0,0,1],
+                [0,0,1]
+            ]),
+            numpy.array([
+                [0,0,1],
+                [0,0,1],
+                [1,1,1]
+            ]),
+            numpy.array([
+                [1,0,0],
+                [1,0,0],
+                [1,1,1]
+            ])
+        ],
+        "color": (203, 166, 247),  # purple
+        "skin": 11 # dark blu
+    },
+    13: {
+        "name": "W",
+        "shapes": [
+            numpy.array([
+                [1,0,0],
+                [1,1,0],
+                [0,1,1]
+            ]),
+            numpy.array([
+                [0,1,1],
+                [1,1,0],
+                [1,0,0]
+            ]),
+            numpy.array([
+                [1,1,0],
+                [0,1,1],
+                [0,0,1]
+            ]),
+            numpy.array([
+                [0,0,1],
+                [0,1,1],
+                [1,1,0]
+            ])
+        ],
+        "color": (203, 166, 247),  # purple
+        "skin": 12 # rly dark blu
+    },
+    14: {
+        "name": "X",
+        "rare": True,
+        "shapes": [
+            numpy.array([
+                [0,1,0],
+                [1,1,1],
+                [0,1,0]
+            ]),
+            numpy.array([
+                [0,0,1,0,0],
+                [0,1,1,1,0],
+                [0,0,1,0,0]
+            ]),
+            numpy.array([
+                [0,1,0],
+                [1,1,1],
+                [0,1,0]
+            ]),
+            numpy.array([
+                [0,1,0],
+                [1,1,1],
+                [0,1,0]
+            ])
+        ],
+        "color": (203, 166, 247),  # purple
+        "skin": 13 # urple
+    },
+    15: {
+        "name": "Y",
+        "shapes": [
+            numpy.array([
+                [0,0,0,0,0],
+                [0,0,0,0,0],
+                [0,1,1,1,1],
+                [0,0,1,0,0],
+                [0,0,0,0,0]
+            ]),
+            numpy.array([
+                [0,0,0,0,0],
+                [0,0,1,0,0],
+                [0,1,1,0,0],
+                [0,0,1,0,0],
+                [0,0,1,0,0]
+            ]),
+            numpy.array([
+                [0,0,0,0,0],
+                [0,0,0,0,0],
+                [0,0,1,0,0],
+                [1,1,1,1,0],
+                [0,0,0,0,0]
+            ]),
+            numpy.array([
+                [0,0,0,0,0],
+                [0,0,1,0,0],
+                [0,0,1,0,0],
+                [0,0,1,1,0],
+                [0,0,1,0,0]
+            ])
+        ],
+        "color": (203, 166, 247),  # purple
+        "skin": 14 # urple-er
+    },
+    16: {
+        "name": "Y", # mirror
+        "shapes": [
+            numpy.array([
+                [0,0,0,0,0],
+                [0,0,0,0,0],
+                [0,0,1,0,0],
+                [0,1,1,1,1],
+                [0,0,0,0,0]
+            ]),
+            numpy.array([
+                [0,0,0,0,0],
+                [0,0,1,0,0],
+                [0,0,1,1,0],
+                [0,0,1,0,0],
+                [0,0,1,0,0]
+            ]),
+            numpy.array([
+                [0,0,0,0,0],
+                [0,0,0,0,0],
+                [1,1,1,1,0],
+                [0,0,1,0,0],
+                [0,0,0,0,0]
+            ]),
+            numpy.array([
+                [0,0,0,0,0],
+                [0,0,1,0,0],
+                [0,0,1,0,0],
+                [0,1,1,0,0],
+                [0,0,1,0,0]
+            ])
+        ],
+        "color": (203, 166, 247),  # purple
+        "skin": 15 #pimk
+    },
+    17: {
+        "name": "Z",
+        "shapes": [
+            numpy.array([
+                [0,0,1],
+                [1,1,1],
+                [1,0,0]
+            ]),
+            numpy.array([
+                [1,1,0],
+                [0,1,0],
+                [0,1,1]
+            ]),
+            numpy.array([
+                [0,0,1],
+                [1,1,1],
+                [1,0,0]
+            ]),
+            numpy.array([
+                [1,1,0],
+                [0,1,0],
+                [0,1,1]
+            ])
+        ],
+        "color": (203, 166, 247),  # purple
+        "skin": 16 # prety
+    },
+    18: {
+        "name": "Z", # mirror
+        "shapes": [
+            numpy.array([
+                [1,0,0],
+                [1,1,1],
+                [0,0,1]
+            ]),
+            numpy.array([
+                [0,1,1],
+                [0,1,0],
+                [1,1,0]
+            ]),
+            numpy.array([
+                [1,0,0],
+                [1,1,1],
+                [0,0,1]
+            ]),
+            numpy.array([
+                [0,1,1],
+                [0,1,0],
+                [1,1,0]
+
+            ])
+        ],
+        "color": (203, 166, 247),  # purple
+        "skin": 17 # rubyish?
+    }
+}
+
+class PieceTable:
+    """
+    Compiled lookup tables for one piece set, built once at import.
+    Everything is indexed by piece id (index 0 is left empty) and then rotation.
+    After compiling, the "shapes" lists in the pieces dict are replaced with read-only uint8 views
+    into one dense tensor, so old code reading pieces_dict keeps working.
+    """
+    def __init__(self, pieces_dict):
+        self.piece_types = max(pieces_dict)
+        self.size = max(max(shape.shape) for data in pieces_dict.values() for shape in data["shapes"]) # N, biggest shape in the set
+        id_count = self.piece_types + 1
+
+        self.shapes = numpy.zeros((id_count, 4, self.size, self.size), dtype=numpy.uint8) # types x 4 x N x N
+        self.sizes = [0] * id_count # width of the rotation 0 box, used for spawn positioning
+        self.spawn_offsets = [0] * id_count # blank rows above the piece in rotation 0
+        self.minos = [None] * id_count # [piece][rotation] -> ((row, col), ...) of the filled cells
+        self.bounding_boxes = [None] * id_count # [piece][rotation] -> (top, left, bottom, right), inclusive
+        self.column_extents = [None] * id_count # [piece][rotation] -> (leftmost, rightmost)
+        self.drop_profiles = [None] * id_count # [piece][rotation] -> ((col, bottom_row), ...) for every filled cell with nothing of the piece under it
+        self.preview_boards = numpy.zeros((id_count, 5, 5), dtype=numpy.int8) # rotation 0 stamped with the piece id, for the next/hold panels
+        self.piece_boards = [None] * id_count # [piece][rotation] -> shape stamped with the piece id, what the engine draws as piece_board
+
+        for piece_id, data in pieces_dict.items():
+            minos, bounding_boxes, column_extents, drop_profiles = [], [], [], []
+            for rotation, shape in enumerate(data["shapes"]):
+                rows, cols = shape.shape
+                self.shapes[piece_id, rotation, :rows, :cols] = shape != 0
+                cells = tuple((int(row), int(col)) for row, col in numpy.argwhere(shape != 0))
+                cell_rows = [row for row, col in cells]
+                cell_cols = [col for row, col in cells]
+                minos.append(cells)
+                bounding_boxes.append((min(cell_rows), min(cell_cols), max(cell_rows), max(cell_cols)))
+                column_extents.append((min(cell_cols), max(cell_cols)))
+                drop_profiles.append(tuple((col, row) for row, col in cells if (row + 1, col) not in cells))
+            self.minos[piece_id] = tuple(minos)
+            self.bounding_boxes[piece_id] = tuple(bounding_boxes)
+            self.column_extents[piece_id] = tuple(column_extents)
+            self.drop_profiles[piece_id] = tuple(drop_profiles)
+            self.sizes[piece_id] = data["shapes"][0].shape[1]
+            self.spawn_offsets[piece_id] = bounding_boxes[0][0]
+            for row, col in minos[0]:
+                self.preview_boards[piece_id, row, col] = piece_id
+
+        self.shapes.flags.writeable = False
+        self.preview_boards.flags.writeable = False
+        stamped_shapes = self.shapes * numpy.arange(id_count, dtype=numpy.uint8)[:, None, None, None]
+        stamped_shapes.flags.writeable = False
+        # swap the per-rotation int64 arrays for views into the tensor (same dimensions as before)
+        for piece_id, data in pieces_dict.items():
+            dimensions = [shape.shape for shape in data["shapes"]]
+            data["shapes"] = [self.shapes[piece_id, rotation, :rows, :cols] for rotation, (rows, cols) in enumerate(dimensions)]
+            self.piece_boards[piece_id] = tuple(stamped_shapes[piece_id, rotation, :rows, :cols] for rotation, (rows, cols) in enumerate(dimensions))
+
+tetra_table = PieceTable(tetra_dict)
+penta_table = PieceTable(penta_dict)
+
+other_skins = []
+
+def init_skins():
+    """
+    Lazy loader for skin textures.
+    Replaces placeholders with surfaces from the arrays already declared in skinloader.py
+    """
+    global other_skins 
+    other_skins = [] # clear the list
+    skinloader.set_tetra_skins()
+    skinloader.set_penta_skins()
+    skinloader.set_other_skins()
+
+    for i, piece in penta_dict.items():
+        piece["skin"] = skinloader.penta_skins[i-1]
+    for i, piece in tetra_dict.items():
+        piece["skin"] = skinloader.tetra_skins[i-1]
+    for skin in skinloader.other_skins:
+        other_skins.append(skin)
+
+# checks left to right if kicking right
+kick_list_right = [(0, 0), (0, 1), (-1, 1), (1, 1), (-1, 0), (1, 0), (-2, 0), (2, 0), (0, -1)]
+# checks right to left if kicking left
+kick_list_left = [(0, 0), (0, 1), (1, 1), (-1, 1), (1, 0), (-1, 0), (2, 0), (-2, 0), (0, -1)]
+# there are some rotation states where using the biased lists wouldn't make sense, for example rotating a state 4 I piece to a state 1 or 3.
+# it should be fine though because it only affects kick order, and if anything gives advanced players more control.
+
+kick_list_mirror = [(0, 0), (0, 1), (1, 1), (-1, 1), (1, 0), (-1, 0), (2, 0), (-2, 0), (0, -1)]
+
+def rotation_kicks(piece_id, new_rotation):
+    """The kicks rotate_piece tries, in order, when piece_id rotates into new_rotation"""
+    if new_rotation == 0 and piece_id in (1, 3, 4, 5): # ensures the kick order is symmetrical for Z, S, O, I
+        return kick_list_left
+    return kick_list_right
@@ -0,0 +1,252 @@
+"""
+placements.py finds every spot the current piece can lock in, and the inputs that get it there.
+It's a breadth first search over piece states using the same kick lists and kick order as
+Engine.rotate_piece and mirror_piece, so everything it finds is something a player could actually do
+(with gravity and lock delay out of the way, like at 0G).
+
+Every state is packed into one int that's also its index into a flat bytes map of free positions:
+    key = layer * layer_size + (y + PAD) * stride + (x + PAD)    layer = mirrored * 4 + rotation
+so moving is adding an offset, checking a position is one index, and the visited table is a dict of ints.
+The map has PAD cells of wall on every side, so kicks off the edges never need a bounds check.
+"""
+
+import numpy
+
+import pieces
+
+PAD = 5 # at least the piece box size, so a piece at x = -PAD or y = -PAD is always fully inside the wall
+
+# inputs that show up in paths, apply_path turns them back into engine calls
+LEFT = "LEFT"
+RIGHT = "RIGHT"
+DOWN = "DOWN" # one row of soft drop
+DROP = "DROP" # sonic drop, a run of DOWNs that ends on the floor gets shortened to this
+CW = "CW"
+CCW = "CCW"
+ROTATE_180 = "180"
+MIRROR = "MIRROR"
+INPUTS = (LEFT, RIGHT, DOWN, DROP, CW, CCW, ROTATE_180, MIRROR)
+INPUT_COUNT = len(INPUTS)
+DOWN_INDEX = INPUTS.index(DOWN)
+
+_windows_cache = {} # (id(piece_table), piece_ids) -> (rows, cols) index arrays for free_map
+
+def free_map(game, piece_ids):
+    """
+    bytes with a 1 for every (layer, y + PAD, x + PAD) where the piece fits on game's board,
+    plus the stride (bytes per row) and layer_size (bytes per rotation).
+    """
+    height, width = game.board_height, game.board_width
+    rows, stride = height + PAD + 1, width + 2 * PAD # one extra row at the bottom so DOWN from the last row hits wall
+    walls = numpy.ones((rows + PAD, stride + PAD), dtype=bool)
+    walls[PAD:PAD + height, PAD:PAD + width] = game.game_board != 0
+    cache_key = (id(game.piece_table), tuple(piece_ids))
+    if cache_key not in _windows_cache:
+        cells = [game.piece_table.minos[piece_id][rotation] for piece_id in piece_ids for rotation in range(4)]
+        most = max(len(layer_cells) for layer_cells in cells)
+        cells = [list(layer_cells) + [layer_cells[0]] * (most - len(layer_cells)) for layer_cells in cells] # repeat a cell so every layer has the same count
+        _windows_cache[cache_key] = tuple(numpy.array([[cell[axis] for cell in layer_cells] for layer_cells in cells]) for axis in (0, 1))
+    mino_rows, mino_cols = _windows_cache[cache_key]
+    # windows[row, col] is walls shifted by one mino's offset, so every (layer, mino) shift comes out of one index
+    windows = numpy.lib.stride_tricks.as_strided(walls, (PAD + 1, PAD + 1, rows, stride), walls.strides * 2)
+    blocked = windows[mino_rows, mino_cols].any(axis=1) # the piece fits where none of its cells hit a wall or a mino
+    return (~blocked).tobytes(), stride, rows * stride
+
+_moves_cache = {} # only depends on the pieces and board size, so it's shared between calls
+
+def layer_moves(game, piece_ids, stride, layer_size):
+    """[layer] -> list of (index in INPUTS, key offsets of every kick in the order they're tried) for the rotations and mirror"""
+    cache_key = (id(game.piece_table), tuple(piece_ids), stride, layer_size, game.allow_180)
+    if cache_key in _moves_cache:
+        return _moves_cache[cache_key]
+    rotations = [(CW, 1), (CCW, 3)]
+    if game.allow_180:
+        rotations.append((ROTATE_180, 2))
+    moves = []
+    for slot, piece_id in enumerate(piece_ids):
+        for rotation in range(4):
+            layer = slot * 4 + rotation
+            layer_moves = []
+            for move, amount in rotations:
+                new_rotation = (rotation + amount) % 4
+                layer_offset = (slot * 4 + new_rotation - layer) * layer_size
+                kicks = pieces.rotation_kicks(piece_id, new_rotation)
+                layer_moves.append((INPUTS.index(move), [layer_offset + kick_y * stride + kick_x for kick_x, kick_y in kicks]))
+            if len(piece_ids) > 1:
+                layer_offset = ((1 - slot) * 4 + rotation - layer) * layer_size
+                layer_moves.append((INPUTS.index(MIRROR), [layer_offset + kick_y * stride + kick_x for kick_x, kick_y in pieces.kick_list_mirror]))
+            moves.append(layer_moves)
+    _moves_cache[cache_key] = moves
+    return moves
+
+_shapes_cache = {} # (id(piece_table), piece_ids) -> layer_shapes result
+
+def layer_shapes(game, piece_ids):
+    """
+    [layer] -> (shape, top_row, left_col, bottom_row). shape is the same number for every layer that fills
+    the same cells once it's moved to the top left corner, so two placements cover the same cells
+    when they have the same shape and the same top left corner on the board.
+    """
+    cache_key = (id(game.piece_table), tuple(piece_ids))
+    if cache_key in _shapes_cache:
+        return _shapes_cache[cache_key]
+    shape_ids = {}
+    shapes = []
+    for piece_id in piece_ids:
+        for rotation in range(4):
+            cells = game.piece_table.minos[piece_id][rotation]
+            top_row, left_col = min(row for row, col in cells), min(col for row, col in cells)
+            shape = frozenset((row - top_row, col - left_col) for row, col in cells)
+            shapes.append((shape_ids.setdefault(shape, len(shape_ids)), top_row, left_col, max(row for row, col in cells)))
+    _shapes_cache[cache_key] = shapes
+    return shapes
+
+def find_placements(game, with_paths=True):
+    """
+    Every distinct way the current piece can lock from where it is now. Returns a list of
+    (piece_id, x, y, rotation, path), shortest path first. Placements that fill exactly the same cells
+    (like an O piece in any rotation) only show up once. path is None if with_paths is False.
+    The piece id can be the mirrored piece, if the gamemode allows mirroring.
+    """
+    piece_id = game.piece_bags[0][0]
+    piece_ids = [piece_id]
+    if game.allow_mirror and game.piece_inversions.get(piece_id, piece_id) != piece_id:
+        piece_ids.append(game.piece_inversions[piece_id])
+    free, stride, layer_size = free_map(game, piece_ids)
+    moves = layer_moves(game, piece_ids, stride, layer_size)
+    shapes = layer_shapes(game, piece_ids)
+
+    x0, y0, rotation0 = game.piece_x, game.piece_y, game.piece_rotation
+    start = rotation0 * layer_size + (y0 + PAD) * stride + x0 + PAD
+    if not free[start]:
+        return []
+    unvisited = bytearray(free) # 1 for every free state that hasn't been reached yet, so one index checks both
+    unvisited[start] = 0
+    parents = [0] * len(free) # (parent key * INPUT_COUNT + input index), or -1 where a search starts
+    parents[start] = -1
+    queue = [start]
+
+    # everything between the spawn row and the top of the stack is open air, so every (rotation, x) there is
+    # reachable by turning at spawn, sliding over and dropping. Instead of searching all of it, mark it visited
+    # and start the search from its lowest row. Only done when every rotation (and the mirror) fits at spawn.
+    # That row goes by where the lowest cell of any rotation is, not the bottom of the piece box,
+    # pentominos only reach 4 rows down the box so that's a row less to search in every rotation.
+    # (Every rotation has to start on the same row, or the search treats the lower ones as closer and picks worse paths)
+    filled_rows = numpy.flatnonzero(game.game_board.any(axis=1))
+    stack_top = filled_rows[0] if filled_rows.size else game.board_height
+    sky_bottom = stack_top - 1 - max(bottom_row for shape, top_row, left_col, bottom_row in shapes) # lowest y where every rotation is above the stack
+    layer_count = len(piece_ids) * 4
+    spawn_offset = (y0 + PAD) * stride + x0 + PAD
+    if sky_bottom > y0 and all(free[layer * layer_size + spawn_offset] for layer in range(layer_count)):
+        queue = []
+        parents[start] = 0
+        sky_start, sky_end = (y0 + PAD) * stride, (sky_bottom + PAD + 1) * stride
+        for layer in range(layer_count):
+            base = layer * layer_size
+            unvisited[base + sky_start:base + sky_end] = bytes(sky_end - sky_start)
+            for key in range(base + sky_end - stride, base + sky_end): # the lowest sky row is where the search starts
+                if free[key]:
+                    parents[key] = -1
+                    queue.append(key)
+
+    def seed_path(key):
+        """How a search start gets reached: mirror, turn at spawn, slide over, then (inputs, rows of soft drop)"""
+        layer, position = divmod(key, layer_size)
+        row, col = divmod(position, stride)
+        path = [MIRROR] if layer >= 4 else []
+        turn = (layer % 4 - rotation0) % 4
+        if turn == 1:
+            path.append(CW)
+        elif turn == 3:
+            path.append(CCW)
+        elif turn == 2:
+            path += [ROTATE_180] if game.allow_180 else [CW, CW]
+        path += [LEFT] * (x0 + PAD - col) + [RIGHT] * (col - x0 - PAD)
+        return path, row - y0 - PAD
+
+    # breadth first search from there, parents doubles as the visited table
+    left, right, down = INPUTS.index(LEFT), INPUTS.index(RIGHT), DOWN_INDEX
+    for key in queue: # queue grows while it's being walked
+        packed = key * INPUT_COUNT
+        new_key = key - 1
+        if unvisited[new_key]:
+            unvisited[new_key] = 0
+            parents[new_key] = packed + left
+            queue.append(new_key)
+        new_key = key + 1
+        if unvisited[new_key]:
+            unvisited[new_key] = 0
+            parents[new_key] = packed + right
+            queue.append(new_key)
+        new_key = key + stride
+        if unvisited[new_key]:
+            unvisited[new_key] = 0
+            parents[new_key] = packed + down
+            queue.append(new_key)
+        for move, kick_offsets in moves[key // layer_size]:
+            for offset in kick_offsets:
+                new_key = key + offset
+                if free[new_key]: # first kick that fits is the one the engine would use
+                    if unvisited[new_key]:
+                        unvisited[new_key] = 0
+                        parents[new_key] = packed + move
+                        queue.append(new_key)
+                    break
+
+    placements = []
+    seen_cells = set()
+    for key in queue:
+        if free[key + stride]: # can still fall, not a place it could lock
+            continue
+        layer, position = divmod(key, layer_size)
+        row, col = divmod(position, stride)
+        x, y = col - PAD, row - PAD
+        piece, rotation = piece_ids[layer // 4], layer % 4
+        shape, top_row, left_col, bottom_row = shapes[layer]
+        cells = (shape, y + top_row, x + left_col)
+        if cells in seen_cells:
+            continue
+        seen_cells.add(cells)
+        placements.append((piece, x, y, rotation, build_path(parents, key, free, stride, seed_path) if with_paths else None))
+    return placements
+
+def build_path(parents, key, free, stride, seed_path):
+    """Inputs from the start to key, with every run of DOWN that ends on the floor shortened to one DROP"""
+    moves = [] # (input, key the piece is at after it), backwards
+    while parents[key] >= 0:
+        parent, move = divmod(parents[key], INPUT_COUNT)
+        moves.append((INPUTS[move], key))
+        key = parent
+    path, downs = seed_path(key)
+    for move, move_key in reversed(moves):
+        if move == DOWN:
+            downs += 1
+        else:
+            if downs:
+                path += [DROP] if not free[key + stride] else [DOWN] * downs # a run of DOWN that lands is one sonic drop
+                downs = 0
+            path.append(move)
+        key = move_key
+    if downs:
+        path += [DROP] if not free[key + stride] else [DOWN] * downs
+    return path
+
+def apply_path(game, path):
+    """Does every input in path on game (without locking the piece, hard_drop or lock_piece after this)"""
+    for move in path:
+        if move == LEFT:
+            game.move_piece(-1, 0)
+        elif move == RIGHT:
+            game.move_piece(1, 0)
+        elif move == DOWN:
+            game.move_piece(0, 1)
+        elif move == DROP:
+            game.move_piece(0, game.board_height)
+        elif move == CW:
+            game.rotate_piece(1)
+        elif move == CCW:
+            game.rotate_piece(3)
+        elif move == ROTATE_180:
+            game.rotate_piece(2)
+        elif move == MIRROR:
+            game.mirror_piece()
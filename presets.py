@@ -0,0 +1,186 @@
+"""
+presets.py is the file format for prepared positions (presets): a board, a queue and hold, and optionally a goal
+with its solution, like the puzzles puzzlegen.py makes. Engine.load_position puts one on the board, and
+PuzzleRun steps through a whole file of them as puzzle mode.
+
+A preset file is a 64 byte header, then an index of count + 1 uint64 offsets (where every record starts and the
+last one ends, from the end of the index), then the records back to back. A record is
+    rows, the bottom rows of the board as one byte per cell (top row first, 0 = empty, else the piece id)
+    queue length, the queue (current piece first)
+    hold length, hold
+    goal (an index into GOALS), lines, solution length, the solution as openings.MOVE_DTYPE moves
+every count a single byte, so a mostly empty board only takes the rows that have something in them.
+PresetFile memory maps the file, so opening it reads only the header, and getting preset n is two offsets and
+one short slice, however many presets there are.
+"""
+
+import os
+import collections
+
+import numpy
+
+import engine, openings
+
+MAGIC = b"PTPRES01"
+VERSION = 1
+HEADER_DTYPE = numpy.dtype([("magic", "S8"), ("version", "<u4"), ("width", "<u2"), ("height", "<u2"), ("count", "<u8"),
+                            ("rules", "<u8"), ("reserved", "V32")])
+OFFSET_DTYPE = numpy.dtype("<u8")
+GOALS = (None, "pc", "lines", "tspin")
+FILLED_CELL = 1 # what cells with no piece of their own (puzzlegen's boards) get drawn as
+
+Preset = collections.namedtuple("Preset", "board queue hold goal lines solution", defaults=(None, 0, ()))
+
+def encode_preset(preset, width):
+    """A preset's record as bytes"""
+    board = numpy.asarray(preset.board, dtype=numpy.int8).reshape(-1, width)
+    filled_rows = numpy.flatnonzero(board.any(axis=1))
+    board = board[filled_rows[0]:] if filled_rows.size else board[:0] # only from the highest row with something in it
+    solution = numpy.array([tuple(move) for move in preset.solution], dtype=openings.MOVE_DTYPE)
+    record = bytearray([len(board)]) + board.tobytes()
+    record += bytes([len(preset.queue)]) + bytes(preset.queue) + bytes([len(preset.hold)]) + bytes(preset.hold)
+    record += bytes([GOALS.index(preset.goal), preset.lines, len(solution)]) + solution.tobytes()
+    return record
+
+def decode_preset(record, width):
+    """encode_preset backwards"""
+    rows = record[0]
+    pos = 1 + rows * width
+    board = numpy.frombuffer(record, dtype=numpy.int8, count=rows * width, offset=1).reshape(rows, width)
+    queue = tuple(record[pos + 1:pos + 1 + record[pos]])
+    pos += 1 + record[pos]
+    hold = tuple(record[pos + 1:pos + 1 + record[pos]])
+    pos += 1 + record[pos]
+    goal, lines, moves = record[pos:pos + 3]
+    solution = [tuple(move) for move in numpy.frombuffer(record, dtype=openings.MOVE_DTYPE, count=moves, offset=pos + 3).tolist()]
+    return Preset(board, queue, hold, GOALS[goal], lines, solution)
+
+def write_presets(path, width, height, rules, presets):
+    """Packs presets (a list of Preset) into a preset file, returns how many"""
+    records = [encode_preset(preset, width) for preset in presets]
+    offsets = numpy.zeros(len(records) + 1, dtype=OFFSET_DTYPE)
+    offsets[1:] = numpy.cumsum([len(record) for record in records])
+    header = numpy.zeros(1, dtype=HEADER_DTYPE)
+    header["magic"], header["version"], header["width"], header["height"] = MAGIC, VERSION, width, height
+    header["count"], header["rules"] = len(records), rules
+    os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+    with open(path + ".tmp", "wb") as file: # a game that has the old file mapped keeps reading the old one
+        file.write(header.tobytes())
+        file.write(offsets.tobytes())
+        for record in records:
+            file.write(record)
+    os.replace(path + ".tmp", path)
+    return len(records)
+
+class PresetFile:
+    """A preset file, memory mapped. presets[n] is the nth Preset"""
+    def __init__(self, path):
+        header = numpy.fromfile(path, dtype=HEADER_DTYPE, count=1)
+        if len(header) != 1 or header["magic"][0] != MAGIC or header["version"][0] != VERSION:
+            raise ValueError(f"{path} isn't a preset file")
+        self.path = path
+        self.width, self.height = int(header["width"][0]), int(header["height"][0])
+        self.count, self.rules = int(header["count"][0]), int(header["rules"][0])
+        data = numpy.memmap(path, dtype=numpy.uint8, mode="r")
+        index_end = HEADER_DTYPE.itemsize + (self.count + 1) * OFFSET_DTYPE.itemsize
+        self.offsets = data[HEADER_DTYPE.itemsize:index_end].view(OFFSET_DTYPE)
+        self.records = data[index_end:]
+
+    def __len__(self):
+        return self.count
+
+    def matches(self, game):
+        """Whether the presets were made for game's board and rules (openings.rules_id, like an opening book)"""
+        return (self.width, self.height) == (game.board_width, game.board_height) and openings.rules_id(game) == self.rules
+
+    def __getitem__(self, number):
+        if not 0 <= number < self.count:
+            raise IndexError(f"preset {number} out of range")
+        start, end = self.offsets[number:number + 2].tolist()
+        return decode_preset(self.records[start:end].tobytes(), self.width)
+
+def load_presets(path):
+    """PresetFile for path (relative to the game folder), or None if there's no file there"""
+    if not path:
+        return None
+    path = os.path.join(engine.script_dir, path)
+    return PresetFile(path) if os.path.exists(path) else None
+
+class PuzzleRun:
+    """
+    Puzzle mode: plays through a preset file in order. update() is called every frame and moves on to the next
+    preset as soon as the goal is met, or loads the same one again once the pieces for it have run out (or the
+    game started over, a top out or the reset key).
+    """
+    def __init__(self, presets, start=0):
+        self.presets = presets
+        self.number = start
+        self.preset = None
+        self.seed = None # the game's rng_seed when the preset went on, it only changes when the game starts over
+        self.last = None # (pieces placed, lines cleared, first two pieces in the queue, hold) as of the last update
+        self.solved = self.failed = 0
+
+    def load(self, game, number=None):
+        """
+        Puts preset number (the current one by default) on the board, without load_game. A preset load_position
+        turns down gets skipped for the one after it. Returns False if none of them would go on.
+        """
+        start = self.number if number is None else number
+        for number in range(start, start + len(self.presets)):
+            self.number = number % len(self.presets)
+            preset = self.presets[self.number]
+            try:
+                game.load_position(preset.board, preset.queue, preset.hold)
+            except ValueError as error:
+                print(f"skipping puzzle {self.number}: {error}")
+                continue
+            self.preset = preset
+            self.seed = game.rng_seed
+            self.remember(game)
+            return True
+        self.preset = None
+        return False
+
+    def remember(self, game):
+        self.last = game.pieces_placed, game.lines_cleared, tuple((game.piece_bags[0] + game.piece_bags[1])[:2]), tuple(game.hold_pieces)
+
+    def placed_piece(self, game):
+        """The piece the one placement since the last update was, worked out from what it took out of the queue and hold"""
+        pieces, lines, queue, hold = self.last
+        if tuple(game.hold_pieces) == hold:
+            return queue[0]
+        return hold[0] if hold else queue[1] # held first, so it was the hold piece, or the one after if hold was empty
+
+    def goal_met(self, game):
+        """
+        Whether the game has done what the preset asks for since it went on. The engine doesn't know about spins,
+        so a tspin counts as a T clearing the preset's lines in one go.
+        """
+        goal, lines = self.preset.goal, self.preset.lines
+        if goal == "pc":
+            return game.lines_cleared > 0 and not game.game_board.any()
+        if goal == "lines":
+            return game.lines_cleared >= lines
+        if goal == "tspin":
+            placed, cleared = game.pieces_placed - self.last[0], game.lines_cleared - self.last[1]
+            return placed == 1 and cleared >= lines and game.pieces_dict[self.placed_piece(game)]["name"] == "T"
+        return False
+
+    def next(self, game):
+        return self.load(game, self.number + 1)
+
+    def pieces_allowed(self):
+        return len(self.preset.solution) if self.preset.solution else len(self.preset.queue) + len(self.preset.hold)
+
+    def update(self, game):
+        """Returns False once there's no preset left that can be loaded, puzzle mode should be turned off then"""
+        if self.preset is None:
+            return self.load(game)
+        if self.goal_met(game):
+            self.solved += 1
+            return self.next(game)
+        if game.rng_seed != self.seed or (self.preset.goal is not None and game.pieces_placed >= self.pieces_allowed()):
+            self.failed += 1
+            return self.load(game) # try it again
+        self.remember(game)
+        return True
@@ -0,0 +1,90 @@
+"""
+profiler.py times each stage of a frame so hitches can be tracked down to the stage that caused them.
+main.py calls frame_start() at the top of every frame and mark(stage) right after each stage,
+which stores the nanoseconds since the previous mark in that stage's ring buffer.
+Stages timed somewhere else (the engine's per tick stages) get handed over with add(stage, ns).
+That's one perf_counter_ns call and a list write per stage, cheap enough to leave on all the time.
+"""
+
+import json
+import time
+
+import numpy
+
+class Profiler:
+    def __init__(self, capacity=600):
+        self.capacity = capacity # frames of history kept per stage, 10 seconds at 60 fps
+        self.stages = {} # stage name -> ring buffer of durations in ns, in the order stages first showed up
+        self.indexes = {} # stage name -> how many samples were ever written (next slot is count % capacity)
+        self.frame_times = [0] * capacity
+        self.frame_count = 0
+        self.frame_start_time = None
+        self.last_mark = time.perf_counter_ns()
+        self.summary_cache = None
+        self.summary_time = 0
+
+    def frame_start(self):
+        now = time.perf_counter_ns()
+        if self.frame_start_time is not None:
+            self.frame_times[self.frame_count % self.capacity] = now - self.frame_start_time
+            self.frame_count += 1
+        self.frame_start_time = now
+        self.last_mark = now
+
+    def mark(self, stage):
+        """Everything since the last mark (or the start of the frame) gets counted as stage"""
+        self.add(stage, time.perf_counter_ns() - self.last_mark) # moves last_mark up to now
+
+    def add(self, stage, ns):
+        """
+        Counts ns as stage without timing it here, for work that was timed somewhere else
+        (like Engine.step_times). It's taken off whatever gets marked next so nothing is counted twice.
+        """
+        ring = self.stages.get(stage)
+        if ring is None:
+            ring = self.stages[stage] = [0] * self.capacity
+            self.indexes[stage] = 0
+        index = self.indexes[stage]
+        ring[index % self.capacity] = ns
+        self.indexes[stage] = index + 1
+        self.last_mark += ns
+
+    def samples(self, stage):
+        """A stage's samples oldest to newest, in ns"""
+        if stage == "frame":
+            ring, count = self.frame_times, self.frame_count
+        else:
+            ring, count = self.stages[stage], self.indexes[stage]
+        if count < self.capacity:
+            return ring[:count]
+        start = count % self.capacity
+        return ring[start:] + ring[:start]
+
+    def summary(self, max_age_ms=250):
+        """
+        {stage: (p50, p99, max)} in milliseconds, frame time first.
+        Cached for max_age_ms so the overlay isn't running percentiles every single frame.
+        """
+        now = time.perf_counter_ns()
+        if self.summary_cache is not None and now - self.summary_time < max_age_ms * 1000000:
+            return self.summary_cache
+        summary = {}
+        for stage in ["frame"] + list(self.stages):
+            samples = self.samples(stage)
+            if not samples:
+                continue
+            p50, p99 = numpy.percentile(samples, (50, 99)) / 1e6
+            summary[stage] = (p50, p99, max(samples) / 1e6)
+        self.summary_cache = summary
+        self.summary_time = now
+        return summary
+
+    def dump(self, path):
+        """Writes the summary and every raw sample (in ns, oldest first) to a json file"""
+        with open(path, "w") as file:
+            json.dump({
+                "created": time.strftime("%Y-%m-%dT%H:%M:%S"),
+                "frames": self.frame_count,
+                "summary_ms": {stage: dict(zip(("p50", "p99", "max"), values)) for stage, values in self.summary(max_age_ms=0).items()},
+                "samples_ns": {stage: self.samples(stage) for stage in ["frame"] + list(self.stages)},
+            }, file, indent=1)
@@ -0,0 +1,354 @@
+"""
+puzzlegen.py makes puzzles for drilling: a board, the visible queue and hold, and a goal that the queue can reach.
+Every puzzle is searched out with the same placement rules the game uses (placements.find_placements through
+pcsolver.cached_placements), and only kept if the search finds a solution, which gets saved with it.
+
+    python puzzlegen.py --kind pc --count 5000                  perfect clears, settings.py board, Guideline
+    python puzzlegen.py --kind lines --pieces 3 --min-lines 3    clear 3 lines with the 3 pieces you're given
+    python puzzlegen.py --kind tspin --gamemode Classic -j 8
+
+The kinds:
+    pc      a perfect clear. Built backwards: pcsolver finds a perfect clear (3 pieces to twice the queue) from
+            an empty board for the randomizer's pieces, all but the last 2 to --pieces moves of it are played,
+            and the puzzle is the board, hold and queue from there (solved again from there, for its own solution).
+    lines   as many lines as possible in up to --pieces pieces. The board is cheese garbage with a few clean
+            placements on top, the goal is the most lines the search finds (at least --min-lines).
+    tspin   a T spin that clears lines. The board is built backwards around a T spin double slot on top of
+            garbage, then the search has to actually spin a T into it (the last input a rotation, with 3 of
+            the 4 corners of its box filled) within --pieces pieces.
+
+Every attempt is one seed: it picks the board and where in the gamemode's own randomizer the queue starts, so
+the same seeds always give the same puzzles. Seeds go out to a process pool a chunk at a time.
+
+The puzzles are written as a presets.py preset file, the goal and solution in every record, so puzzle mode can
+step through them (see presets.PuzzleRun).
+"""
+
+import os
+import sys
+import time
+import argparse
+import collections
+import multiprocessing
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy
+
+import engine, gamemodes, openings, pcsolver, placements, presets, rng, search, settings
+
+KINDS = presets.GOALS[1:] # pc, lines and tspin, every goal but none
+CHUNK = 64 # seeds per job
+MAX_IDLE_SEEDS = 20000 # seeds in a row without a puzzle before generate gives up on the config
+MAX_GARBAGE = 4 # cheese rows under lines and tspin boards
+
+Config = collections.namedtuple("Config", "piece_set gamemode width height kind pieces min_lines think_ms")
+
+_games_cache = {} # (piece set, gamemode, width, height) -> Engine, one per worker process
+_spins_cache = {} # (rules key, board, piece) -> {(x, y, rotation)} of the placements that are spins
+
+def new_game(piece_set, gamemode, width, height):
+    """A headless game with the gamemode stacked on the piece set, made once per process"""
+    key = piece_set, gamemode, width, height
+    if key not in _games_cache:
+        game = engine.Engine(board_width=width, board_height=height, seed=0)
+        game.load_gamemode(gamemodes.PentominoBase if piece_set == "penta" else gamemodes.TetraminoBase)
+        game.load_gamemode(getattr(gamemodes, gamemode))
+        _games_cache[key] = game
+    return _games_cache[key]
+
+def has_holes(field, width):
+    """Whether any empty cell has a filled one somewhere above it"""
+    above, covering = 0, field >> width
+    while covering:
+        above |= covering
+        covering >>= width
+    return bool(above & ~field)
+
+def spin_placements(rules, field, piece):
+    """
+    (x, y, rotation) of every placement of piece that's a spin: the last input is a rotation and 3 of the 4
+    corners of its box are filled (walls and floor count), the usual T spin rule
+    """
+    key = rules.key, field, piece
+    if key not in _spins_cache:
+        if len(_spins_cache) >= search.MAX_CACHED_PLACEMENTS:
+            _spins_cache.clear()
+        width, height = rules.board_width, rules.board_height
+        board = pcsolver.field_board(field, width, height)
+        size = rules.piece_table.sizes[piece]
+        spins = set()
+        for piece_id, x, y, rotation, path in placements.find_placements(search.Position(rules, board, piece)):
+            if not path or path[-1] not in (placements.CW, placements.CCW, placements.ROTATE_180):
+                continue
+            corners = 0
+            for row, col in ((y, x), (y, x + size - 1), (y + size - 1, x), (y + size - 1, x + size - 1)):
+                corners += not (0 <= row < height and 0 <= col < width) or bool(board[row, col])
+            if corners >= 3:
+                spins.add((x, y, rotation))
+        _spins_cache[key] = spins
+    return _spins_cache[key]
+
+class PuzzleSearch:
+    """
+    Depth first search over what the queue (and hold) can do from a board, for the lines and tspin goals.
+    Gives up once deadline_ns passes, timed_out says whether it did.
+    """
+    def __init__(self, rules, queue, can_hold, piece_cells, main_height, deadline_ns=None):
+        self.rules, self.queue, self.can_hold = rules, tuple(queue), can_hold
+        self.width, self.height, self.main_height = rules.board_width, rules.board_height, main_height
+        self.main_cells = main_height * self.width
+        self.piece_cells = piece_cells
+        self.piece_rows = max(rules.piece_table.sizes[piece] for piece in set(queue) if piece) # tallest a piece can stand
+        self.deadline_ns = deadline_ns
+        self.timed_out = False
+        self.memo = {}
+
+    def children(self, field, index, hold):
+        """(move, field after, lines cleared, queue index after, hold after) for every placement that stays on the main board"""
+        width, height = self.width, self.height
+        for held, piece, new_hold, new_index in pcsolver.queue_options(self.queue, index, hold, self.can_hold, True):
+            for piece_id, x, y, rotation, mask in pcsolver.cached_placements(self.rules, field, piece):
+                if mask >> self.main_cells: # pokes into the hidden rows
+                    continue
+                new_field, rows_left = pcsolver.clear_lines(field | mask, height, width)
+                yield (held, piece_id, x, y, rotation), new_field, height - rows_left, new_index, new_hold
+
+    def line_bound(self, field, left):
+        """Most lines left pieces could ever clear: the fullest rows they have the cells for (wherever those are)"""
+        width, full_row = self.width, (1 << self.width) - 1
+        missing = sorted(width - ((field >> (row * width)) & full_row).bit_count() for row in range(self.main_height))
+        cells = left * self.piece_cells
+        lines = 0
+        for count in missing[:left * self.piece_rows]:
+            if count > cells:
+                break
+            cells -= count
+            lines += 1
+        return lines
+
+    def out_of_time(self):
+        if self.deadline_ns is not None and time.perf_counter_ns() >= self.deadline_ns:
+            self.timed_out = True
+        return self.timed_out
+
+    def most_lines(self, field, index, hold, left, floor=0):
+        """
+        (most lines, moves) in up to left pieces, the fewest moves that get there. Lines under floor aren't wanted,
+        so lines that can't reach it don't get searched, and anything under floor that comes back is only a guess.
+        """
+        key = field, index, hold, left, floor
+        if key in self.memo:
+            return self.memo[key]
+        best = 0, ()
+        bound = self.line_bound(field, left) if left else 0
+        if bound and bound >= floor and not self.out_of_time():
+            for move, new_field, cleared, new_index, new_hold in self.children(field, index, hold):
+                lines, moves = cleared, ()
+                reach = cleared + self.line_bound(new_field, left - 1) if left > 1 else 0
+                if reach >= floor and (reach > best[0] or (reach == best[0] and len(best[1]) > 2)): # skip what can't beat the best so far
+                    lines, moves = self.most_lines(new_field, new_index, new_hold, left - 1, max(0, max(floor, best[0]) - cleared))
+                    lines += cleared
+                if lines > best[0] or (lines == best[0] and lines and len(moves) + 1 < len(best[1])):
+                    best = lines, (move,) + moves
+                if best[0] == bound and len(best[1]) == 1: # nothing can do better than that
+                    break
+        self.memo[key] = best
+        return best
+
+    def spin(self, field, index, hold, left, t_piece):
+        """(lines, moves) of the first T spin that clears lines in up to left pieces, or None"""
+        key = field, index, hold, left
+        if not left or key in self.memo or self.out_of_time():
+            return None
+        self.memo[key] = None
+        for move, new_field, cleared, new_index, new_hold in self.children(field, index, hold):
+            held, piece_id, x, y, rotation = move
+            if cleared and piece_id == t_piece and (x, y, rotation) in spin_placements(self.rules, field, piece_id):
+                return cleared, (move,)
+            found = self.spin(new_field, new_index, new_hold, left - 1, t_piece)
+            if found is not None:
+                return found[0], (move,) + found[1]
+        return None
+
+def clean_placements(rules, field, queue, count, main_rows, seed_rng):
+    """field after random placements of queue's first count pieces that leave no holes and stay under main_rows, or None"""
+    width = rules.board_width
+    for piece in queue[:count]:
+        options = [mask for piece_id, x, y, rotation, mask in pcsolver.cached_placements(rules, field, piece)
+                   if not (field | mask) >> (main_rows * width) and not has_holes(field | mask, width)]
+        if not options:
+            return None
+        field |= options[seed_rng.randint(0, len(options) - 1)]
+    return field
+
+def garbage_field(width, rows, seed_rng):
+    """rows of cheese at the bottom, one hole in each"""
+    field = 0
+    for row in range(rows):
+        field |= ((1 << width) - 1 & ~(1 << seed_rng.randint(0, width - 1))) << (row * width)
+    return field
+
+def tspin_slot_field(width, garbage, seed_rng):
+    """A T spin double slot sitting on garbage: a row with one gap, a row with a 3 wide gap over it, and an overhang"""
+    full_row = (1 << width) - 1
+    field = garbage_field(width, garbage, seed_rng)
+    col = seed_rng.randint(1, width - 2)
+    side = col + (1 if seed_rng.randint(0, 1) else -1)
+    field |= (full_row & ~(1 << col)) << (garbage * width)
+    field |= (full_row & ~(0b111 << (col - 1))) << ((garbage + 1) * width)
+    top = 1 << side
+    for other in range(width): # some of the rest of the row the overhang is in, away from the slot
+        if abs(other - col) > 1 and seed_rng.randint(0, 1):
+            top |= 1 << other
+    return field | top << ((garbage + 2) * width)
+
+def t_piece_id(game):
+    return next((piece for piece, data in game.pieces_dict.items() if data["name"] == "T"), None)
+
+def attempt(game, rules, config, seed):
+    """One try at a puzzle from seed: (bitboard, queue, hold, lines, solution), or None if it didn't work out"""
+    seed_rng = rng.Rng(seed)
+    game.reset_game(seed, record=False) # the gamemode's own randomizer makes the queue
+    sequence = game.piece_bags[0] + game.piece_bags[1]
+    queue_size = game.next_queue_size + 1
+    can_hold = game.max_hold_pieces == 1
+    width, height = rules.board_width, rules.board_height
+    main_height = height - game.board_extra_height
+    deadline = search.deadline_after(time.perf_counter_ns(), config.think_ms)
+    start = seed_rng.randint(0, len(game.piece_bags[0]) - 1)
+    hold = 0
+
+    if config.kind == "pc":
+        # built backwards: a perfect clear of the pieces from start on an empty board, the first part of it
+        # already played, and the 2 to --pieces pieces after that are the puzzle
+        heights = [rows for rows in range(1, main_height + 1) if 3 <= -(-rows * width // game.mino_count) <= 2 * queue_size]
+        if not heights:
+            return None
+        rows = heights[seed_rng.randint(0, len(heights) - 1)]
+        total = -(-rows * width // game.mino_count) # pieces it takes, rounded up
+        while len(sequence) < start + total + 1 + queue_size:
+            sequence += game.generate_bag(game.piece_gen_type)
+        empty = numpy.zeros((height, width), dtype=bool)
+        pc_search = pcsolver.PerfectClearSearch(rules, empty, sequence[start:start + total + 1], 0, can_hold, True, game.mino_count, min(rows, main_height))
+        pc_search.work(deadline)
+        if pc_search.solution is None or len(pc_search.solution) < 3:
+            return None
+        field, index = 0, start
+        for move in pc_search.solution[:len(pc_search.solution) - seed_rng.randint(2, min(config.pieces, len(pc_search.solution) - 1))]:
+            field, hold, index = pcsolver.play_move(rules, field, hold, sequence, index, move)
+        queue = tuple(sequence[index:index + queue_size])
+        pc_search = pcsolver.PerfectClearSearch(rules, pcsolver.field_board(field, width, height), queue, hold, can_hold, True, game.mino_count, main_height)
+        pc_search.work(deadline) # the rest of the way might not be the only one, or the shortest
+        solution = pc_search.solution
+        if solution is None or not 2 <= len(solution) <= config.pieces:
+            return None
+        lines = (field.bit_count() + game.mino_count * len(solution)) // width
+    else:
+        if can_hold and start and seed_rng.randint(0, 1):
+            hold = sequence[start - 1]
+        queue = tuple(sequence[start:start + queue_size])
+        puzzle_search = PuzzleSearch(rules, queue, can_hold, game.mino_count, main_height, deadline)
+        if config.kind == "lines":
+            field = garbage_field(width, seed_rng.randint(1, MAX_GARBAGE), seed_rng)
+            extra = [seed_rng.randint(1, game.piece_types) for _ in range(seed_rng.randint(0, 2))]
+            field = clean_placements(rules, field, extra, len(extra), main_height // 2, seed_rng)
+            if field is None or puzzle_search.line_bound(field, config.pieces) < config.min_lines:
+                return None
+            lines, solution = puzzle_search.most_lines(field, 0, hold, config.pieces, config.min_lines)
+        else:
+            t_piece = t_piece_id(game)
+            if t_piece not in queue[:config.pieces + 1] and hold != t_piece:
+                return None
+            field = tspin_slot_field(width, seed_rng.randint(0, MAX_GARBAGE - 2), seed_rng)
+            found = None
+            for pieces in range(1, config.pieces + 1): # the shortest spin there is
+                puzzle_search.memo.clear()
+                found = puzzle_search.spin(field, 0, hold, pieces, t_piece)
+                if found is not None:
+                    break
+            lines, solution = found if found is not None else (0, ())
+        if puzzle_search.timed_out or lines < config.min_lines:
+            return None
+    return field, queue, hold, lines, list(solution)
+
+def generate_job(job):
+    """Tries every seed of a chunk, returns (seeds tried, [puzzle])"""
+    config, first_seed, seeds = job
+    game = new_game(config.piece_set, config.gamemode, config.width, config.height)
+    rules = search.Rules(game)
+    puzzles = []
+    for seed in range(first_seed, first_seed + seeds):
+        puzzle = attempt(game, rules, config, seed)
+        if puzzle is not None:
+            puzzles.append(puzzle)
+    return seeds, puzzles
+
+def generate(config, count, first_seed=0, processes=1, max_idle=MAX_IDLE_SEEDS, log=print):
+    """
+    count puzzles for config (in seed order within each chunk), made on a pool of processes. Stops early, with
+    however many it has, once max_idle seeds in a row haven't given one (a goal the board can't reach never will).
+    """
+    puzzles = []
+    seed, tried, idle = first_seed, 0, 0
+    start = time.perf_counter()
+    pool = multiprocessing.Pool(processes) if processes > 1 else None
+    try:
+        while len(puzzles) < count and idle < max_idle:
+            # enough chunks for what's left at the rate so far, at least one per process
+            rate = len(puzzles) / tried if puzzles else 0.1
+            chunks = max(processes, min(processes * 16, int((count - len(puzzles)) / rate / CHUNK) + 1))
+            jobs = [(config, seed + chunk * CHUNK, CHUNK) for chunk in range(chunks)]
+            seed += chunks * CHUNK
+            results = pool.imap(generate_job, jobs) if pool is not None else map(generate_job, jobs)
+            for seeds, found in results:
+                tried += seeds
+                puzzles += found
+                idle = 0 if found else idle + seeds
+            log(f"{min(len(puzzles), count)} puzzles from {tried} seeds  {time.perf_counter() - start:.1f}s")
+        if len(puzzles) < count:
+            log(f"gave up after {idle} seeds in a row without a puzzle, the goal might be out of reach on this board")
+    finally:
+        if pool is not None:
+            pool.terminate()
+    return puzzles[:count]
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate verified puzzles (board, queue, hold and a goal) for a gamemode.")
+    parser.add_argument("--kind", choices=KINDS, default="pc")
+    parser.add_argument("--gamemode", default="Guideline", help="gamemode on top of the piece set")
+    parser.add_argument("--pentominos", action="store_true", help="the pentomino piece set instead of tetrominos")
+    parser.add_argument("--board", type=lambda text: tuple(int(part) for part in text.lower().split("x")),
+                        default=(settings.BOARD_WIDTH, settings.BOARD_HEIGHT), help="WIDTHxHEIGHT (height includes the extra rows)")
+    parser.add_argument("--count", type=int, default=1000)
+    parser.add_argument("--pieces", type=int, default=None, help="most pieces a solution can take (default 3, the whole queue for pc)")
+    parser.add_argument("--min-lines", type=int, default=2, help="fewest lines the goal can be, for lines and tspin")
+    parser.add_argument("--think-ms", type=float, default=50, help="search time per attempt before giving up on it")
+    parser.add_argument("--seed", type=int, default=0, help="first seed")
+    parser.add_argument("--max-idle", type=int, default=MAX_IDLE_SEEDS, help="seeds in a row without a puzzle before giving up")
+    parser.add_argument("-j", "--processes", type=int, default=os.cpu_count(), help="worker processes (1 runs in this process)")
+    parser.add_argument("--out", default=None, help="preset file (default <kind>.ptp next to settings.PUZZLE_FILE, so pc is the one puzzle mode plays)")
+    options = parser.parse_args(argv)
+
+    piece_set = "penta" if options.pentominos else "tetra"
+    game = new_game(piece_set, options.gamemode, *options.board)
+    queue_size = game.next_queue_size + 1
+    pieces = options.pieces if options.pieces is not None else (queue_size if options.kind == "pc" else 3)
+    if options.kind == "tspin" and (options.pentominos or t_piece_id(game) is None):
+        parser.error("tspin puzzles need the tetromino T, the slot is built for it")
+    config = Config(piece_set, options.gamemode, *options.board, options.kind, min(pieces, queue_size), options.min_lines, options.think_ms)
+    out = options.out or os.path.join(engine.script_dir, os.path.dirname(settings.PUZZLE_FILE), f"{options.kind}.ptp") # where load_presets looks, wherever this runs from
+    start = time.perf_counter()
+    puzzles = generate(config, options.count, options.seed, options.processes, options.max_idle)
+    if not puzzles:
+        return 1
+    width, height = game.board_width, game.board_height
+    found = [presets.Preset(pcsolver.field_board(field, width, height) * presets.FILLED_CELL, queue, (hold,) if hold else (), options.kind, lines, solution)
+             for field, queue, hold, lines, solution in puzzles]
+    count = presets.write_presets(out, width, height, openings.rules_id(game), found)
+    seconds = time.perf_counter() - start
+    print(f"{count} puzzles in {out} ({os.path.getsize(out):,} bytes)  {seconds:.1f}s, {count / seconds * 60:,.0f} a minute")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
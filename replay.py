@@ -0,0 +1,271 @@
+"""
+replay.py records games into a compact binary log and reads them back.
+A replay is a header (everything needed to rebuild the game at the moment recording started)
+followed by one record per action: a varint with the milliseconds since the last record,
+an action byte, then the action's arguments as zigzag varints. Most records are 2-4 bytes.
+
+Actions are recorded where the engine actually changes state (the real distance a piece moved,
+a rotation that went through, a lock) instead of raw key presses, so playing a replay back
+doesn't depend on frame timing, DAS or gravity.
+"""
+
+import time
+import zlib
+import queue
+import threading
+
+import numpy
+
+import engine, gamemodes
+
+MAGIC = b"PTRP"
+VERSION = 1
+
+# action ids, these are written to disk so don't renumber them
+SPAWN = 1
+MOVE = 2 # dx, dy that the piece actually moved
+ROTATE = 3 # amount
+MIRROR = 4
+HOLD = 5 # infinite_holds (hold_guideline)
+HOLD_PUPPY = 6
+LOCK = 7
+UNDO = 8 # amount
+RESET = 9 # seed
+GAMEMODE = 10 # gamemode class name
+RESET_GAMEMODE = 11
+SET_ROTATION = 12 # rotation (1kf sets it directly)
+END = 13 # pieces_placed, lines_cleared, board crc32, written when the recording is closed
+LOAD_POSITION = 14 # board cells (bottom rows, row by row), queue, hold (Engine.load_position)
+
+ARGUMENTS = { # "i" is a zigzag varint, "s" a length prefixed string, "l" a length prefixed list of "i"s
+    SPAWN: "", MOVE: "ii", ROTATE: "i", MIRROR: "", HOLD: "i", HOLD_PUPPY: "", LOCK: "",
+    UNDO: "i", RESET: "i", GAMEMODE: "s", RESET_GAMEMODE: "", SET_ROTATION: "i", END: "iii",
+    LOAD_POSITION: "lll",
+}
+
+def write_varint(buffer, value):
+    while value > 0x7F:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+    buffer.append(value)
+
+def read_varint(data, pos):
+    value = shift = 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+def write_int(buffer, value):
+    write_varint(buffer, value << 1 if value >= 0 else (-value << 1) - 1) # zigzag, so small negatives stay small
+
+def read_int(data, pos):
+    value, pos = read_varint(data, pos)
+    return (value >> 1) ^ -(value & 1), pos
+
+def write_string(buffer, text):
+    encoded = text.encode()
+    write_varint(buffer, len(encoded))
+    buffer += encoded
+
+def read_string(data, pos):
+    length, pos = read_varint(data, pos)
+    return bytes(data[pos:pos + length]).decode(), pos + length
+
+def write_list(buffer, items):
+    write_varint(buffer, len(items))
+    for item in items:
+        write_int(buffer, item)
+
+def read_list(data, pos):
+    length, pos = read_varint(data, pos)
+    items = []
+    for _ in range(length):
+        item, pos = read_int(data, pos)
+        items.append(item)
+    return items, pos
+
+def board_crc(game):
+    return zlib.crc32(game.game_board.tobytes())
+
+def encode_header(game):
+    buffer = bytearray(MAGIC)
+    buffer.append(VERSION)
+    write_varint(buffer, int(time.time()))
+    for value in (game.rng_seed, game.board_width, game.board_height, game.board_extra_height):
+        write_int(buffer, value)
+    write_varint(buffer, len(game.gamemode_names))
+    for name in game.gamemode_names:
+        write_string(buffer, name)
+    for value in (game.bag_count, game.pieces_placed, game.lines_cleared, game.holds_used,
+                  game.piece_x, game.piece_y, game.piece_rotation, int(game.queue_spawn_piece)):
+        write_int(buffer, value)
+    write_list(buffer, game.piece_bags[0])
+    write_list(buffer, game.piece_bags[1])
+    write_list(buffer, game.hold_pieces)
+    # the board is mostly empty, so only the filled cells get written
+    filled = numpy.flatnonzero(game.game_board).tolist()
+    write_list(buffer, filled)
+    write_list(buffer, game.game_board.flat[filled].tolist())
+    return buffer
+
+def decode_header(data):
+    if bytes(data[:4]) != MAGIC:
+        raise ValueError("not a puppytris replay")
+    if data[4] != VERSION:
+        raise ValueError(f"unsupported replay version {data[4]}")
+    header = {}
+    header["start_time"], pos = read_varint(data, 5)
+    for key in ("seed", "board_width", "board_height", "board_extra_height"):
+        header[key], pos = read_int(data, pos)
+    gamemode_count, pos = read_varint(data, pos)
+    header["gamemodes"] = []
+    for _ in range(gamemode_count):
+        name, pos = read_string(data, pos)
+        header["gamemodes"].append(name)
+    for key in ("bag_count", "pieces_placed", "lines_cleared", "holds_used", "piece_x", "piece_y", "piece_rotation", "queue_spawn_piece"):
+        header[key], pos = read_int(data, pos)
+    for key in ("next_bag", "following_bag", "hold_pieces", "filled_cells", "filled_values"):
+        header[key], pos = read_list(data, pos)
+    return header, pos
+
+def read_records(data, pos):
+    """Returns a list of (milliseconds since the start, action, args)"""
+    records = []
+    time_ms = 0
+    try:
+        while pos < len(data):
+            delta, pos = read_varint(data, pos)
+            time_ms += delta
+            action = data[pos]
+            pos += 1
+            args = []
+            for kind in ARGUMENTS[action]:
+                if kind == "s":
+                    arg, pos = read_string(data, pos)
+                elif kind == "l":
+                    arg, pos = read_list(data, pos)
+                else:
+                    arg, pos = read_int(data, pos)
+                args.append(arg)
+            records.append((time_ms, action, args))
+    except IndexError: # ran off the end of the data in the middle of a record
+        raise ValueError(f"replay is cut off after {len(records)} records")
+    return records
+
+def load(path):
+    """Returns (header, records) for a replay file"""
+    with open(path, "rb") as file:
+        data = file.read()
+    header, pos = decode_header(data)
+    return header, read_records(data, pos)
+
+def new_game(header, board_backend=None):
+    """A headless Engine in the exact state the recording started from"""
+    game = engine.Engine(board_width=header["board_width"], board_height=header["board_height"],
+                         board_extra_height=header["board_extra_height"], board_backend=board_backend, seed=header["seed"])
+    for name in header["gamemodes"]:
+        game.load_gamemode(getattr(gamemodes, name))
+    game.load_game()
+
+    board = numpy.zeros_like(game.game_board)
+    board.flat[header["filled_cells"]] = header["filled_values"]
+    game.update_game_board(board)
+    game.bag_count = header["bag_count"]
+    game.piece_bags = [header["next_bag"], header["following_bag"]]
+    game.hold_pieces = header["hold_pieces"]
+    game.holds_used = header["holds_used"]
+    game.pieces_placed = header["pieces_placed"]
+    game.lines_cleared = header["lines_cleared"]
+    game.piece_x, game.piece_y, game.piece_rotation = header["piece_x"], header["piece_y"], header["piece_rotation"]
+    game.queue_spawn_piece = bool(header["queue_spawn_piece"])
+    game.piece_board = game.piece_table.piece_boards[game.piece_bags[0][0]][game.piece_rotation]
+
+    game.game_history.reset()
+    game.update_history()
+    game.gen_next_boards()
+    game.gen_hold_boards()
+    game.update_ghost_piece()
+    return game
+
+def apply_record(game, action, args):
+    if action == SPAWN:
+        game.spawn_piece()
+    elif action == MOVE:
+        game.move_piece(args[0], args[1])
+    elif action == ROTATE:
+        game.rotate_piece(args[0])
+    elif action == MIRROR:
+        game.mirror_piece()
+    elif action == HOLD:
+        game.hold_guideline(bool(args[0]))
+    elif action == HOLD_PUPPY:
+        game.hold_puppy()
+    elif action == LOCK:
+        game.lock_piece()
+    elif action == UNDO:
+        game.undo(args[0])
+    elif action == RESET:
+        game.reset_game(args[0])
+    elif action == GAMEMODE:
+        game.load_gamemode(getattr(gamemodes, args[0]))
+    elif action == RESET_GAMEMODE:
+        game.reset_gamemode()
+    elif action == SET_ROTATION:
+        game.piece_rotation = args[0]
+    elif action == LOAD_POSITION:
+        game.load_position(args[0], args[1], args[2])
+
+class Recorder:
+    """
+    Streams one game to a replay file. Records are appended to an in-memory buffer
+    and full chunks are handed to a writer thread, so the game loop never waits on the disk.
+    """
+    def __init__(self, path, game, chunk_size=4096):
+        self.file = open(path, "wb")
+        self.chunk_size = chunk_size
+        self.buffer = encode_header(game)
+        self.last_time = time.perf_counter_ns()
+        self.chunks = queue.Queue()
+        self.writer = threading.Thread(target=self.write_chunks, daemon=True)
+        self.writer.start()
+
+    def write_chunks(self):
+        while True:
+            chunk = self.chunks.get()
+            if chunk is None:
+                break
+            self.file.write(chunk)
+        self.file.close()
+
+    def record(self, action, *args):
+        now = time.perf_counter_ns()
+        delta_ms = (now - self.last_time) // 1000000
+        self.last_time += delta_ms * 1000000 # keep the leftover so rounding doesn't drift over a long session
+        buffer = self.buffer
+        write_varint(buffer, delta_ms)
+        buffer.append(action)
+        for kind, arg in zip(ARGUMENTS[action], args):
+            if kind == "s":
+                write_string(buffer, arg)
+            elif kind == "l":
+                write_list(buffer, arg)
+            else:
+                write_int(buffer, arg)
+        if len(buffer) >= self.chunk_size:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.chunks.put(bytes(self.buffer))
+            self.buffer = bytearray()
+
+    def close(self, game):
+        """Writes the END record with the final stats so replays can be checked, then waits for the writer"""
+        self.record(END, game.pieces_placed, game.lines_cleared, board_crc(game))
+        self.flush()
+        self.chunks.put(None)
+        self.writer.join()
@@ -0,0 +1,91 @@
+"""
+replay_verify.py plays replays back headless, as fast as the CPU allows, and checks that
+the final board, lines and pieces placed match the END record written when they were recorded.
+Used to validate leaderboard submissions and to catch engine changes that break old replays.
+
+    python replay_verify.py replays/                  every .ptr file in a folder
+    python replay_verify.py a.ptr b.ptr -j 8          8 worker processes (default is one per cpu)
+"""
+
+import os
+import sys
+import time
+import argparse
+import functools
+import multiprocessing
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import replay
+
+def find_replays(paths):
+    found = []
+    for path in paths:
+        if os.path.isdir(path):
+            for root, dirs, files in os.walk(path):
+                found.extend(os.path.join(root, name) for name in sorted(files) if name.endswith(".ptr"))
+        else:
+            found.append(path)
+    return found
+
+def verify_replay(path, board_backend=None):
+    """Returns (path, ok, placements, message). placements counts every lock, including ones that got undone."""
+    try:
+        header, records = replay.load(path)
+        game = replay.new_game(header, board_backend)
+        placements = 0
+        for time_ms, action, args in records:
+            if action == replay.END:
+                result = [game.pieces_placed, game.lines_cleared, replay.board_crc(game)]
+                if result != args:
+                    return path, False, placements, f"expected pieces/lines/crc {args}, got {result}"
+                return path, True, placements, ""
+            if action == replay.LOCK:
+                placements += 1
+            replay.apply_record(game, action, args)
+        return path, False, placements, "no END record (the recording never got closed)"
+    except Exception as error: # a broken file shouldn't take the whole run down with it
+        return path, False, 0, f"{type(error).__name__}: {error}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Re-simulate puppytris replays and check their results.")
+    parser.add_argument("paths", nargs="+", help="replay files or folders of them")
+    parser.add_argument("-j", "--processes", type=int, default=os.cpu_count(), help="worker processes (1 runs in this process)")
+    parser.add_argument("--backend", choices=("BITBOARD", "ARRAY"), default=None, help="board backend to simulate with")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print failures and the summary")
+    options = parser.parse_args(argv)
+
+    paths = find_replays(options.paths)
+    if not paths:
+        print("no replays found")
+        return 1
+
+    verify = functools.partial(verify_replay, board_backend=options.backend)
+    failed = placements = 0
+    start = time.perf_counter()
+    if options.processes == 1:
+        results = map(verify, paths)
+        pool = None
+    else:
+        pool = multiprocessing.Pool(options.processes)
+        chunksize = max(1, len(paths) // (options.processes * 8)) # big enough to cut down on ipc, small enough to keep every worker busy
+        results = pool.imap_unordered(verify, paths, chunksize)
+
+    for path, ok, replay_placements, message in results:
+        placements += replay_placements
+        if not ok:
+            failed += 1
+            print(f"FAIL {path}: {message}")
+        elif not options.quiet:
+            print(f"ok   {path}")
+    elapsed = time.perf_counter() - start
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    print(f"{len(paths) - failed}/{len(paths)} replays ok in {elapsed:.2f}s  "
+          f"{len(paths) / elapsed:,.1f} replays/s  {placements / elapsed:,.0f} placements/s")
+    return 1 if failed else 0
+
+if __name__ == "__main__":
+    sys.exit(main())
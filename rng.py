@@ -0,0 +1,44 @@
+"""
+rng.py is the random number generator every game owns for itself (instead of the global random module).
+It's splitmix64, so the whole state is one 64 bit int, and bag N gets its own generator derived from
+the game seed and N. That means any bag can be regenerated straight from the seed, and history/replays
+only need to remember the seed and how many bags were made, not a Mersenne Twister snapshot.
+"""
+
+import os
+
+MASK64 = (1 << 64) - 1
+GOLDEN_GAMMA = 0x9E3779B97F4A7C15
+
+def mix(z):
+    """splitmix64 finalizer, turns an int into a well scrambled 64 bit int"""
+    z &= MASK64
+    z = ((z ^ (z >> 30)) * 0xBF58476D1CE4E5B9) & MASK64
+    z = ((z ^ (z >> 27)) * 0x94D049BB133111EB) & MASK64
+    return z ^ (z >> 31)
+
+def new_seed():
+    return int.from_bytes(os.urandom(8), "little")
+
+class Rng:
+    __slots__ = ("state",)
+
+    def __init__(self, seed):
+        self.state = seed & MASK64
+
+    def next(self):
+        self.state = (self.state + GOLDEN_GAMMA) & MASK64
+        return mix(self.state)
+
+    def randint(self, low, high):
+        """Same as random.randint, both ends included"""
+        return low + ((self.next() * (high - low + 1)) >> 64) # multiply-shift instead of % to avoid the bias
+
+    def shuffle(self, items):
+        for i in range(len(items) - 1, 0, -1): # fisher-yates
+            j = self.randint(0, i)
+            items[i], items[j] = items[j], items[i]
+
+def for_bag(seed, bag_number):
+    """The generator for one bag, it only depends on the seed and which bag it is"""
+    return Rng(mix(seed ^ mix(bag_number * GOLDEN_GAMMA)))
@@ -0,0 +1,364 @@
+"""
+rollout.py is the analysis mode: for the current position it tries every move for the current piece (and hold),
+then plays each one out a lot of times against random futures with a quick greedy policy, and reports how often
+the game survives and how many lines it gets. It's for looking back at a hard spot in Classic or BetterArcade and
+seeing which moves actually hold up, not just which one looks tidiest.
+
+    python rollout.py replays/2025-01-01_12-00-00.ptr                    the position before the last lock
+    python rollout.py replays/2025-01-01_12-00-00.ptr --lock 57          the position before lock number 57
+    python rollout.py --gamemode Classic --seed 3 --pieces 40            the bot plays 40 pieces, then analyse
+    python rollout.py ... --playouts 256 --horizon 20 -j 8
+
+Every playout is one game of a vecenv.VecEnv, so all (moves x playouts) of them step together as arrays, with no
+Engine copies. The pieces that can be seen (the next queue and hold) are the same in every playout, and the rest
+is random: for "BAG" the unseen pieces of the bags already made get shuffled (a player counting the bag knows
+what's left, just not the order) and the bags after that come from random seeds, the other randomizers get new
+bags from Engine.generate_bag with random seeds. The playouts are split over a pool of processes.
+"""
+
+import os
+import sys
+import argparse
+import multiprocessing
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import numpy
+
+import engine, gamemodes, bot, placements, replay, search, vecenv
+
+PLAYOUTS = 128 # per move
+HORIZON = 12 # pieces every playout plays after the move, a game that's still alive after that survived
+
+ANALYSING_LINES = ["analysing..."] # PositionAnalysis.lines while the playouts are still going
+
+_move_tables_cache = {} # (id(piece_table), width) -> {piece: MoveTable}, shared between envs
+
+class MoveTable:
+    """
+    Every legal (x, rotation) hard drop of one piece, with the VecEnv tables for each one lined up.
+    Everything is (box column, move) so that in greedy_moves the sums over the box are over the first axis,
+    which numpy does a lot faster than over a last axis only 4 or 5 long.
+    """
+    def __init__(self, env, piece):
+        pad, width = env.pad, env.board_width
+        self.xs, self.rotations = [], []
+        for rotation in range(4):
+            shape = piece * 4 + rotation
+            for x in range(env.min_x[shape], env.max_x[shape] + 1):
+                self.xs.append(x)
+                self.rotations.append(rotation)
+        self.xs, self.rotations = numpy.array(self.xs), numpy.array(self.rotations)
+        shapes = piece * 4 + self.rotations
+        self.box = ((self.xs + pad)[:, None] + numpy.arange(pad)).T # columns of column_tops under the piece box
+        # int16 like the column tops in greedy_moves, they're all small numbers and it's half the memory to go through
+        self.drops = env.drop_rows[shapes].T.astype(numpy.int16)[:, :, None]
+        self.top_rows = env.top_rows[shapes].T.astype(numpy.int16)[:, :, None]
+        self.has_cells = self.drops > -vecenv.EMPTY
+        self.column_counts = self.has_cells.sum(axis=0, dtype=numpy.int16) # columns of the box the piece is in
+        self.highest_row = env.highest_row[shapes].astype(numpy.int16)[:, None]
+        row_cells = numpy.zeros((pad, len(shapes)), dtype=numpy.int16) # cells of the piece in every row of the box
+        for move, rotation in enumerate(self.rotations):
+            for row, col in env.piece_table.minos[piece][rotation]:
+                row_cells[row, move] += 1
+        self.row_cells, self.has_row_cells = row_cells[:, :, None], row_cells[:, :, None] > 0
+        self.box_rows = numpy.arange(pad, dtype=numpy.int16)[:, None, None]
+        self.window = self.box[:1] - 1 + numpy.arange(pad + 2)[:, None] # the box and a column either side, x >= min_x keeps it on column_tops
+        on_board = (self.window >= pad) & (self.window < pad + width)
+        self.pairs = (on_board[:-1] & on_board[1:])[:, :, None] # bumpiness only counts between two real columns
+
+def move_tables(env):
+    key = id(env.piece_table), env.board_width
+    if key not in _move_tables_cache:
+        _move_tables_cache[key] = {piece: MoveTable(env, piece) for piece in range(1, env.piece_table.piece_types + 1)}
+    return _move_tables_cache[key]
+
+def greedy_moves(env, weights):
+    """
+    (x, rotation) for every game of env: the hard drop (no hold, no tucks) with the best score, using only
+    the column tops and row counts, so every move of every game with the same piece gets scored as one batch.
+    The features are worked out from what the drop changes: height added (minus the cleared rows), holes
+    left under the piece, lines, and how the bumpiness around the piece changed.
+    """
+    width, height = env.board_width, env.board_height
+    current = env.current_pieces()
+    filled_counts = numpy.count_nonzero(env.boards, axis=2).astype(numpy.int16)
+    all_tops = env.column_tops.astype(numpy.int16)
+    xs, rotations = numpy.zeros(env.num_envs, dtype=numpy.intp), numpy.zeros(env.num_envs, dtype=numpy.intp)
+    for piece in numpy.unique(current).tolist():
+        envs = numpy.flatnonzero(current == piece)
+        table = move_tables(env)[piece]
+        column_tops = numpy.ascontiguousarray(all_tops[envs].T) # (column, game)
+        tops = column_tops[table.box] # (box column, move, game)
+        gaps = tops - table.drops # rows between the bottom of the piece and the stack, in every column of the box
+        y = gaps.min(axis=0)
+        new_tops = numpy.minimum(tops, y + table.top_rows)
+        added = (tops - new_tops).sum(axis=0)
+        holes = (gaps * table.has_cells).sum(axis=0) - y * table.column_counts
+
+        rows = numpy.clip(y + table.box_rows, 0, height - 1)
+        filled = numpy.ascontiguousarray(filled_counts[envs].T)[rows, numpy.arange(len(envs))]
+        lines = ((filled + table.row_cells == width) & table.has_row_cells).sum(axis=0)
+
+        old_window = column_tops[table.window]
+        new_window = old_window.copy()
+        new_window[1:-1] = new_tops
+        bumpiness = ((numpy.abs(numpy.diff(new_window, axis=0)) - numpy.abs(numpy.diff(old_window, axis=0))) * table.pairs).sum(axis=0)
+
+        scores = (weights["height"] * (added - lines * width) + weights["lines"] * lines
+                  + weights["holes"] * holes + weights["bumpiness"] * bumpiness)
+        scores[y + table.highest_row < 0] = -numpy.inf # sticks out above the board
+        best = numpy.argmax(scores, axis=0)
+        xs[envs], rotations[envs] = table.xs[best], table.rotations[best]
+    return xs, rotations
+
+def position(game):
+    """
+    Everything the playouts need to know about game's position, as plain data a worker can take:
+    every move for the current piece, the boards they leave, the pieces a player can see and the ones they can't.
+    """
+    candidates = placements.find_placements(game, with_paths=False)
+    held = len(candidates)
+    candidates += bot.hold_placements(game, with_paths=False)
+    columns, lines = bot.result_columns(game, candidates) if candidates else (numpy.zeros((0, game.board_width), dtype=numpy.uint64), numpy.zeros(0))
+    boards = numpy.array([search.columns_board(board, game.board_height) for board in columns], dtype=numpy.int8).reshape(-1, game.board_height, game.board_width)
+
+    queue = game.piece_bags[0] + game.piece_bags[1]
+    seen = 1 + game.next_queue_size # the current piece and the previews
+    hold = game.hold_pieces[0] if game.hold_pieces else 0
+    knowns, holds = [], []
+    for index in range(len(candidates)):
+        if index < held:
+            knowns.append(queue[1:seen])
+            holds.append(hold)
+        else: # held first, the current piece went to hold, and into an empty hold the next piece got played
+            knowns.append(queue[1:seen] if hold else queue[2:seen])
+            holds.append(queue[0])
+    return {
+        "modes": list(game.gamemode_names),
+        "size": (game.board_width, game.board_height, game.board_extra_height),
+        "gen_type": game.piece_gen_type,
+        "bag_count": game.bag_count,
+        "last_bag": list(game.piece_bags[1]),
+        "moves": [(index >= held, candidate[:4]) for index, candidate in enumerate(candidates)],
+        "lines": lines.tolist(),
+        "boards": boards,
+        "holds": holds,
+        "knowns": knowns,
+        "unseen": [game.piece_bags[0][seen:], game.piece_bags[1][max(0, seen - len(game.piece_bags[0])):]], # what's left of each bag, by bag
+    }
+
+def run_playouts(job):
+    """
+    Plays playouts games for every move of a position, horizon pieces each. Returns (survived, lines), the
+    number of games per move that didn't top out and the lines they cleared in total (the move's own lines too).
+    """
+    state, playouts, horizon, seed, weights = job
+    moves = len(state["moves"])
+    if not moves:
+        return numpy.zeros(0, dtype=numpy.intp), numpy.zeros(0, dtype=numpy.intp)
+    width, height, extra_height = state["size"]
+    env = vecenv.VecEnv(moves * playouts, [getattr(gamemodes, name) for name in state["modes"]], width, height, extra_height, seed=seed)
+    numpy_rng = numpy.random.default_rng(seed)
+
+    # put every game in its move's position instead of the empty board reset gave it
+    env.boards[:] = numpy.repeat(state["boards"], playouts, axis=0)
+    env.clear_lines(env.envs, numpy.zeros(env.num_envs, dtype=numpy.intp)) # nothing to clear, but it sets the column tops
+    env.holds[:] = numpy.repeat(state["holds"], playouts)
+    env.queue_starts[:] = env.queue_ends[:] = 0
+    env.bag_counts[:] = state["bag_count"]
+    env.seeds[:] = numpy_rng.integers(0, 2 ** 64, env.num_envs, dtype=numpy.uint64, endpoint=False)
+    for move, known in enumerate(state["knowns"]):
+        envs = env.envs[move * playouts:(move + 1) * playouts]
+        if known:
+            env.append_queue(envs, numpy.tile(numpy.array(known, dtype=numpy.int8), (playouts, 1)))
+        for env_index in envs:
+            env.last_bags[env_index] = list(state["last_bag"]) # the generators that remember pieces carry on from the last bag made
+    if state["gen_type"] == "BAG":
+        for unseen in state["unseen"]:
+            if unseen:
+                order = numpy.argsort(numpy_rng.random((env.num_envs, len(unseen))), axis=1)
+                env.append_queue(env.envs, numpy.array(unseen, dtype=numpy.int8)[order])
+    env.fill_queues()
+
+    alive = ~env.spawn_blocked()
+    lines = numpy.repeat(numpy.array(state["lines"], dtype=numpy.intp), playouts)
+    for _ in range(horizon):
+        if not alive.any():
+            break
+        x, rotation = greedy_moves(env, weights)
+        _, step_lines, dones = env.step(x, rotation)
+        lines += step_lines * alive
+        alive &= ~dones
+    return alive.reshape(moves, playouts).sum(axis=1), lines.reshape(moves, playouts).sum(axis=1)
+
+def playout_jobs(state, playouts, horizon, seed, weights, parts):
+    """run_playouts jobs for state, the playouts split into parts jobs, each with its own seeds"""
+    shares = [playouts // parts + (worker < playouts % parts) for worker in range(parts)]
+    return [(state, share, horizon, seed * 1000003 + worker, weights) for worker, share in enumerate(shares) if share]
+
+def merge_results(state, results, playouts):
+    """The report for state from every job's run_playouts result, best first"""
+    survived = sum(result[0] for result in results)
+    lines = sum(result[1] for result in results)
+    report = []
+    for index, (use_hold, (piece, x, y, rotation)) in enumerate(state["moves"]):
+        report.append({"hold": use_hold, "piece": piece, "x": x, "y": y, "rotation": rotation,
+                       "survival": survived[index] / playouts, "lines": lines[index] / playouts})
+    report.sort(key=lambda move: (-move["survival"], -move["lines"]))
+    return report
+
+def analyze(game, playouts=PLAYOUTS, horizon=HORIZON, seed=0, weights=None, pool=None, processes=1):
+    """
+    Every move for game's current piece, with how it did in the playouts, best first:
+    [{"hold", "piece", "x", "y", "rotation", "survival" (0 to 1), "lines" (average per playout)}].
+    With a pool the playouts get split into processes jobs, each with its own seeds.
+    """
+    weights = dict(bot.WEIGHTS if weights is None else weights)
+    state = position(game)
+    jobs = playout_jobs(state, playouts, horizon, seed, weights, processes)
+    results = pool.map(run_playouts, jobs) if pool is not None else list(map(run_playouts, jobs))
+    return merge_results(state, results, playouts)
+
+class PositionAnalysis:
+    """
+    The analysis in the game (F5). start() sends the playouts for the position off to a pool of forked workers that's
+    kept for the next one, and update() is called every frame and picks the report up once it's done, so the game
+    never waits for it. Where there's no fork the playouts run in the game's process instead, a job per frame.
+    """
+    def __init__(self, processes=None, playouts=PLAYOUTS, horizon=HORIZON, rows=10):
+        self.processes = (os.cpu_count() or 1) if processes is None else processes
+        self.playouts, self.horizon, self.rows = playouts, horizon, rows
+        self.pool = None
+        self.pending = None # (state key, position, the pool's AsyncResult or [jobs left, results so far])
+        self.finished = None # (state key, report, format_report's lines)
+
+    def state_key(self, game):
+        """Changes whenever the position does, moving the piece around doesn't"""
+        return id(game), game.rng_seed, game.state_hash(), game.holds_used
+
+    def start(self, game):
+        """Starts analysing game's position, anything still running for an older one gets dropped when it finishes"""
+        if game.queue_spawn_piece:
+            return
+        if self.pool is None:
+            self.pool = search.make_pool(self.processes)
+        state = position(game)
+        weights = dict(bot.WEIGHTS)
+        if self.pool is not None:
+            jobs = playout_jobs(state, self.playouts, self.horizon, 0, weights, self.processes)
+            work = self.pool.map_async(run_playouts, jobs)
+        else:
+            work = [playout_jobs(state, self.playouts, self.horizon, 0, weights, max(1, self.playouts // 8)), []] # 8 playouts a frame
+        self.pending = self.state_key(game), state, work
+        self.finished = None
+
+    def update(self, game):
+        if self.pending is None:
+            return
+        key, state, work = self.pending
+        if isinstance(work, list):
+            jobs, results = work
+            results.append(run_playouts(jobs.pop(0)))
+            if jobs:
+                return
+        else:
+            if not work.ready():
+                return
+            results = work.get()
+        self.pending = None
+        report = merge_results(state, results, self.playouts)
+        self.finished = key, report, format_report(game, report, self.rows).split("\n")
+
+    def lines(self, game):
+        """What to show for game's position: the report's lines, a line saying it's still going, or None"""
+        key = self.state_key(game)
+        if self.finished is not None and self.finished[0] == key:
+            return self.finished[2]
+        if self.pending is not None and self.pending[0] == key:
+            return ANALYSING_LINES
+        return None
+
+    def best_move(self, game):
+        """(held first or not, piece, x, y, rotation) of the move that did best, for game's position, or None"""
+        if self.finished is None or self.finished[0] != self.state_key(game) or not self.finished[1]:
+            return None
+        move = self.finished[1][0]
+        return move["hold"], move["piece"], move["x"], move["y"], move["rotation"]
+
+    def close(self):
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
+
+def format_report(game, report, count=None):
+    lines = [f"{'move':<22} {'survival':>9} {'lines':>7}"]
+    for move in report[:count]:
+        name = game.pieces_dict.get(move["piece"], {}).get("name", str(move["piece"]))
+        description = f"{'hold ' if move['hold'] else ''}{name} x{move['x']} y{move['y']} r{move['rotation']}"
+        lines.append(f"{description:<22} {move['survival']:>9.1%} {move['lines']:>7.2f}")
+    return "\n".join(lines)
+
+def replay_position(path, lock=None):
+    """
+    A replay's game as the piece of lock number lock (counting every lock, 1 is the first, the last one by
+    default) spawned, so the analysis has every move for it and not just the ones from where it was dropped.
+    """
+    header, records = replay.load(path)
+    game = replay.new_game(header)
+    lock_indexes = [index for index, (time_ms, action, args) in enumerate(records) if action == replay.LOCK]
+    if not lock_indexes:
+        return game
+    end = lock_indexes[-1 if lock is None else max(0, min(lock, len(lock_indexes)) - 1)]
+    spawns = [index for index in range(end) if records[index][1] == replay.SPAWN]
+    for time_ms, action, args in records[:spawns[-1] + 1 if spawns else 0]:
+        replay.apply_record(game, action, args)
+    return game
+
+def bot_position(gamemode, seed, pieces_played, width, height):
+    """A game where the bot has played pieces_played pieces"""
+    game = engine.Engine(board_width=width, board_height=height, seed=seed)
+    if gamemode != "PentominoBase":
+        game.load_gamemode(gamemodes.TetraminoBase)
+    game.load_gamemode(getattr(gamemodes, gamemode))
+    game.reset_game(seed, record=False)
+    player = bot.Bot()
+    while game.pieces_placed < pieces_played and game.rng_seed == seed:
+        if game.queue_spawn_piece:
+            game.spawn_piece()
+        player.play_move(game)
+    if game.queue_spawn_piece:
+        game.spawn_piece()
+    return game
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Score every move for a position with random playouts.")
+    parser.add_argument("replay", nargs="?", help="replay file to take the position from")
+    parser.add_argument("--lock", type=int, default=None, help="analyse the position before this lock of the replay (default the last one)")
+    parser.add_argument("--gamemode", default="Classic", help="without a replay: the gamemode the bot plays to get a position")
+    parser.add_argument("--seed", type=int, default=0, help="without a replay: the game's seed, also seeds the playouts")
+    parser.add_argument("--pieces", type=int, default=30, help="without a replay: pieces the bot plays first")
+    parser.add_argument("--board", type=lambda text: tuple(int(part) for part in text.lower().split("x")), default=(10, 24), help="without a replay: WIDTHxHEIGHT")
+    parser.add_argument("--playouts", type=int, default=PLAYOUTS, help="playouts per move")
+    parser.add_argument("--horizon", type=int, default=HORIZON, help="pieces per playout")
+    parser.add_argument("--top", type=int, default=10, help="moves to print")
+    parser.add_argument("-j", "--processes", type=int, default=os.cpu_count(), help="worker processes (1 runs in this process)")
+    options = parser.parse_args(argv)
+
+    if options.replay:
+        game = replay_position(options.replay, options.lock)
+    else:
+        game = bot_position(options.gamemode, options.seed, options.pieces, *options.board)
+    if game.queue_spawn_piece:
+        game.spawn_piece()
+
+    if options.processes > 1:
+        with multiprocessing.Pool(options.processes) as pool:
+            report = analyze(game, options.playouts, options.horizon, options.seed, pool=pool, processes=options.processes)
+    else:
+        report = analyze(game, options.playouts, options.horizon, options.seed)
+    print(format_report(game, report, options.top))
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
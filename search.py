@@ -0,0 +1,366 @@
+"""
+search.py is the bot's lookahead. Instead of scoring only where the current piece can go, it plays the rest of
+the next queue (and hold) on top of every placement and keeps the best beam_width boards at every depth, so a
+move that sets up the next few pieces beats one that only looks good on its own.
+
+The search never touches the engine. A node is just a board as column bitmasks (bot.board_columns), the hold
+piece and how far into the queue it is, so making a child is a few numpy ops on a whole batch instead of copying
+an Engine. For find_placements a node's board goes into a Position, which has the same attribute names as
+Engine for the few things the placement search reads.
+
+BeamSearch does one node at a time in work(), up to a deadline, so SearchBot can either spread it over frames in
+the game's own process or split the root moves over a pool of worker processes, and always has an answer by the
+time its think_ms is up.
+"""
+
+import time
+import collections
+import multiprocessing
+
+import numpy
+
+import bot, pieces, placements, settings, timers, zobrist
+
+PIECE_TABLES = {"tetra": pieces.tetra_table, "penta": pieces.penta_table}
+MAX_CACHED_PLACEMENTS = 50000 # entries in the transposition table before it starts over
+
+_placements_cache = {} # (rules key, zobrist board hash, piece) -> find_placements, kept between moves (and per worker)
+
+# a batch of search nodes, one row each: the root move it came from, its board, the value of the lines it
+# cleared on the way (weights["lines"] times lines, added up), the hold piece (0 for none), and the queue index
+# of the piece it plays next
+Nodes = collections.namedtuple("Nodes", "roots columns values holds indexes")
+
+class Rules:
+    """The parts of a game the search needs, small enough to send to a worker process"""
+    def __init__(self, game):
+        self.board_width, self.board_height = game.board_width, game.board_height
+        self.piece_set = "penta" if game.piece_table is pieces.penta_table else "tetra"
+        self.allow_180, self.allow_mirror = game.allow_180, game.allow_mirror
+        self.piece_inversions = dict(game.piece_inversions)
+        self.spawns = {} # piece -> (x, y, rotation), same as Engine.update_starting_coords
+        for piece in range(1, game.piece_table.piece_types + 1):
+            size = game.piece_table.sizes[piece]
+            x = (game.board_width - size) // 2
+            y = game.board_extra_height - size // 5 - game.piece_table.spawn_offsets[piece] + game.spawn_y_offset
+            self.spawns[piece] = x, y, game.STARTING_ROTATION
+        self.key = self.piece_set, self.board_width, self.board_height, self.allow_180, self.allow_mirror, tuple(self.spawns.values())
+
+    @property
+    def piece_table(self):
+        return PIECE_TABLES[self.piece_set]
+
+class Position:
+    """A board with a piece at its spawn, which find_placements takes in place of a game"""
+    def __init__(self, rules, board, piece):
+        self.rules = rules
+        self.game_board = board
+        self.piece_bags = [[piece]]
+        self.piece_x, self.piece_y, self.piece_rotation = rules.spawns[piece]
+
+    def __getattr__(self, name): # everything else comes from the rules
+        return getattr(self.rules, name)
+
+def columns_board(columns, height):
+    """board_columns backwards, a (height, width) bool board"""
+    rows = numpy.arange(height, dtype=numpy.uint64)[:, None]
+    return (columns[None, :] >> rows) & numpy.uint64(1) != 0
+
+def cached_placements(rules, board, board_hash, piece):
+    """find_placements for piece on board, looked up by the board's zobrist hash first, since a lot of boards
+    come up again: in another order through hold, and again when the next move's search gets there"""
+    key = rules.key, board_hash, piece
+    if key not in _placements_cache:
+        if len(_placements_cache) >= MAX_CACHED_PLACEMENTS:
+            _placements_cache.clear()
+        _placements_cache[key] = placements.find_placements(Position(rules, board, piece), with_paths=False)
+    return _placements_cache[key]
+
+def place_candidates(rules, weights, nodes, node_index, candidates, holds, indexes):
+    """
+    Children of nodes: candidates[i] (find_placements tuples) locked on the board of nodes[node_index[i]].
+    Returns (Nodes, scores), scores being the line values so far plus how good the new board looks.
+    """
+    pieces_xyr = numpy.array([candidate[:4] for candidate in candidates], dtype=numpy.intp).reshape(-1, 4)
+    columns, lines = bot.place_pieces(rules.piece_table, nodes.columns[node_index], *pieces_xyr.T)
+    values = nodes.values[node_index] + weights.get("lines", 0) * lines
+    scores = bot.score_boards(weights, columns, 0, rules.board_height) + values # the lines are already in values
+    children = Nodes(nodes.roots[node_index], columns, values, numpy.asarray(holds, dtype=numpy.intp), numpy.asarray(indexes, dtype=numpy.intp))
+    return children, scores
+
+def best_per_root(nodes, scores):
+    """{root: best score of its nodes}"""
+    best = {}
+    for root, score in zip(nodes.roots.tolist(), scores.tolist()):
+        if score > best.get(root, -numpy.inf):
+            best[root] = score
+    return best
+
+def select_beam(nodes, scores, beam_width):
+    """The beam_width best of nodes, boards that are exactly the same (with the same hold and queue index) only once"""
+    kept, seen = [], set()
+    for index in numpy.argsort(-scores, kind="stable").tolist():
+        key = (nodes.columns[index].tobytes(), nodes.holds[index], nodes.indexes[index])
+        if key in seen:
+            continue
+        seen.add(key)
+        kept.append(index)
+        if len(kept) == beam_width:
+            break
+    return Nodes(*(field[kept] for field in nodes)), scores[kept]
+
+class BeamSearch:
+    """
+    Beam search over the queue from a batch of root nodes (the moves for the current piece, already placed).
+    Each level places one more piece on every node in the beam, either the next one in the queue or the one
+    hold would give, and keeps the best beam_width children. best_by_depth has {root: best score} for every
+    finished level, the deepest one is the answer.
+    """
+    def __init__(self, rules, weights, queue, roots, root_scores, beam_width, depth):
+        self.rules, self.weights, self.queue = rules, weights, tuple(queue)
+        self.beam_width = beam_width
+        self.depth = min(depth, len(self.queue))
+        self.best_by_depth = {1: best_per_root(roots, root_scores)} if len(roots.roots) else {}
+        self.frontier, _ = select_beam(roots, root_scores, beam_width)
+        self.node = 0
+        self.start_level()
+
+    def start_level(self):
+        self.candidates, self.node_index, self.holds, self.indexes = [], [], [], []
+        self.carried = [] # nodes that have used up the queue through hold, they go on to the next level as they are
+        self.finished = len(self.best_by_depth) >= self.depth or not len(self.frontier.roots) # every line of play can top out
+        self.hashes = [] if self.finished else zobrist.columns_hash(self.frontier.columns, self.rules.board_height).tolist()
+
+    def options(self, node):
+        """(piece, hold after, queue index after) for every piece the node can place next"""
+        queue, index, hold = self.queue, int(self.frontier.indexes[node]), int(self.frontier.holds[node])
+        options = []
+        if index < len(queue):
+            options.append((queue[index], hold, index + 1))
+            if hold and hold != queue[index]:
+                options.append((hold, queue[index], index + 1))
+            elif not hold and index + 1 < len(queue):
+                options.append((queue[index + 1], queue[index], index + 2))
+        return options
+
+    def expand(self, node):
+        """Finds every placement for node, they all get placed and scored together at the end of the level"""
+        options = self.options(node)
+        if not options:
+            self.carried.append(node)
+            return
+        board = columns_board(self.frontier.columns[node], self.rules.board_height)
+        for piece, hold, index in options:
+            candidates = cached_placements(self.rules, board, self.hashes[node], piece)
+            self.candidates += candidates
+            self.node_index += [node] * len(candidates)
+            self.holds += [hold] * len(candidates)
+            self.indexes += [index] * len(candidates)
+
+    def finish_level(self):
+        children, scores = place_candidates(self.rules, self.weights, self.frontier, numpy.array(self.node_index, dtype=numpy.intp),
+                                            self.candidates, self.holds, self.indexes)
+        if self.carried:
+            carried = Nodes(*(field[self.carried] for field in self.frontier))
+            carried_scores = bot.score_boards(self.weights, carried.columns, 0, self.rules.board_height) + carried.values
+            children = Nodes(*(numpy.concatenate(fields) for fields in zip(children, carried)))
+            scores = numpy.concatenate((scores, carried_scores))
+        if len(scores):
+            self.best_by_depth[len(self.best_by_depth) + 1] = best_per_root(children, scores)
+        self.frontier, _ = select_beam(children, scores, self.beam_width)
+        self.node = 0
+        self.start_level()
+
+    def work(self, deadline_ns=None):
+        """Expands nodes until the search is done or perf_counter_ns passes deadline_ns, returns whether it's done"""
+        while not self.finished:
+            self.expand(self.node)
+            self.node += 1
+            if self.node == len(self.frontier.roots):
+                self.finish_level()
+            if deadline_ns is not None and time.perf_counter_ns() >= deadline_ns:
+                break
+        return self.finished
+
+def root_nodes(rules, weights, columns, candidates, held, hold, queue):
+    """
+    candidates placed on the board columns as root Nodes and their scores, the first held of them are the current
+    piece's and the rest the piece hold would give
+    """
+    holds = [hold] * held + [queue[0]] * (len(candidates) - held)
+    indexes = [1] * held + [1 if hold else 2] * (len(candidates) - held) # holding into an empty hold plays the next piece
+    start = Nodes(numpy.zeros(1, dtype=numpy.intp), columns[None], numpy.zeros(1), numpy.zeros(1, dtype=numpy.intp), numpy.zeros(1, dtype=numpy.intp))
+    roots, scores = place_candidates(rules, weights, start, numpy.zeros(len(candidates), dtype=numpy.intp), candidates, holds, indexes)
+    return roots._replace(roots=numpy.arange(len(candidates))), scores
+
+def plan_move(rules, weights, board, queue, hold, depth, beam_width, can_hold=True):
+    """
+    (hold first or not, placement) the lookahead picks for queue[0] starting from its spawn, or None if it can't
+    go anywhere. For positions that aren't in an Engine (openings.py), it always searches to the end.
+    """
+    bot.check_board_height(rules.board_height)
+    board_hash = zobrist.board_hash(board)
+    candidates = list(cached_placements(rules, board, board_hash, queue[0]))
+    held = len(candidates)
+    hold_piece = hold or (queue[1] if len(queue) > 1 else 0)
+    if can_hold and hold_piece:
+        candidates += cached_placements(rules, board, board_hash, hold_piece)
+    if not candidates:
+        return None
+    roots, scores = root_nodes(rules, weights, bot.board_columns(board), candidates, held, hold, queue)
+    beam_search = BeamSearch(rules, weights, queue, roots, scores, beam_width, depth)
+    beam_search.work()
+    best = best_root([beam_search.best_by_depth])
+    return best >= held, candidates[best]
+
+def deadline_after(start_ns, ms):
+    """The perf_counter_ns ms after start_ns, or None for an infinite ms (no deadline)"""
+    return None if ms == float("inf") else start_ns + round(ms * timers.NS_PER_MS)
+
+def search_job(job):
+    """Runs a BeamSearch on a worker until it finishes or think_ms runs out, returns its best_by_depth"""
+    rules, weights, queue, roots, root_scores, beam_width, depth, think_ms = job
+    search = BeamSearch(rules, weights, queue, roots, root_scores, beam_width, depth)
+    search.work(deadline_after(time.perf_counter_ns(), think_ms))
+    return search.best_by_depth
+
+def best_root(results):
+    """The root with the best score at the deepest level every one of results (best_by_depth dicts) got to"""
+    results = [result for result in results if result]
+    if not results:
+        return None
+    depth = min(max(result) for result in results)
+    merged = {}
+    for result in results:
+        merged.update(result[depth])
+    return max(merged, key=lambda root: (merged[root], -root)) # ties go to the first root, the shortest path
+
+def make_pool(processes):
+    """A pool of forked workers, or None where there's no fork (spawned workers would run main.py all over again)"""
+    if processes <= 0 or "fork" not in multiprocessing.get_all_start_methods():
+        return None
+    return multiprocessing.get_context("fork").Pool(processes)
+
+class SearchBot(bot.Bot):
+    """
+    bot.Bot with the lookahead. think() searches ahead for the current piece, a slice of time at a time, and
+    update() plays the move once it's been decided, so the game keeps drawing frames while the bot thinks.
+    """
+    def __init__(self, weights=None, pps=None, depth=None, beam_width=None, think_ms=None, processes=None):
+        super().__init__(weights, pps)
+        self.depth = settings.BOT_LOOKAHEAD if depth is None else depth
+        self.beam_width = settings.BOT_BEAM_WIDTH if beam_width is None else beam_width
+        self.think_ms = settings.BOT_THINK_MS if think_ms is None else think_ms # float("inf") searches every move to the end
+        self.processes = settings.BOT_SEARCH_PROCESSES if processes is None else processes
+        self.pool = None
+        self.thinking = None # (state key, root moves, BeamSearch or the pool's AsyncResult, when it started)
+        self.decision = None # (state key, hold first or not, placement)
+
+    def state_key(self, game):
+        """Changes whenever the piece to decide for does (a new piece, a hold, an undo or a reset)"""
+        return id(game), game.rng_seed, game.pieces_placed, game.piece_bags[0][0], tuple(game.hold_pieces), game.holds_used
+
+    def root_moves(self, game, rules):
+        """Every move for the current piece as [(hold first or not, placement)], and those moves placed as root Nodes"""
+        candidates = placements.find_placements(game, with_paths=False)
+        held = len(candidates)
+        candidates += bot.hold_placements(game, with_paths=False)
+        queue = (game.piece_bags[0] + game.piece_bags[1])[:game.next_queue_size + 1] # only what a player can see
+        hold = game.hold_pieces[0] if game.hold_pieces else 0
+        roots, scores = root_nodes(rules, self.weights, bot.board_columns(game.game_board), candidates, held, hold, queue)
+        moves = [(index >= held, candidate) for index, candidate in enumerate(candidates)]
+        return moves, queue, roots, scores
+
+    def start_thinking(self, game):
+        bot.check_board_height(game.board_height) # the nodes are bot.board_columns boards
+        rules = Rules(game)
+        moves, queue, roots, scores = self.root_moves(game, rules)
+        if self.pool is None and self.processes > 0:
+            self.pool = make_pool(self.processes)
+        if self.pool is None:
+            search = BeamSearch(rules, self.weights, queue, roots, scores, self.beam_width, self.depth)
+        else: # every worker gets every processes-th root, best first, so they all get a fair share of the good ones
+            order = numpy.argsort(-scores, kind="stable")
+            jobs = []
+            for worker in range(self.processes):
+                part = order[worker::self.processes]
+                if len(part):
+                    jobs.append((rules, self.weights, queue, Nodes(*(field[part] for field in roots)), scores[part], self.beam_width, self.depth, self.think_ms))
+            search = self.pool.map_async(search_job, jobs)
+        self.thinking = self.state_key(game), moves, search, time.perf_counter_ns()
+
+    def think(self, game, budget_ms=None):
+        """
+        Works on the move for the current piece for up to budget_ms (or until it's decided, if None).
+        Call it once a frame, the search stops by itself once think_ms has passed since it started.
+        """
+        if game.queue_spawn_piece:
+            return
+        key = self.state_key(game)
+        if self.decision is not None and self.decision[0] == key:
+            return
+        if self.thinking is None or self.thinking[0] != key:
+            self.start_thinking(game)
+        _, moves, search, started = self.thinking
+        give_up = deadline_after(started, self.think_ms)
+        if isinstance(search, BeamSearch):
+            deadline = give_up
+            if budget_ms is not None:
+                slice_end = deadline_after(time.perf_counter_ns(), budget_ms)
+                deadline = slice_end if give_up is None else min(give_up, slice_end)
+            if not search.work(deadline) and (give_up is None or time.perf_counter_ns() < give_up):
+                return
+            best = best_root([search.best_by_depth])
+        else:
+            if budget_ms is None:
+                search.wait()
+            elif not search.ready():
+                return
+            best = best_root(search.get())
+        self.thinking = None
+        self.decision = key, *(moves[best] if best is not None else (False, None))
+
+    def choose(self, game):
+        """(hold first or not, placement tuple) for the best move, or None if the piece can't go anywhere"""
+        self.think(game)
+        _, use_hold, placement = self.decision
+        self.decision = None
+        return None if placement is None else (use_hold, placement)
+
+    def play_move(self, game):
+        """Plays the decided move, the path to it is found again from wherever the piece is now"""
+        choice = self.choose(game)
+        if choice is None:
+            game.hard_drop()
+            return
+        use_hold, (piece, x, y, rotation, path) = choice
+        if use_hold:
+            game.hold_guideline(game.infinite_holds)
+        minos = game.piece_table.minos
+        cells = {(y + row, x + col) for row, col in minos[piece][rotation]}
+        candidates = placements.find_placements(game)
+        for found_piece, found_x, found_y, found_rotation, path in candidates:
+            if {(found_y + row, found_x + col) for row, col in minos[found_piece][found_rotation]} == cells:
+                break
+        else: # gravity took the piece past it while the bot was thinking, take the best spot from where it is now
+            if not candidates:
+                game.hard_drop()
+                return
+            path = candidates[int(numpy.argmax(self.evaluate(game, candidates)))][4]
+        placements.apply_path(game, path)
+        game.hard_drop()
+
+    def update(self, game):
+        """Called every simulation tick, plays the decided move once 1 / pps seconds have passed"""
+        if game.queue_spawn_piece:
+            return
+        if not game.timers.running("bot"):
+            game.timers.start("bot")
+        if self.decision is not None and self.decision[0] == self.state_key(game) and game.timers.periods("bot", 1000 / self.pps):
+            self.play_move(game)
+
+    def close(self):
+        """Stops the worker processes, if there are any"""
+        if self.pool is not None:
+            self.pool.terminate()
+            self.pool = None
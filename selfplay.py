@@ -0,0 +1,205 @@
+"""
+selfplay.py has bot.Bot play lots of headless games on a process pool, for tuning the evaluation weights
+and load testing rule changes. Every combination of weights, gamemode, randomizer and board size gets the
+same list of seeds, so weight sets (a tournament) are compared on exactly the same pieces.
+
+    python selfplay.py                                            every gamemode, 100 games each, 10x24
+    python selfplay.py --gamemodes Guideline Classic --games 1000 --pieces 500
+    python selfplay.py --weights a.json --weights b.json          two weight sets on the same seeds
+    python selfplay.py --pps 5                                    timed games (gravity, lockdown, ARE) at 5 PPS
+    python selfplay.py --lookahead 3                              search.SearchBot playing 3 pieces ahead
+
+Games are handed out to the workers a chunk at a time from a bounded queue, and every result is written to a
+JSON lines file as soon as it comes back, so a run can be as long as you like without piling up in memory.
+Only the running totals per combination are kept, and printed as a table at the end.
+By default the bot plays as fast as it can, so pps is the pieces per cpu second one worker manages.
+With --pps the games are stepped tick by tick like main.py does, and pps is pieces per second of game time.
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import threading
+import collections
+import multiprocessing
+
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+import engine, gamemodes, settings, bot, search
+
+GAMEMODES = ["Guideline", "Classic", "BetterArcade", "Teeny", "PentominoBase"]
+GEN_TYPES = ["BAG", "RANDOM", "CLASSIC", "4MEMR6"]
+MAX_GAME_SECONDS = 3600 # timed games stop here even if they never top out (a bot that stops placing pieces)
+
+Config = collections.namedtuple("Config", "weights_name gamemode gen_type width height")
+
+def new_game(config, seed):
+    """A headless game for config, the gamemode stacked on its piece set like the menu does"""
+    game = engine.Engine(board_width=config.width, board_height=config.height, seed=seed)
+    if config.gamemode != "PentominoBase":
+        game.load_gamemode(gamemodes.TetraminoBase)
+    game.load_gamemode(getattr(gamemodes, config.gamemode))
+    if config.gen_type is not None:
+        game.piece_gen_type = config.gen_type
+    game.reset_game(seed, record=False) # regenerates the bags with the right randomizer
+    return game
+
+def play_game(job):
+    """Plays one game until it tops out or places max_pieces, returns its result as a dict"""
+    config, weights, seed, max_pieces, pps, lookahead = job
+    game = new_game(config, seed)
+    if lookahead > 1: # no time limit and no worker processes of its own, so the results don't depend on the machine
+        player = search.SearchBot(weights, pps, depth=lookahead, think_ms=float("inf"), processes=0)
+    else:
+        player = bot.Bot(weights, pps)
+    pieces = lines = 0
+    topped_out = False
+    start = time.process_time()
+    if pps is None: # as fast as possible, one move straight after the other
+        game_seconds = None
+        while pieces < max_pieces:
+            if game.queue_spawn_piece:
+                game.spawn_piece()
+            if game.rng_seed == seed: # still the same game, Engine.top_out moves on to the next seed
+                player.play_move(game)
+            if game.rng_seed != seed:
+                topped_out = True
+                break
+            pieces, lines = game.pieces_placed, game.lines_cleared
+    else: # fixed ticks like main.run_simulation, so gravity, lockdown and entry delay all count
+        keys = collections.defaultdict(bool)
+        tick_ms = 1000 / settings.SIM_TICK_RATE
+        ticks = 0
+        while pieces < max_pieces and ticks * tick_ms < MAX_GAME_SECONDS * 1000:
+            player.think(game) # decides straight away, the search takes no game time
+            player.update(game)
+            game.step(keys, tick_ms)
+            ticks += 1
+            if game.rng_seed != seed:
+                topped_out = True
+                break
+            pieces, lines = game.pieces_placed, game.lines_cleared
+        game_seconds = ticks * tick_ms / 1000
+    cpu_seconds = time.process_time() - start
+    return {"config": config._asdict(), "seed": seed, "pieces": pieces, "lines": lines, "topped_out": topped_out,
+            "cpu_seconds": cpu_seconds, "game_seconds": game_seconds}
+
+def make_jobs(configs, weight_sets, games, first_seed, max_pieces, pps, lookahead):
+    """Every game of the run, made lazily, one config after the other"""
+    for config in configs:
+        for seed in range(first_seed, first_seed + games):
+            yield config, weight_sets[config.weights_name], seed, max_pieces, pps, lookahead
+
+def bounded(jobs, slots):
+    """Hands jobs to the pool only while there's a free slot, so it doesn't queue up the whole run at once"""
+    for job in jobs:
+        slots.acquire()
+        yield job
+
+class Totals:
+    """Running totals for one config"""
+    def __init__(self):
+        self.games = self.pieces = self.lines = self.topouts = 0
+        self.cpu_seconds = self.game_seconds = 0
+
+    def add(self, result):
+        self.games += 1
+        self.pieces += result["pieces"]
+        self.lines += result["lines"]
+        self.topouts += result["topped_out"]
+        self.cpu_seconds += result["cpu_seconds"]
+        self.game_seconds += result["game_seconds"] or 0
+
+    def summary(self):
+        return {
+            "games": self.games,
+            "lines_per_game": self.lines / self.games,
+            "lines_per_piece": self.lines / max(1, self.pieces),
+            "topout_rate": self.topouts / self.games,
+            "pps": self.pieces / (self.game_seconds or self.cpu_seconds or 1),
+            "placements_per_second": self.pieces / (self.cpu_seconds or 1), # per worker
+        }
+
+def load_weights(paths):
+    """{name: weights} from json files ({feature: weight}), or just the bot's defaults"""
+    if not paths:
+        return {"default": dict(bot.WEIGHTS)}
+    weight_sets = {}
+    for path in paths:
+        name = os.path.splitext(os.path.basename(path))[0]
+        if name in weight_sets: # same file name from another folder
+            name = f"{name}#{len(weight_sets)}"
+        with open(path) as file:
+            weight_sets[name] = json.load(file)
+    return weight_sets
+
+def parse_board(text):
+    width, height = text.lower().split("x")
+    return int(width), int(height)
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run bot self-play games in parallel and aggregate the results.")
+    parser.add_argument("--gamemodes", nargs="+", choices=GAMEMODES, default=GAMEMODES)
+    parser.add_argument("--gen-types", nargs="+", choices=GEN_TYPES, default=[None], help="randomizers to override the gamemode's with")
+    parser.add_argument("--boards", nargs="+", type=parse_board, default=[(10, 24)], help="board sizes as WIDTHxHEIGHT (height includes the extra rows)")
+    parser.add_argument("--weights", action="append", default=[], help="json file of bot weights, repeat it to play a tournament")
+    parser.add_argument("--games", type=int, default=100, help="games per combination")
+    parser.add_argument("--pieces", type=int, default=1000, help="games stop after this many pieces if they haven't topped out")
+    parser.add_argument("--pps", type=float, default=None, help="step games in real ticks with the bot at this speed")
+    parser.add_argument("--lookahead", type=int, default=1, help="pieces the bot plays ahead with search.SearchBot (1 is the plain bot)")
+    parser.add_argument("--seed", type=int, default=0, help="first seed, every combination plays seed..seed+games-1")
+    parser.add_argument("-j", "--processes", type=int, default=os.cpu_count(), help="worker processes (1 runs in this process)")
+    parser.add_argument("--chunksize", type=int, default=4, help="games handed to a worker at a time")
+    parser.add_argument("--out", default=None, help="json lines file for the results (default selfplay_results/<date>.jsonl)")
+    parser.add_argument("-q", "--quiet", action="store_true", help="only print the summary")
+    options = parser.parse_args(argv)
+
+    weight_sets = load_weights(options.weights)
+    configs = [Config(weights_name, gamemode, gen_type, *board)
+               for weights_name, gamemode, gen_type, board in itertools.product(weight_sets, options.gamemodes, options.gen_types, options.boards)]
+    jobs = make_jobs(configs, weight_sets, options.games, options.seed, options.pieces, options.pps, options.lookahead)
+    total_games = len(configs) * options.games
+
+    out_path = options.out or os.path.join(engine.script_dir, "selfplay_results", time.strftime("%Y-%m-%d_%H-%M-%S") + ".jsonl")
+    os.makedirs(os.path.dirname(os.path.abspath(out_path)), exist_ok=True)
+    totals = {config: Totals() for config in configs}
+    start = time.perf_counter()
+    if options.processes == 1:
+        slots = None
+        results = map(play_game, jobs)
+        pool = None
+    else:
+        slots = threading.Semaphore(options.processes * options.chunksize * 4) # a few chunks in flight per worker
+        pool = multiprocessing.Pool(options.processes)
+        results = pool.imap_unordered(play_game, bounded(jobs, slots), options.chunksize)
+
+    with open(out_path, "w") as out_file:
+        for done, result in enumerate(results, 1):
+            if slots is not None:
+                slots.release()
+            out_file.write(json.dumps(result) + "\n")
+            totals[Config(**result["config"])].add(result)
+            if not options.quiet and (done % 100 == 0 or done == total_games):
+                print(f"{done}/{total_games} games  {time.perf_counter() - start:.1f}s", flush=True)
+        for config, config_totals in totals.items():
+            out_file.write(json.dumps({"config": config._asdict(), "summary": config_totals.summary()}) + "\n")
+    elapsed = time.perf_counter() - start
+    if pool is not None:
+        pool.close()
+        pool.join()
+
+    print(f"\n{'weights':<12} {'gamemode':<14} {'gen type':<8} {'board':<7} {'games':>6} {'lines/game':>11} {'lines/piece':>12} {'topouts':>8} {'pps':>8} {'placements/s':>13}")
+    for config, config_totals in totals.items():
+        summary = config_totals.summary()
+        print(f"{config.weights_name:<12} {config.gamemode:<14} {config.gen_type or '-':<8} {config.width}x{config.height:<4} {summary['games']:>6} "
+              f"{summary['lines_per_game']:>11.1f} {summary['lines_per_piece']:>12.3f} {summary['topout_rate']:>8.1%} "
+              f"{summary['pps']:>8.1f} {summary['placements_per_second']:>13,.0f}")
+    placements = sum(config_totals.pieces for config_totals in totals.values())
+    print(f"{total_games} games in {elapsed:.2f}s  {placements / elapsed:,.0f} placements/s over {options.processes} processes, results in {out_path}")
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,62 @@
+"""
+timers.py is the one clock all of a game's timers run on (DAS, ARR, soft drop, gravity, lockdown...).
+Each timer is just a name and the nanosecond it started at, so nothing ever has to tick or busy wait,
+and everything is integer nanoseconds so DAS/ARR leftovers carry over exactly instead of drifting.
+
+The clock starts at time.perf_counter_ns() but only moves when advance() is called, which Engine.step
+does once per simulation tick. main.py keeps it within a tick of the real perf_counter_ns.
+"""
+
+import time
+
+NS_PER_MS = 1000000
+
+class TimerService:
+    def __init__(self):
+        self.now = time.perf_counter_ns()
+        self.starts = {} # timer name -> self.now when it was started
+
+    def advance(self, ns):
+        self.now += ns
+
+    def skip(self, ns):
+        """Move the clock forward without any running timer seeing the time pass (used for pausing)"""
+        self.now += ns
+        for name in self.starts:
+            self.starts[name] += ns
+
+    def start(self, name, at=None):
+        """(Re)start a timer now, or at an earlier time so it picks up where a deadline left off"""
+        self.starts[name] = self.now if at is None else at
+
+    def stop(self, name):
+        self.starts.pop(name, None)
+
+    def stop_all(self):
+        self.starts.clear()
+
+    def running(self, name):
+        return name in self.starts
+
+    def expired(self, name, delay_ms):
+        """True once delay_ms has passed since the timer started"""
+        return name in self.starts and self.now - self.starts[name] >= delay_ms * NS_PER_MS
+
+    def deadline(self, name, delay_ms):
+        """The exact ns a timer expires at, to chain the next timer off it instead of off the tick it got noticed on"""
+        return self.starts[name] + round(delay_ms * NS_PER_MS)
+
+    def periods(self, name, period_ms):
+        """
+        How many whole periods passed since the timer started (or since the last call).
+        The timer moves forward by that many periods, so the leftover counts towards the next one.
+        """
+        period_ns = round(period_ms * NS_PER_MS)
+        count = (self.now - self.starts[name]) // period_ns
+        self.starts[name] += count * period_ns
+        return count
+
+    def postpone(self, name, ms):
+        """Push a running timer back, to hold it still while something else has priority"""
+        if name in self.starts:
+            self.starts[name] += round(ms * NS_PER_MS)
@@ -41,6 +41,59 @@ def draw_fps(fps):
               cut_corners=['top-right'], cut_size=10, outline_color=settings.PANEL_OUTLINE)
     MAIN_SCREEN.blit(fps_cache[fps], (10, settings.WINDOW_HEIGHT-30))
 
+profiler_font = pygame.font.SysFont("monospace", 14)
+profiler_cache = {"summary": None, "rows": []}
+PROFILER_WIDTH = 360
+PROFILER_ROW_HEIGHT = 16
+PROFILER_GRAPH_HEIGHT = 80
+PROFILER_GRAPH_MS = 33.3 # frame time at the top of the graph
+
+def draw_profiler(profiler):
+    """Overlay in the top right with p50/p99/max for every stage and a graph of recent frame times"""
+    summary = profiler.summary()
+    if summary is not profiler_cache["summary"]: # only re-render the text when the summary actually got recalculated
+        rows = [profiler_font.render(f"{'stage':<22}{'p50':>7}{'p99':>7}{'max':>7}", True, settings.TEXT_COLOR)]
+        for stage, (p50, p99, peak) in summary.items():
+            rows.append(profiler_font.render(f"{stage[:21]:<22}{p50:7.2f}{p99:7.2f}{peak:7.2f}", True, settings.TEXT_COLOR))
+        profiler_cache["summary"] = summary
+        profiler_cache["rows"] = rows
+    rows = profiler_cache["rows"]
+
+    x = settings.WINDOW_WIDTH - PROFILER_WIDTH - 10
+    y = 10
+    height = len(rows) * PROFILER_ROW_HEIGHT + PROFILER_GRAPH_HEIGHT + 20
+    pygame.draw.rect(MAIN_SCREEN, settings.BOARD_COLOR[:3], (x, y, PROFILER_WIDTH, height)) # solid, so it doesn't need the alpha surface draw_rect makes
+    for i, row in enumerate(rows):
+        MAIN_SCREEN.blit(row, (x + 6, y + 5 + i * PROFILER_ROW_HEIGHT))
+
+    # frame time graph, newest frame on the right, one px per frame
+    graph_x = x + 6
+    graph_y = y + height - PROFILER_GRAPH_HEIGHT - 6
+    graph_width = PROFILER_WIDTH - 12
+    scale = PROFILER_GRAPH_HEIGHT / PROFILER_GRAPH_MS
+    frame_times = profiler.samples("frame")[-graph_width:]
+    offset = graph_width - len(frame_times)
+    for i, frame_time in enumerate(frame_times):
+        bar = min(PROFILER_GRAPH_HEIGHT, int(frame_time / 1e6 * scale))
+        MAIN_SCREEN.fill(settings.TEXT_COLOR[:3], (graph_x + offset + i, graph_y + PROFILER_GRAPH_HEIGHT - bar, 1, bar))
+    target = min(PROFILER_GRAPH_HEIGHT, int(1000 / settings.MAX_FRAMERATE * scale))
+    pygame.draw.line(MAIN_SCREEN, (255, 80, 80), (graph_x, graph_y + PROFILER_GRAPH_HEIGHT - target),
+                     (graph_x + graph_width, graph_y + PROFILER_GRAPH_HEIGHT - target))
+
+analysis_cache = {"lines": None, "rows": []}
+
+def draw_analysis(lines):
+    """Overlay in the top left with the F5 rollout analysis, rollout.PositionAnalysis.lines"""
+    if lines is not analysis_cache["lines"]: # a new report, render it once
+        analysis_cache["rows"] = [profiler_font.render(line, True, settings.TEXT_COLOR) for line in lines]
+        analysis_cache["lines"] = lines
+    rows = analysis_cache["rows"]
+    x, y = 10, 10
+    width = max(row.get_width() for row in rows) + 12
+    pygame.draw.rect(MAIN_SCREEN, settings.BOARD_COLOR[:3], (x, y, width, len(rows) * PROFILER_ROW_HEIGHT + 10))
+    for i, row in enumerate(rows):
+        MAIN_SCREEN.blit(row, (x + 6, y + 5 + i * PROFILER_ROW_HEIGHT))
+
 def draw_rect(x, y, width, height, color=(200, 200, 200, 255),
               cut_corners=None, cut_size=10, outline_color=None):
     """
@@ -113,32 +166,32 @@ def draw_board():
     cell_size = settings.CELL_SIZE
     grid_start_x = BOARD_PX_OFFSET_X
     grid_start_y = BOARD_PX_OFFSET_Y - (settings.BOARD_EXTRA_HEIGHT * settings.CELL_SIZE)
-    board_rows = engine.game_board.shape[0]
-    board_cols = engine.game_board.shape[1]
+    board_rows = engine.game.game_board.shape[0]
+    board_cols = engine.game.game_board.shape[1]
 
     for row in range(board_rows):
         for col in range(board_cols):
-            if engine.game_board[row, col] != 0:
+            if engine.game.game_board[row, col] != 0:
                 x = grid_start_x + col * cell_size
                 y = grid_start_y + row * cell_size
-                BOARD_SURFACE.blit(engine.pieces_dict[engine.game_board[row, col]]["skin"], (x, y))
+                BOARD_SURFACE.blit(engine.game.pieces_dict[engine.game.game_board[row, col]]["skin"], (x, y))
 
 def draw_piece_board():
     """
     Draw the current piece, which is a small board layered on top of the regular board
     """
     cell_size= settings.CELL_SIZE
-    grid_start_x = BOARD_PX_OFFSET_X + (engine.piece_x * cell_size)
-    grid_start_y = BOARD_PX_OFFSET_Y + (engine.piece_y * cell_size)  - (settings.BOARD_EXTRA_HEIGHT * settings.CELL_SIZE)
-    total_rows = engine.piece_board.shape[0]
-    total_cols = engine.piece_board.shape[1]
+    grid_start_x = BOARD_PX_OFFSET_X + (engine.game.piece_x * cell_size)
+    grid_start_y = BOARD_PX_OFFSET_Y + (engine.game.piece_y * cell_size)  - (settings.BOARD_EXTRA_HEIGHT * settings.CELL_SIZE)
+    total_rows = engine.game.piece_board.shape[0]
+    total_cols = engine.game.piece_board.shape[1]
 
     for row in range(total_rows):
         for col in range(total_cols):
-            if engine.piece_board[row, col] != 0:
+            if engine.game.piece_board[row, col] != 0:
                 x = grid_start_x + col * cell_size
                 y = grid_start_y + row * cell_size
-                MAIN_SCREEN.blit(engine.pieces_dict[engine.piece_board[row, col]]["skin"], (x, y))
+                MAIN_SCREEN.blit(engine.game.pieces_dict[engine.game.piece_board[row, col]]["skin"], (x, y))
 
 def draw_board_background(cut_size=None):
     """Draw board background with top-left & top-right cut by `cut_size`.
@@ -214,10 +267,10 @@ def draw_grid_lines():
 
 def draw_ghost_board():
     """Draw the top-out piece directly on the main board, aligned to the grid, shifted up/right 1 cell."""
-    if not hasattr(engine, "ghost_board") or engine.ghost_board is None:
+    if not hasattr(engine.game, "ghost_board") or engine.game.ghost_board is None:
         return
 
-    board = engine.ghost_board
+    board = engine.game.ghost_board
     cell_size= settings.CELL_SIZE
     board_rows, board_cols = board.shape
 
@@ -226,8 +279,8 @@ def draw_ghost_board():
     grid_start_y = BOARD_PX_OFFSET_Y - (settings.BOARD_EXTRA_HEIGHT * settings.CELL_SIZE)
 
     # Compute horizontal alignment in board cells
-    start_col = engine.ghost_piece_x # piece_starting x is the regular piece offset
-    start_row = engine.ghost_piece_y  # shift up 1 cell (negative y)
+    start_col = engine.game.ghost_piece_x # piece_starting x is the regular piece offset
+    start_row = engine.game.ghost_piece_y  # shift up 1 cell (negative y)
 
     # Draw each block aligned to main board's grid
     for row in range(board_rows):
@@ -238,12 +291,32 @@ def draw_ghost_board():
                 y = grid_start_y + (start_row + row) * cell_size
                 MAIN_SCREEN.blit(skin, (x, y))
 
+hint_skins = {} # piece skin -> see-through copy for the move hints
+
+def draw_move_hints(moves):
+    """Draw where the hints (the F5 analysis, pcsolver's perfect clear, the openings book or combo.py) put the next piece, see-through in the piece's own skin."""
+    cell_size = settings.CELL_SIZE
+
+    # Main board top-left (include extra hidden rows if any), same as the ghost
+    grid_start_x = BOARD_PX_OFFSET_X
+    grid_start_y = BOARD_PX_OFFSET_Y - (settings.BOARD_EXTRA_HEIGHT * settings.CELL_SIZE)
+
+    for held, piece_id, piece_x, piece_y, rotation in moves:
+        skin = engine.game.pieces_dict[piece_id]["skin"]
+        if skin not in hint_skins:
+            hint_skins[skin] = skin.copy()
+            hint_skins[skin].set_alpha(settings.PC_HINT_ALPHA)
+        for row, col in engine.game.piece_table.minos[piece_id][rotation]:
+            x = grid_start_x + (piece_x + col) * cell_size
+            y = grid_start_y + (piece_y + row) * cell_size
+            MAIN_SCREEN.blit(hint_skins[skin], (x, y))
+
 def draw_topout_board():
     """Draw the top-out piece directly on the main board, aligned to the grid, shifted up/right 1 cell."""
-    if not hasattr(engine, "topout_board") or engine.topout_board is None:
+    if not hasattr(engine.game, "topout_board") or engine.game.topout_board is None:
         return
 
-    board = engine.topout_board
+    board = engine.game.topout_board
     cell_size= settings.CELL_SIZE
     board_rows, board_cols = board.shape
 
@@ -252,12 +325,11 @@ def draw_topout_board():
     grid_start_y = BOARD_PX_OFFSET_Y
     
     # Calculate the piece spawning offset (code copied from engine.py)
-    next_piece = (engine.piece_bags[0] + engine.piece_bags[1])[1]
-    piece_shape = engine.pieces_dict[next_piece]["shapes"][engine.STARTING_ROTATION]
-    piece_width = piece_shape.shape[1]
-    height_offset = numpy.where(numpy.any(piece_shape != 0, axis=1))[0][0]
+    next_piece = (engine.game.piece_bags[0] + engine.game.piece_bags[1])[1]
+    piece_width = engine.game.piece_table.sizes[next_piece]
+    height_offset = engine.game.piece_table.spawn_offsets[next_piece]
     start_col = (settings.BOARD_WIDTH - piece_width) // 2 # dynamically calculate starting position based on board and piece size.
-    start_row = piece_width//5 - height_offset + engine.spawn_y_offset # need to subtract the blank space in the piece here.
+    start_row = piece_width//5 - height_offset + engine.game.spawn_y_offset # need to subtract the blank space in the piece here.
 
     # Draw each block aligned to main board's grid
     for row in range(board_rows):
@@ -279,12 +351,12 @@ def draw_next_panel():
     board_width_px = BOARD_WIDTH_PX
     board_height_px = settings.CELL_SIZE * settings.BOARD_MAIN_HEIGHT
 
-    next_width = int(cell_size_scaled * (engine.mino_count + 1))
+    next_width = int(cell_size_scaled * (engine.game.mino_count + 1))
 
     next_height_per_piece = cell_size_scaled * 3
     next_height_top = cell_size_scaled * 1
-    # next_height = (next_height_per_piece * engine.next_queue_size) + next_height_top
-    next_height = (len(engine.next_boards) * cell_size_scaled * engine.mino_count) + next_height_top
+    # next_height = (next_height_per_piece * engine.game.next_queue_size) + next_height_top
+    next_height = (len(engine.game.next_boards) * cell_size_scaled * engine.game.mino_count) + next_height_top
     panel_color = settings.PANEL_COLOR
 
     too_big = False
@@ -332,9 +404,9 @@ def draw_next_panel():
     MAIN_SCREEN.blit(text_surface, text_rect)
 
     # --- Draw next pieces ---
-    if hasattr(engine, "next_boards") and engine.next_boards is not None:
+    if hasattr(engine.game, "next_boards") and engine.game.next_boards is not None:
         spacing = cell_size_scaled * -1 # space between stacked pieces (1 next cell)
-        for i, board in enumerate(engine.next_boards):
+        for i, board in enumerate(engine.game.next_boards):
             board_rows, board_cols = board.shape
 
             # x/y of the top-left of this board area (stacked)
@@ -362,7 +434,7 @@ def draw_next_panel():
                     if board[row, col] != 0:
                         x = area_start_x + col * cell_size_scaled + offset_x
                         y = area_start_y + row * cell_size_scaled + offset_y
-                        piece_skin = engine.pieces_dict[board[row, col]]["skin"]
+                        piece_skin = engine.game.pieces_dict[board[row, col]]["skin"]
                         piece_skin_scaled = pygame.transform.smoothscale(piece_skin, (cell_size_scaled, cell_size_scaled))
                         MAIN_SCREEN.blit(piece_skin_scaled, (x, y))
 
@@ -378,11 +450,11 @@ def draw_hold_panel():
     board_width_px = BOARD_WIDTH_PX
     board_height_px = settings.CELL_SIZE * settings.BOARD_MAIN_HEIGHT # vertical pixels
 
-    hold_width = int(cell_size_scaled * (engine.mino_count + 0.5))
+    hold_width = int(cell_size_scaled * (engine.game.mino_count + 0.5))
 
     hold_height_per_piece = cell_size_scaled * 3
     hold_height_top = cell_size_scaled * 1
-    hold_height = (engine.max_hold_pieces * cell_size_scaled * engine.mino_count) + hold_height_top
+    hold_height = (engine.game.max_hold_pieces * cell_size_scaled * engine.game.mino_count) + hold_height_top
 
     too_big = False
 
@@ -428,7 +500,7 @@ def draw_hold_panel():
     MAIN_SCREEN.blit(text_surface, text_rect)
 
     # --- Draw held pieces ---
-    if hasattr(engine, "hold_boards") and engine.hold_boards is not None:
+    if hasattr(engine.game, "hold_boards") and engine.game.hold_boards is not None:
         cell_size= settings.CELL_SIZE
         base_scale = 0.8  # original piece scale
         shrink_factor = 0.95  # shrink entire area by 5%
@@ -437,7 +509,7 @@ def draw_hold_panel():
         # precompute scaled cell size
         cell_size_scaled = int(cell_size* base_scale * shrink_factor)
 
-        for i, board in enumerate(engine.hold_boards):
+        for i, board in enumerate(engine.game.hold_boards):
             board_rows, board_cols = board.shape
 
             # x/y of the top-left of this board area (stacked)
@@ -465,7 +537,7 @@ def draw_hold_panel():
                     if board[row, col] != 0:
                         x = area_start_x + col * cell_size_scaled + offset_x
                         y = area_start_y + row * cell_size_scaled + offset_y
-                        piece_skin = engine.pieces_dict[board[row, col]]["skin"]
+                        piece_skin = engine.game.pieces_dict[board[row, col]]["skin"]
                         piece_skin_scaled = pygame.transform.smoothscale(piece_skin, (cell_size_scaled, cell_size_scaled))
                         MAIN_SCREEN.blit(piece_skin_scaled, (x, y))
 
@@ -493,11 +565,11 @@ def draw_stats_panel_bg():
     vertical_pct = 0.7
     stats_y = BOARD_PX_OFFSET_Y + int(vertical_pct * total_board_px)
     stats_x = BOARD_PX_OFFSET_X - stats_width
-    hold_height = (engine.max_hold_pieces * cell_size_scaled * 4) + (cell_size_scaled)
+    hold_height = (engine.game.max_hold_pieces * cell_size_scaled * 4) + (cell_size_scaled)
     panel_color = settings.CRUST_COLOR
 
     if ((hold_height + stats_height) >= total_board_px):
-        vertical_pct = 0.7 + (0.15 * engine.max_hold_pieces)
+        vertical_pct = 0.7 + (0.15 * engine.game.max_hold_pieces)
         stats_x = stats_x - 50
         stats_y = int(vertical_pct * total_board_px)
         stats_panel_rect = pygame.Rect(stats_x, stats_y, stats_width, stats_height)
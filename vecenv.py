@@ -0,0 +1,333 @@
+"""
+vecenv.py runs N games at once for bots and training, with every board in one (N, height, width) int8 array.
+There's no active piece, gravity or timers here: each step every game places its current piece by picking
+a rotation and an x and hard dropping it straight down from above the stack (like a bot with 0G and
+perfect finesse, so no tucks or spins). Placing, clearing lines, rewards and top outs are all done as
+array operations over every game at once, so the cost per placement drops the more games there are.
+
+The pieces come from the same tables as the engine (pieces.PieceTable) and the same bags as
+Engine.generate_bag: a game with seed S gets exactly the pieces an Engine reset with seed S gets.
+"BAG" bags are generated for all the games that need one at once, with splitmix64 done on uint64 arrays.
+"RANDOM", "CLASSIC" and "4MEMR<n>" read the previous bag, so they're done one piece at a time, but still for
+every game at once. Anything else goes through Engine.generate_bag one game at a time.
+"""
+
+import numpy
+
+import engine, gamemodes, rng
+
+LINE_REWARDS = numpy.array([0, 1, 3, 5, 8, 12], dtype=numpy.float32) # reward for clearing 0..5 lines with one piece
+TOPOUT_REWARD = -10.0
+QUEUE_CAPACITY = 64 # pieces kept per game, a ring buffer that gets refilled a bag at a time
+
+EMPTY = 1000 # stands in for "no cells in this column" in the drop tables, far enough off the board to never win a min()
+
+_U64 = numpy.uint64
+_MASK32 = _U64(0xFFFFFFFF)
+
+def mix_array(z):
+    """rng.mix on a uint64 array (numpy wraps the multiplies at 64 bits, same as the & MASK64 there)"""
+    z = (z ^ (z >> _U64(30))) * _U64(0xBF58476D1CE4E5B9)
+    z = (z ^ (z >> _U64(27))) * _U64(0x94D049BB133111EB)
+    return z ^ (z >> _U64(31))
+
+def randint_below(values, count):
+    """(values * count) >> 64 for random uint64 values, which is Rng.randint(0, count - 1) (count is small)"""
+    high, low = values >> _U64(32), values & _MASK32
+    return ((high * _U64(count) + ((low * _U64(count)) >> _U64(32))) >> _U64(32)).astype(numpy.intp)
+
+def clear_full_rows(boards, counts=None):
+    """
+    Engine.clear_lines for a batch of (N, height, width) boards: full rows come out and empty rows go in at the top.
+    Returns the new boards. counts is how many lines each board clears, if the caller already knows.
+    """
+    lines_to_clear = numpy.all(boards != 0, axis=2)
+    if counts is None:
+        counts = numpy.count_nonzero(lines_to_clear, axis=1)
+    order = numpy.argsort(~lines_to_clear, axis=1, kind="stable") # cleared rows first, then the rest in order
+    boards = numpy.take_along_axis(boards, order[:, :, None], axis=1)
+    boards[numpy.arange(boards.shape[1]) < counts[:, None]] = 0
+    return boards
+
+class VecEnv:
+    def __init__(self, num_envs, modes=(gamemodes.TetraminoBase, gamemodes.Guideline), board_width=None, board_height=None, board_extra_height=None, seed=None):
+        # the gamemode settings come from a real engine with the same gamemodes loaded, so the defaults match
+        self.template = engine.Engine(board_width=board_width, board_height=board_height, board_extra_height=board_extra_height, board_backend="ARRAY", seed=0)
+        for mode in modes:
+            self.template.load_gamemode(mode)
+        template = self.template
+        self.num_envs = num_envs
+        self.board_width, self.board_height = template.board_width, template.board_height
+        self.piece_table = template.piece_table
+        self.piece_gen_type = template.piece_gen_type
+        self.next_queue_size = template.next_queue_size
+        self.line_rewards, self.topout_reward = LINE_REWARDS, TOPOUT_REWARD
+        self.build_tables()
+
+        self.envs = numpy.arange(num_envs)
+        self.boards = numpy.zeros((num_envs, self.board_height, self.board_width), dtype=numpy.int8)
+        self.column_tops = numpy.zeros((num_envs, self.board_width + 2 * self.pad), dtype=numpy.intp) # first filled row of each column, pad columns of floor on each side
+        # flat views and where each game starts in them, one index per cell is a lot faster than (env, row, col) indexes
+        self.board_cells, self.board_rows, self.flat_tops = self.boards.reshape(-1), self.boards.reshape(-1, self.board_width), self.column_tops.reshape(-1)
+        self.cell_starts = self.envs * (self.board_height * self.board_width)
+        self.row_starts = self.envs * self.board_height
+        self.top_starts = self.envs * self.column_tops.shape[1]
+        self.holds = numpy.zeros(num_envs, dtype=numpy.int8) # 0 is an empty hold
+        self.queues = numpy.zeros((num_envs, QUEUE_CAPACITY), dtype=numpy.int8)
+        self.queue_starts = numpy.zeros(num_envs, dtype=numpy.intp) # the current piece is queues[env, start % QUEUE_CAPACITY]
+        self.queue_ends = numpy.zeros(num_envs, dtype=numpy.intp)
+        self.bag_counts = numpy.zeros(num_envs, dtype=numpy.intp)
+        self.last_bags = [[] for _ in range(num_envs)] # only used by the generators that go through Engine.generate_bag
+        self.lines_cleared = numpy.zeros(num_envs, dtype=numpy.intp)
+        self.pieces_placed = numpy.zeros(num_envs, dtype=numpy.intp)
+        self.games_played = 0
+
+        seed = rng.new_seed() if seed is None else seed
+        self.seeds = mix_array(numpy.arange(num_envs, dtype=_U64) * _U64(rng.GOLDEN_GAMMA) + _U64(seed & rng.MASK64))
+        self.reset()
+
+    def build_tables(self):
+        """
+        Per piece rotation arrays out of the piece table, indexed by shape = piece_id * 4 + rotation,
+        so a whole batch gets looked up with one fancy index. Cells are offsets into a flattened board.
+        """
+        piece_table, width, height = self.piece_table, self.board_width, self.board_height
+        size = self.pad = piece_table.size
+        shape_count = (piece_table.piece_types + 1) * 4
+        mino_count = max(len(cells) for rotations in piece_table.minos[1:] for cells in rotations)
+        self.cell_offsets = numpy.zeros((shape_count, mino_count), dtype=numpy.intp) # row * width + col of every cell
+        self.drop_rows = numpy.full((shape_count, size), -EMPTY, dtype=numpy.intp) # lowest row + 1 in each column of the box
+        self.top_rows = numpy.full((shape_count, size), EMPTY, dtype=numpy.intp) # highest row in each column of the box
+        self.row_has_cells = numpy.zeros((shape_count, size), dtype=bool)
+        self.highest_row = numpy.zeros(shape_count, dtype=numpy.intp)
+        self.min_x = numpy.zeros(shape_count, dtype=numpy.intp) # legal x are min_x..max_x, both ends included
+        self.max_x = numpy.full(shape_count, -1, dtype=numpy.intp)
+        self.spawn_offsets = numpy.zeros((shape_count // 4, mino_count), dtype=numpy.intp) # cells of rotation 0 at the spawn position, by piece id
+        for piece_id in range(1, piece_table.piece_types + 1):
+            for rotation, cells in enumerate(piece_table.minos[piece_id]):
+                shape = piece_id * 4 + rotation
+                padded = cells + (cells[0],) * (mino_count - len(cells)) # repeating a cell is harmless for stamping
+                self.cell_offsets[shape] = [row * width + col for row, col in padded]
+                for row, col in cells:
+                    self.drop_rows[shape, col] = max(self.drop_rows[shape, col], row + 1)
+                    self.top_rows[shape, col] = min(self.top_rows[shape, col], row)
+                    self.row_has_cells[shape, row] = True
+                self.highest_row[shape] = min(row for row, col in cells)
+                leftmost, rightmost = piece_table.column_extents[piece_id][rotation]
+                self.min_x[shape], self.max_x[shape] = -leftmost, width - 1 - rightmost
+            # same spawn position as Engine.update_starting_coords
+            piece_size = piece_table.sizes[piece_id]
+            starting_x = (width - piece_size) // 2
+            starting_y = self.template.board_extra_height - piece_size // 5 - piece_table.spawn_offsets[piece_id] + self.template.spawn_y_offset
+            spawn_cells = piece_table.minos[piece_id][0]
+            spawn_cells += (spawn_cells[0],) * (mino_count - len(spawn_cells))
+            self.spawn_offsets[piece_id] = [min(max(starting_y + row, 0), height - 1) * width + starting_x + col for row, col in spawn_cells]
+
+    def reset(self, envs=None):
+        """Start new games (every game by default), each with the next seed like Engine.top_out does"""
+        if envs is None:
+            envs = self.envs
+        self.boards[envs] = 0
+        self.column_tops[envs] = self.board_height
+        self.holds[envs] = 0
+        self.queue_starts[envs] = 0
+        self.queue_ends[envs] = 0
+        self.bag_counts[envs] = 0
+        for env in envs:
+            self.last_bags[env] = []
+        self.lines_cleared[envs] = 0
+        self.pieces_placed[envs] = 0
+        self.games_played += len(envs)
+        self.fill_queues()
+
+    def fill_queues(self):
+        """Add bags to every queue that doesn't have enough pieces left for the current piece, a hold and the previews"""
+        lookahead = self.next_queue_size + 2
+        while True:
+            envs = numpy.flatnonzero(self.queue_ends - self.queue_starts < lookahead)
+            if not envs.size:
+                return
+            if self.piece_gen_type == "BAG":
+                self.add_bags(envs)
+            elif self.piece_gen_type in ("RANDOM", "CLASSIC") or self.piece_gen_type.startswith("4MEMR"):
+                self.add_history_bags(envs)
+            else:
+                self.add_engine_bags(envs)
+
+    def add_bags(self, envs):
+        """One "BAG" bag for each of envs, the same as Engine.generate_bag but for all of them at once"""
+        self.bag_counts[envs] += 1
+        for odd in (False, True):
+            group = envs[(self.bag_counts[envs] % 2 == 1) == odd]
+            if not group.size:
+                continue
+            bag = [piece for piece, data in self.template.pieces_dict.items() if not (data.get("rare", False) and odd)]
+            states = mix_array(self.seeds[group] ^ mix_array(self.bag_counts[group].astype(_U64) * _U64(rng.GOLDEN_GAMMA))) # rng.for_bag
+            items = numpy.tile(numpy.array(bag, dtype=numpy.int8), (group.size, 1))
+            rows = numpy.arange(group.size)
+            for i in range(len(bag) - 1, 0, -1): # Rng.shuffle
+                states += _U64(rng.GOLDEN_GAMMA)
+                j = randint_below(mix_array(states), i + 1)
+                swapped = items[rows, j]
+                items[rows, j] = items[:, i]
+                items[:, i] = swapped
+            self.append_queue(group, items)
+
+    def add_history_bags(self, envs):
+        """
+        One "RANDOM", "CLASSIC" or "4MEMR<n>" bag for each of envs, the same as Engine.generate_bag (which is
+        handed the last bag as piece_bags[0], like add_engine_bags does) but one piece at a time for all of them.
+        A piece that gets rerolled moves that game's generator on one more step than the others.
+        """
+        gen_type, piece_types = self.piece_gen_type, self.template.piece_types
+        last_bags = [self.last_bags[env] for env in envs]
+        if gen_type.startswith("4MEMR") and any(0 < len(bag) < 4 for bag in last_bags): # a short history, only generate_bag gets that right
+            self.add_engine_bags(envs)
+            return
+        self.bag_counts[envs] += 1
+        states = mix_array(self.seeds[envs] ^ mix_array(self.bag_counts[envs].astype(_U64) * _U64(rng.GOLDEN_GAMMA))) # rng.for_bag
+
+        def randint(low, high, mask=None): # Rng.randint for every game, or just the ones in mask
+            if mask is None:
+                states[:] += _U64(rng.GOLDEN_GAMMA)
+                return low + randint_below(mix_array(states), high - low + 1)
+            states[mask] += _U64(rng.GOLDEN_GAMMA)
+            return low + randint_below(mix_array(states[mask]), high - low + 1)
+
+        generated = [] # in the order they were made, CLASSIC and 4MEMR insert at the front so those get flipped after
+        if gen_type == "RANDOM":
+            for _ in range(7):
+                generated.append(randint(1, piece_types))
+        elif gen_type == "CLASSIC":
+            previous = numpy.array([bag[0] if bag else -1 for bag in last_bags], dtype=numpy.intp)
+            for _ in range(7):
+                piece = randint(0, piece_types)
+                reroll = (piece == 0) | (piece == previous)
+                if reroll.any():
+                    piece[reroll] = randint(1, piece_types, reroll)
+                generated.append(piece)
+                previous = piece
+        else:
+            reroll_count = int(gen_type[-1])
+            first_pieces = [1, 4, 1, 4] if piece_types == 7 else [14, 14, 14, 14]
+            previous = numpy.array([bag[:4] if bag else first_pieces for bag in last_bags], dtype=numpy.intp)
+            for i in range(7):
+                if i > 0:
+                    previous = numpy.hstack((previous[:, 1:], generated[-1][:, None]))
+                piece = randint(1, piece_types)
+                for _ in range(reroll_count):
+                    reroll = (previous == piece[:, None]).any(axis=1)
+                    if reroll.any():
+                        piece[reroll] = randint(1, piece_types, reroll)
+                generated.append(piece)
+        items = numpy.array(generated if gen_type == "RANDOM" else generated[::-1], dtype=numpy.int8).T
+        for env, bag in zip(envs, items.tolist()):
+            self.last_bags[env] = bag
+        self.append_queue(envs, items)
+
+    def add_engine_bags(self, envs):
+        """One bag for each of envs through Engine.generate_bag, for the generators that depend on the last bag"""
+        template = self.template
+        for env in envs:
+            template.rng_seed, template.bag_count = int(self.seeds[env]), int(self.bag_counts[env])
+            template.piece_bags = [self.last_bags[env], []]
+            bag = template.generate_bag(self.piece_gen_type)
+            self.bag_counts[env], self.last_bags[env] = template.bag_count, bag
+            self.append_queue(numpy.array([env]), numpy.array([bag], dtype=numpy.int8))
+
+    def append_queue(self, envs, items):
+        positions = (self.queue_ends[envs, None] + numpy.arange(items.shape[1])) % QUEUE_CAPACITY
+        self.queues[envs[:, None], positions] = items
+        self.queue_ends[envs] += items.shape[1]
+
+    def current_pieces(self):
+        return self.queues[self.envs, self.queue_starts % QUEUE_CAPACITY]
+
+    def current_shapes(self, rotation):
+        """piece_id * 4 + rotation of every game's current piece, to index the tables with (like env.min_x[shapes])"""
+        return self.current_pieces().astype(numpy.intp) * 4 + (numpy.asarray(rotation, dtype=numpy.intp) & 3)
+
+    def next_pieces(self, count=None):
+        """(N, count) of the pieces after the current one, next_queue_size of them by default"""
+        if count is None:
+            count = self.next_queue_size
+        positions = (self.queue_starts[:, None] + numpy.arange(1, count + 1)) % QUEUE_CAPACITY
+        return self.queues[self.envs[:, None], positions]
+
+    def spawn_blocked(self):
+        """(N,) True where the current piece doesn't fit at its spawn position, which is a top out like in Engine.spawn_piece"""
+        cells = self.cell_starts[:, None] + self.spawn_offsets[self.current_pieces()]
+        return self.board_cells[cells].any(axis=1)
+
+    def hold(self, mask):
+        """
+        Guideline hold for the games in mask: swap the current piece with the held one (or the next piece if the hold is empty).
+        Returns where the piece that came out doesn't fit at spawn, Engine.hold_guideline tops out there too.
+        """
+        envs = numpy.flatnonzero(mask)
+        current = self.queues[envs, self.queue_starts[envs] % QUEUE_CAPACITY]
+        held = self.holds[envs]
+        self.holds[envs] = current
+        swapping = held != 0
+        self.queues[envs[swapping], self.queue_starts[envs[swapping]] % QUEUE_CAPACITY] = held[swapping]
+        self.queue_starts[envs[~swapping]] += 1 # empty hold, the next piece becomes the current one
+        return mask & self.spawn_blocked()
+
+    def step(self, x, rotation, hold=None):
+        """
+        Every game places its current piece at column x (of the piece box, like Engine.piece_x) in rotation,
+        after holding first where hold is True. Returns (rewards, lines, dones) as (N,) arrays.
+        An x outside min_x..max_x for the piece, or a piece that doesn't fit under the ceiling, tops the game out.
+        Games that top out (or can't spawn their next piece, or the piece they held out) are reset straight away.
+        """
+        blocked = numpy.zeros(self.num_envs, dtype=bool)
+        if hold is not None and numpy.any(hold):
+            blocked = self.hold(numpy.asarray(hold, dtype=bool))
+        pad, width, height = self.pad, self.board_width, self.board_height
+        piece = self.current_pieces()
+        shape = piece.astype(numpy.intp) * 4 + (numpy.asarray(rotation, dtype=numpy.intp) & 3)
+        x = numpy.asarray(x, dtype=numpy.intp)
+        min_x, max_x = self.min_x[shape], self.max_x[shape]
+        legal = (x >= min_x) & (x <= max_x)
+        if not legal.all():
+            x = numpy.clip(x, min_x, max_x) # illegal games get reset anyway, this just keeps their indexes on their own board
+
+        # landing row: as far down as the highest thing under any column of the piece allows
+        box_tops = (self.top_starts + x + pad)[:, None] + numpy.arange(pad)
+        tops = self.flat_tops[box_tops]
+        y = numpy.min(tops - self.drop_rows[shape], axis=1)
+        highest_row = y + self.highest_row[shape]
+        if highest_row.min() < 0: # sticks out above the board
+            legal &= highest_row >= 0
+            y = numpy.maximum(y, -self.highest_row[shape])
+        self.board_cells[(self.cell_starts + y * width + x)[:, None] + self.cell_offsets[shape]] = piece[:, None]
+        self.flat_tops[box_tops] = numpy.minimum(tops, y[:, None] + self.top_rows[shape])
+        self.queue_starts += 1
+        self.pieces_placed += 1
+
+        # a row can only have filled up if the piece is in it, so only the rows of the piece box get checked
+        box_rows = self.row_starts[:, None] + numpy.clip(y[:, None] + numpy.arange(pad), 0, height - 1)
+        full = numpy.all(self.board_rows[box_rows], axis=2) & self.row_has_cells[shape] # every cell nonzero
+        lines = numpy.count_nonzero(full, axis=1)
+        cleared = numpy.flatnonzero(lines)
+        if cleared.size:
+            self.clear_lines(cleared, lines[cleared])
+            lines[~legal] = 0
+        self.lines_cleared += lines
+
+        self.fill_queues()
+        dones = ~legal | blocked | self.spawn_blocked()
+        rewards = self.line_rewards[lines]
+        if dones.any():
+            rewards[dones] += self.topout_reward
+            topped_out = numpy.flatnonzero(dones)
+            self.seeds[topped_out] = mix_array(self.seeds[topped_out] + _U64(1))
+            self.reset(topped_out)
+        return rewards, lines, dones
+
+    def clear_lines(self, envs, counts):
+        """Clears the full rows of envs and fixes their column tops"""
+        boards = self.boards[envs] = clear_full_rows(self.boards[envs], counts)
+        filled = boards != 0
+        pad = self.pad
+        self.column_tops[envs, pad:pad + self.board_width] = numpy.where(filled.any(axis=1), filled.argmax(axis=1), self.board_height)
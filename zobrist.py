@@ -0,0 +1,62 @@
+"""
+zobrist.py has the random keys for Zobrist hashing game positions. A position's hash is the XOR of a key for
+every filled cell, one for every piece in the queue (by slot) and one for every piece in hold, so the engine can
+keep it up to date by XORing in just what changed. Engine.state_hash() is the whole thing and History keeps one
+per placement, so repeated positions can be found without comparing boards.
+
+The keys come from rng.mix of the cell or slot, not from a random generator, so the same position hashes the
+same in every process and every run, whatever size the board is.
+"""
+
+import functools
+
+import numpy
+
+import rng
+
+CELL_SALT = 0x5A0B1C2D3E4F6071
+QUEUE_SALT = 0x1F2E3D4C5B6A7988
+HOLD_SALT = 0x7766554433221100
+
+_cell_keys_cache = {} # (height, width) -> uint64 array of keys
+
+@functools.lru_cache(maxsize=None) # lock_piece asks for the same few hundred keys over and over
+def cell_key(row, col):
+    return rng.mix(CELL_SALT ^ (int(row) * rng.GOLDEN_GAMMA + int(col))) # int() so numpy rows don't overflow
+
+def cell_keys(height, width):
+    """(height, width) uint64 array with the key of every cell, row 0 is the top like game_board"""
+    if (height, width) not in _cell_keys_cache:
+        _cell_keys_cache[height, width] = numpy.array([[cell_key(row, col) for col in range(width)] for row in range(height)], dtype=numpy.uint64)
+    return _cell_keys_cache[height, width]
+
+def board_hash(board):
+    """XOR of the keys of every filled cell, works on the top rows of a board on their own as well"""
+    return int(numpy.bitwise_xor.reduce(cell_keys(*board.shape)[board != 0]))
+
+def cells_hash(cells):
+    """XOR of the keys of (row, col) cells, for adding or taking out a piece"""
+    result = 0
+    for row, col in cells:
+        result ^= cell_key(row, col)
+    return result
+
+def columns_hash(columns, height):
+    """board_hash for a batch of (N, width) uint64 column boards (bit n = row n, like bot.board_columns)"""
+    rows = numpy.arange(height, dtype=numpy.uint64)[None, :, None]
+    filled = (columns[:, None, :] >> rows) & numpy.uint64(1) != 0
+    keys = cell_keys(height, columns.shape[1])
+    return numpy.bitwise_xor.reduce(numpy.where(filled, keys, numpy.uint64(0)).reshape(len(columns), keys.size), axis=1) # keys.size, not -1, so an empty batch works too
+
+@functools.lru_cache(maxsize=None)
+def piece_key(salt, slot, piece):
+    return rng.mix(salt ^ (slot * rng.GOLDEN_GAMMA + piece))
+
+def queue_hash(queue, hold_pieces):
+    """XOR of the keys of every piece in queue (the current piece first) and in hold"""
+    result = 0
+    for slot, piece in enumerate(queue):
+        result ^= piece_key(QUEUE_SALT, slot, piece)
+    for slot, piece in enumerate(hold_pieces):
+        result ^= piece_key(HOLD_SALT, slot, piece)
+    return result